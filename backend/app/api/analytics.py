@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from datetime import date, timedelta
+from app.config import settings
+from app.database import db
+from app.models.analytics import RoutePerformance, DriverPerformance, MovementVolume, RollupRefreshResponse
+from app.repositories.analytics_repositories import AnalyticsRepository, GRANULARITIES
+from app.services.analytics_service import RollupRefresher
+from app.utils.serialization import records_response
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+def get_analytics_repo():
+    return AnalyticsRepository(db)
+
+rollup_refresher = RollupRefresher(
+    settings.ANALYTICS_REFRESH_INTERVAL_SECONDS,
+    settings.ANALYTICS_ROLLUP_LAG_SECONDS,
+    settings.ANALYTICS_SHIPMENT_BATCH_SIZE,
+    settings.ANALYTICS_MOVEMENT_BATCH_SIZE
+)
+
+# Default span of /movements per granularity
+DEFAULT_DAYS = {"day": 30, "week": 12 * 7, "month": 365}
+
+
+def _date_range(date_from: Optional[date], date_to: Optional[date], default_days: int = 30) -> tuple:
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=default_days)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return date_from, date_to
+
+# ========== Performance ==========
+
+@router.get("/routes", response_model=List[RoutePerformance])
+async def route_performance(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=1000),
+    repo: AnalyticsRepository = Depends(get_analytics_repo)
+):
+    """Shipment counts, trip hours and delay per route, worst delay first (default: last 30 days)"""
+    date_from, date_to = _date_range(date_from, date_to)
+    rows = await repo.get_route_performance(date_from, date_to, limit)
+    return records_response(rows, RoutePerformance)
+
+@router.get("/drivers", response_model=List[DriverPerformance])
+async def driver_performance(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=1000),
+    repo: AnalyticsRepository = Depends(get_analytics_repo)
+):
+    """Completion rate and average trip hours per driver (default: last 30 days)"""
+    date_from, date_to = _date_range(date_from, date_to)
+    rows = await repo.get_driver_performance(date_from, date_to, limit)
+    return records_response(rows, DriverPerformance)
+
+# ========== Movement Volume ==========
+
+@router.get("/movements", response_model=List[MovementVolume])
+async def movement_volume(
+    granularity: str = Query("day", pattern=f"^({'|'.join(GRANULARITIES)})$"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    product_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    movement_type: Optional[str] = Query(None, pattern="^(inbound|outbound|transfer|adjustment)$"),
+    repo: AnalyticsRepository = Depends(get_analytics_repo)
+):
+    """
+    Movement counts and quantities in / out per day, week or month and
+    movement type (default: last 30 days / 12 weeks / 12 months).
+    The first period is always complete.
+
+    Each movement is counted once; with warehouse_id, every movement
+    touching that warehouse is (a transfer counts at both of its ends).
+    quantity_in is stock arriving at a warehouse and quantity_out stock
+    leaving one, so without a warehouse filter a transfer adds to both.
+    Adjustments count at their warehouse; one without any warehouse is
+    included (as quantity_in) only when no warehouse filter is given.
+    """
+    date_from, date_to = _date_range(date_from, date_to, DEFAULT_DAYS[granularity])
+    rows = await repo.get_movement_volume(
+        granularity, date_from, date_to, product_id, warehouse_id, movement_type
+    )
+    return records_response(rows, MovementVolume)
+
+@router.post("/refresh", response_model=RollupRefreshResponse)
+async def refresh_rollups(repo: AnalyticsRepository = Depends(get_analytics_repo)):
+    """
+    Fold newly finished shipments and new stock movements into the rollups now
+    (one batch of each; caught_up is false if more is pending)
+    """
+    result = await rollup_refresher.refresh(repo)
+    if result is None:
+        # Another worker holds the refresh lock and is doing the same work
+        return RollupRefreshResponse(refreshed=False)
+    return RollupRefreshResponse(refreshed=True, **result)
@@ -3,15 +3,42 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from app.database import get_db, Database
 from app.models.user import UserCreate, UserLogin, UserOut, UserUpdate, Token
-from app.utils.auth import verify_password, get_password_hash, create_access_token
+from app.utils.auth import password_hasher, create_access_token
+from app.utils.exceptions import ServiceBusyError, service_busy_exception
+from app.utils.cache import TTLCache
 from app.config import settings
 from typing import Optional
 from datetime import timedelta
+import hashlib
+import time
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/login")
 
+# Authenticated users by token subject (email): only the UserOut fields, never
+# the password hash. Every hit is a users lookup that didn't hit the pool.
+principal_cache = TTLCache(
+    "auth_principals",
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+# Logged-out tokens by digest, each kept until the token would have expired.
+# Per process: a token revoked on one worker stays valid on others until exp.
+revoked_tokens = TTLCache(
+    "auth_revoked_tokens",
+    maxsize=settings.AUTH_REVOKED_TOKENS_MAX,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
+PRINCIPAL_COLUMNS = "user_id, email, full_name, company_name, role_type, inventory_focus, is_active, created_at, updated_at"
+
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -25,12 +52,30 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = D
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    query = "SELECT * FROM users WHERE email = $1"
-    user_record = await db.fetch_one(query, email)
-    if user_record is None:
+
+    if revoked_tokens.get(_token_digest(token)):
         raise credentials_exception
-    return dict(user_record)
+
+    principal = principal_cache.get(email)
+    if principal is None:
+        query = f"SELECT {PRINCIPAL_COLUMNS} FROM users WHERE email = $1"
+        user_record = await db.fetch_one(query, email)
+        if user_record is None:
+            raise credentials_exception
+        principal = dict(user_record)
+        principal_cache.set(email, principal)
+    # Callers get their own copy so the cached entry can't be mutated
+    return dict(principal)
+
+async def _verify_login(db: Database, user, password: str) -> bool:
+    """Check the password off the event loop; upgrade the hash if its cost is outdated"""
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(password, user['password_hash'])
+    except ServiceBusyError as e:
+        raise service_busy_exception(e.message, e.retry_after)
+    if valid and new_hash:
+        await db.execute("UPDATE users SET password_hash = $1 WHERE user_id = $2", new_hash, user['user_id'])
+    return valid
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 async def register(user: UserCreate, db: Database = Depends(get_db)):
@@ -39,7 +84,10 @@ async def register(user: UserCreate, db: Database = Depends(get_db)):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
         
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except ServiceBusyError as e:
+        raise service_busy_exception(e.message, e.retry_after)
     
     query = """
         INSERT INTO users (email, password_hash, full_name, company_name, role_type, inventory_focus)
@@ -62,7 +110,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Database =
     query = "SELECT * FROM users WHERE email = $1"
     user = await db.fetch_one(query, form_data.username)
     
-    if not user or not verify_password(form_data.password, user['password_hash']):
+    if not user or not await _verify_login(db, user, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -80,7 +128,7 @@ async def login_json(user_credentials: UserLogin, db: Database = Depends(get_db)
     query = "SELECT * FROM users WHERE email = $1"
     user = await db.fetch_one(query, user_credentials.email)
     
-    if not user or not verify_password(user_credentials.password, user['password_hash']):
+    if not user or not await _verify_login(db, user, user_credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -124,4 +172,13 @@ async def update_users_me(user_update: UserUpdate, current_user: dict = Depends(
     """
     
     updated_user = await db.fetch_one(query, *values)
+    principal_cache.pop(current_user['email'])
     return dict(updated_user)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token: str = Depends(oauth2_scheme), current_user: dict = Depends(get_current_user)):
+    """Revoke the presented token for the rest of its lifetime"""
+    payload = jwt.get_unverified_claims(token)
+    remaining = payload.get("exp", time.time()) - time.time()
+    if remaining > 0:
+        revoked_tokens.set(_token_digest(token), True, ttl=remaining)
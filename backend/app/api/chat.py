@@ -1,11 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-import google.generativeai as genai
-from google.generativeai.types import content_types
+from typing import List, Tuple
+from contextlib import aclosing
+import asyncio
+import json
+import logging
 from app.database import get_db, Database
 from app.config import settings
 from app.api.auth import get_current_user
+from app.services.chat_tools import execute_tool
+from app.services.chat_providers import (
+    get_chat_provider, ChatProvider, ChatSession, ToolCall,
+    ChatTimeoutError, ChatProviderNotConfigured
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
@@ -17,38 +27,20 @@ class ChatRequest(BaseModel):
     history: List[ChatMessage]
     message: str
 
-# Define tool schemas for Gemini
-def get_inventory_status(warehouse_name: Optional[str] = None, product_name: Optional[str] = None):
-    """Get the current inventory quantities for products or warehouses."""
-    pass
-
-def get_low_stock_items():
-    """Get a list of products that have fallen below their minimum reorder level."""
-    pass
-
-def get_warehouse_capacities():
-    """Get utilization and capacity information for all warehouses."""
-    pass
+# Token Optimizer: Limit history to the last 6 messages (3 turns) to save tokens
+MAX_HISTORY = 6
 
-def get_recent_movements(limit: int = 5):
-    """Get the most recent stock inbound, outbound, or transfer movements."""
-    pass
+TOOL_BUDGET_EXHAUSTED_REPLY = "That needs more lookups than I can do in one answer. Please ask a narrower question."
 
 
-tools = [get_inventory_status, get_low_stock_items, get_warehouse_capacities, get_recent_movements]
+def _provider() -> ChatProvider:
+    try:
+        return get_chat_provider()
+    except ChatProviderNotConfigured as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/")
-async def chat_with_bot(
-    req: ChatRequest, 
-    db: Database = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
-):
-    if not settings.GEMINI_API_KEY:
-        raise HTTPException(status_code=500, detail="Gemini API Key is not configured on the server.")
-        
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-    
+def _start_chat(provider: ChatProvider, req: ChatRequest, current_user: dict) -> ChatSession:
     # System Instruction
     system_instruction = f"""You are 'WTMS Assistant', an intelligent, helpful AI for the Warehouse & Transportation Management System.
 The current user you are talking to is {current_user.get('full_name')} from {current_user.get('company_name', 'your company')}. 
@@ -61,111 +53,124 @@ Rules:
 4. You are restricted to topics regarding Warehouse Management, Logistics, Inventory, and this software.
 5. If the user asks off-topic questions, politely decline and state you are a warehouse assistant.
 """
+    recent_history = list(req.history)[-MAX_HISTORY:]
+    return provider.start_chat(system_instruction, [msg.model_dump() for msg in recent_history])
+
 
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        tools=tools,
-        system_instruction=system_instruction,
-        generation_config=genai.types.GenerationConfig(
-            max_output_tokens=250,
-            temperature=0.2,
-        )
+async def _run_tools(db: Database, calls: List[ToolCall]) -> List[Tuple[str, dict]]:
+    """
+    Run every tool the model asked for concurrently (each query on its own
+    pool connection). Cancelling the caller cancels the queries too.
+    Results are cached until the next inventory/warehouse write, so they
+    are read from the primary: a lagging replica would fill the cache with
+    rows that write has already changed.
+    """
+    results = await asyncio.gather(
+        *(execute_tool(db, call.name, call.args) for call in calls),
+        return_exceptions=True
     )
-    
-    # Token Optimizer: Limit history to the last 6 messages (3 turns) to save tokens
-    MAX_HISTORY = 6
-    history_list = list(req.history)
-    recent_history = history_list[-MAX_HISTORY:] if len(history_list) > MAX_HISTORY else history_list
-    
-    # Build history
-    history = []
-    for msg in recent_history:
-        history.append({"role": msg.role, "parts": [{"text": msg.text}]})
-        
-    chat = model.start_chat(history=history)
+    tool_results = []
+    for call, result in zip(calls, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            logger.error(f"Chat tool {call.name} failed: {result}")
+            result = {"error": f"{call.name} failed"}
+        tool_results.append((call.name, result))
+    return tool_results
+
+
+@router.post("/")
+async def chat_with_bot(
+    req: ChatRequest, 
+    db: Database = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    chat = _start_chat(_provider(), req, current_user)
     
     # First, send the message to get a response or a tool call
     try:
-        response = chat.send_message(req.message)
+        response = await chat.send_message(req.message)
         
-        # Check if the model wants to call a function
-        if response.parts and response.parts[0].function_call:
-            func_call = response.parts[0].function_call
-            func_name = func_call.name
-            args = func_call.args
-            
-            # Execute the respective DB query
-            tool_result = {}
-            if func_name == "get_inventory_status":
-                q = """
-                    SELECT w.warehouse_name, p.product_name, i.quantity, i.reserved_quantity 
-                    FROM inventory i
-                    JOIN warehouses w ON i.warehouse_id = w.warehouse_id
-                    JOIN products p ON i.product_id = p.product_id
-                    WHERE 1=1
-                """
-                params = []
-                idx = 1
-                if 'warehouse_name' in args and args['warehouse_name']:
-                    q += f" AND w.warehouse_name ILIKE ${idx}"
-                    params.append(f"%{args['warehouse_name']}%")
-                    idx += 1
-                if 'product_name' in args and args['product_name']:
-                    q += f" AND p.product_name ILIKE ${idx}"
-                    params.append(f"%{args['product_name']}%")
-                    idx += 1
-                
-                rows = await db.fetch_all(q, *params)
-                tool_result = {"inventory": [dict(r) for r in rows]}
-                
-            elif func_name == "get_low_stock_items":
-                q = """
-                    SELECT p.product_name, w.warehouse_name, i.quantity, p.reorder_level
-                    FROM inventory i
-                    JOIN products p ON i.product_id = p.product_id
-                    JOIN warehouses w ON i.warehouse_id = w.warehouse_id
-                    WHERE i.quantity <= p.reorder_level
-                """
-                rows = await db.fetch_all(q)
-                tool_result = {"low_stock_items": [dict(r) for r in rows]}
-                
-            elif func_name == "get_warehouse_capacities":
-                q = """
-                    SELECT w.warehouse_name, w.capacity_cubic_meters, 
-                           COALESCE(SUM(i.quantity * p.volume_cubic_meters), 0) as used_cubic_meters
-                    FROM warehouses w
-                    LEFT JOIN inventory i ON w.warehouse_id = i.warehouse_id
-                    LEFT JOIN products p ON i.product_id = p.product_id
-                    GROUP BY w.warehouse_id
-                """
-                rows = await db.fetch_all(q)
-                tool_result = {"warehouses": [{"warehouse_name": r['warehouse_name'], "capacity": float(r['capacity_cubic_meters']), "used": float(r['used_cubic_meters'])} for r in rows]}
-                
-            elif func_name == "get_recent_movements":
-                limit = int(args.get('limit', 5))
-                q = """
-                    SELECT p.product_name, sm.quantity, sm.movement_type, sm.created_at
-                    FROM stock_movements sm
-                    JOIN products p ON sm.product_id = p.product_id
-                    ORDER BY sm.created_at DESC
-                    LIMIT $1
-                """
-                rows = await db.fetch_all(q, limit)
-                tool_result = {"movements": [{"product": r['product_name'], "qty": r['quantity'], "type": r['movement_type'], "date": str(r['created_at'])} for r in rows]}
-            
-            # Send the tool output back to the model
-            final_response = chat.send_message(
-                content_types.Part.from_function_response(
-                    name=func_name,
-                    response=tool_result
-                )
-            )
-            return {"reply": final_response.text}
-            
-        else:
-            # Model responded with text directly
-            return {"reply": response.text}
+        # Answer all tool calls of a turn in one follow-up message
+        rounds = 0
+        while response.tool_calls and rounds < settings.CHAT_MAX_TOOL_ROUNDS:
+            rounds += 1
+            tool_results = await _run_tools(db, response.tool_calls)
+            response = await chat.send_tool_results(tool_results)
+
+        if response.tool_calls and not response.text:
+            return {"reply": TOOL_BUDGET_EXHAUSTED_REPLY}
+        return {"reply": response.text}
             
+    except ChatTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        print("Chat Error:", e)
+        logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ========== Streaming ==========
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(
+    req: ChatRequest,
+    db: Database = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Same conversation as POST /chat/, as Server-Sent Events:
+    `token` (text delta), `tool_call`, `tool_result`, then `done` with the
+    full reply, or `error`. If the client disconnects, the response task is
+    cancelled, which closes the upstream model stream and cancels any tool
+    queries still running.
+    """
+    chat = _start_chat(_provider(), req, current_user)
+
+    async def events():
+        reply = []
+        try:
+            stream = chat.stream_message(req.message)
+            rounds = 0
+            while True:
+                calls: List[ToolCall] = []
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        if chunk.text:
+                            reply.append(chunk.text)
+                            yield _sse("token", {"text": chunk.text})
+                        calls.extend(chunk.tool_calls)
+
+                if not calls:
+                    break
+                if rounds >= settings.CHAT_MAX_TOOL_ROUNDS:
+                    if not reply:
+                        reply.append(TOOL_BUDGET_EXHAUSTED_REPLY)
+                        yield _sse("token", {"text": TOOL_BUDGET_EXHAUSTED_REPLY})
+                    break
+                rounds += 1
+
+                for call in calls:
+                    yield _sse("tool_call", {"name": call.name, "args": call.args})
+                tool_results = await _run_tools(db, calls)
+                for name, result in tool_results:
+                    rows = {k: len(v) for k, v in result.items() if isinstance(v, list)}
+                    yield _sse("tool_result", {"name": name, "ok": "error" not in result, "rows": rows})
+                stream = chat.stream_tool_results(tool_results)
+
+            yield _sse("done", {"reply": "".join(reply)})
+        except ChatTimeoutError as e:
+            yield _sse("error", {"status": 504, "detail": str(e)})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield _sse("error", {"status": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
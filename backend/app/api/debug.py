@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List
+from app.api.auth import get_current_user
+from app.database import db
+from app.utils import cache
+from app.utils.admission import admission_controller
+from app.utils.auth import password_hasher
+from app.utils.query_stats import query_stats, ORDERINGS
+
+# Only mounted when DEBUG_ENDPOINTS_ENABLED is set
+router = APIRouter(prefix="/debug", tags=["Diagnostics"], dependencies=[Depends(get_current_user)])
+
+@router.get("/caches", response_model=List[dict])
+async def cache_stats():
+    """Size and hit/miss counters of every in-process cache"""
+    return [c.stats() for c in cache.registry.values()]
+
+@router.get("/password-hashing")
+async def password_hashing_stats():
+    """Queue depth, wait and run times of the bcrypt pool"""
+    return password_hasher.stats()
+
+@router.get("/replica")
+async def replica_status():
+    """Read replica health, last measured lag and the staleness tolerance"""
+    return db.replica_status()
+
+@router.get("/queries")
+async def query_statistics(
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query("total", pattern=f"^({'|'.join(ORDERINGS)})$"),
+):
+    """Top statements by total (or mean, p95, ...) execution time, with acquire waits and row counts"""
+    return {**query_stats.summary(), "queries": query_stats.top(limit, order_by)}
+
+@router.delete("/queries", status_code=204)
+async def reset_query_statistics():
+    """Start a fresh measurement window"""
+    query_stats.reset()
+
+@router.get("/admission")
+async def admission_stats():
+    """Adaptive concurrency limit, queue depth and shed requests per priority"""
+    return admission_controller.stats()
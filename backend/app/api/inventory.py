@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from typing import List, Optional
 from app.database import get_db, Database
 from app.repositories.inventory_repositories import InventoryRepository
@@ -12,12 +12,19 @@ from app.utils.exceptions import (
     insufficient_stock_exception,
     database_exception
 )
+from app.utils.cache import invalidate_tag
+from app.utils.serialization import records_response
+from app.utils.http_cache import versions_etag, etag_matches, not_modified, tag_response
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/inventory", tags=["Inventory"])
 
+# Tables behind each read, for version-based ETags
+INVENTORY_TABLES = ("inventory", "warehouses", "products")
+MOVEMENT_TABLES = ("stock_movements", "warehouses", "products")
+
 
 def get_inventory_repo(db: Database = Depends(get_db)) -> InventoryRepository:
     """Dependency for inventory repository"""
@@ -28,27 +35,38 @@ def get_inventory_repo(db: Database = Depends(get_db)) -> InventoryRepository:
 
 @router.get("/", response_model=List[InventoryWithDetails])
 async def get_inventory(
+    request: Request,
     warehouse_id: Optional[int] = Query(None, description="Filter by warehouse"),
     product_id: Optional[int] = Query(None, description="Filter by product"),
     repo: InventoryRepository = Depends(get_inventory_repo)
 ):
     """Get inventory with optional filters"""
-    return await repo.get_inventory(warehouse_id=warehouse_id, product_id=product_id)
+    etag = await versions_etag(request, repo.db, INVENTORY_TABLES, replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_inventory(warehouse_id=warehouse_id, product_id=product_id)
+    return tag_response(records_response(rows, InventoryWithDetails), etag)
 
 
 @router.get("/{warehouse_id}/{product_id}", response_model=InventoryResponse)
 async def get_specific_inventory(
     warehouse_id: int,
     product_id: int,
+    request: Request,
+    response: Response,
     repo: InventoryRepository = Depends(get_inventory_repo)
 ):
     """Get inventory for specific warehouse-product combination"""
+    etag = await versions_etag(request, repo.db, ("inventory",))
+    if etag_matches(request, etag):
+        return not_modified(etag)
     inventory = await repo.get_inventory_by_warehouse_product(warehouse_id, product_id)
     if not inventory:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No inventory found for warehouse {warehouse_id} and product {product_id}"
         )
+    tag_response(response, etag)
     return inventory
 
 @router.put("/{warehouse_id}/{product_id}")
@@ -64,6 +82,7 @@ async def update_inventory(
             "UPDATE inventory SET quantity = $1, last_updated = CURRENT_TIMESTAMP WHERE warehouse_id = $2 AND product_id = $3",
             quantity, warehouse_id, product_id
         )
+        invalidate_tag("inventory")
         return {"status": "success", "message": "Inventory updated"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -80,6 +99,7 @@ async def delete_inventory(
             "DELETE FROM inventory WHERE warehouse_id = $1 AND product_id = $2",
             warehouse_id, product_id
         )
+        invalidate_tag("inventory")
         return {"status": "success", "message": "Inventory deleted"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -154,6 +174,7 @@ async def create_transfer_movement(
 
 @router.get("/movements", response_model=List[StockMovementWithDetails])
 async def get_stock_movements(
+    request: Request,
     product_id: Optional[int] = Query(None, description="Filter by product"),
     warehouse_id: Optional[int] = Query(None, description="Filter by warehouse"),
     movement_type: Optional[str] = Query(None, description="Filter by movement type"),
@@ -161,19 +182,27 @@ async def get_stock_movements(
     repo: InventoryRepository = Depends(get_inventory_repo)
 ):
     """Get stock movement history with optional filters"""
-    return await repo.get_stock_movements(
+    etag = await versions_etag(request, repo.db, MOVEMENT_TABLES, replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_stock_movements(
         product_id=product_id,
         warehouse_id=warehouse_id,
         movement_type=movement_type,
         limit=limit
     )
+    return tag_response(records_response(rows, StockMovementWithDetails), etag)
 
 
 # ========== Analytics Endpoints ==========
 
 @router.get("/alerts/low-stock", response_model=List[LowStockAlert])
 async def get_low_stock_alerts(
+    request: Request,
     repo: InventoryRepository = Depends(get_inventory_repo)
 ):
     """Get products that are below their reorder level"""
-    return await repo.get_low_stock_alerts()
\ No newline at end of file
+    etag = await versions_etag(request, repo.db, INVENTORY_TABLES, replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return tag_response(records_response(await repo.get_low_stock_alerts(), LowStockAlert), etag)
\ No newline at end of file
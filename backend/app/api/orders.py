@@ -1,17 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from typing import List
+import shutil
+import tempfile
+from app.config import settings
 from app.database import db
 from app.models.orders import (
     CustomerCreate, CustomerResponse,
-    OrderCreate, OrderResponse
+    OrderCreate, OrderResponse,
+    OrderImportJobResponse
 )
 from app.repositories.order_repositories import OrderRepository
+from app.repositories.order_import_repositories import OrderImportRepository
+from app.services.order_import_service import OrderImportRunner
+from app.utils.serialization import records_response
+from app.utils.http_cache import versions_etag, etag_matches, not_modified, tag_response
 
 router = APIRouter(prefix="/orders", tags=["Orders & Customers"])
 
 def get_order_repo():
     return OrderRepository(db)
 
+def get_order_import_repo():
+    return OrderImportRepository(db)
+
+order_import_runner = OrderImportRunner(db, settings.ORDER_IMPORT_STATEMENT_TIMEOUT_SECONDS)
+
+def _spool_upload(upload: UploadFile) -> str:
+    """Copy the uploaded file to disk so the import can outlive the request"""
+    with tempfile.NamedTemporaryFile(prefix="order-import-", suffix=".csv", delete=False) as tmp:
+        shutil.copyfileobj(upload.file, tmp, length=1024 * 1024)
+        return tmp.name
+
 # ========== Customers ==========
 
 @router.post("/customers", response_model=CustomerResponse, status_code=status.HTTP_201_CREATED)
@@ -23,9 +44,65 @@ async def create_customer(customer: CustomerCreate, repo: OrderRepository = Depe
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/customers", response_model=List[CustomerResponse])
-async def list_customers(limit: int = 100, skip: int = 0, repo: OrderRepository = Depends(get_order_repo)):
+async def list_customers(
+    request: Request,
+    limit: int = 100,
+    skip: int = 0,
+    repo: OrderRepository = Depends(get_order_repo)
+):
     """List all customers"""
-    return await repo.get_all_customers(limit=limit, skip=skip)
+    etag = await versions_etag(request, repo.db, ("customers",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_customers(limit=limit, skip=skip)
+    return tag_response(records_response(rows, CustomerResponse), etag)
+
+@router.get("/customers/search", response_model=List[CustomerResponse])
+async def search_customers(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, email or phone fragment"),
+    limit: int = Query(20, ge=1, le=50),
+    repo: OrderRepository = Depends(get_order_repo)
+):
+    """Ranked customer lookup for the customer picker"""
+    return records_response(await repo.search_customers(q, limit=limit), CustomerResponse)
+
+# ========== Bulk Order Imports ==========
+
+@router.post("/imports", response_model=OrderImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_orders(
+    file: UploadFile = File(..., description="CSV: order_ref,customer_id,warehouse_id,product_code,quantity,unit_price,required_date"),
+    repo: OrderImportRepository = Depends(get_order_import_repo)
+):
+    """
+    Queue a partner order file for bulk ingestion.
+    Lines are loaded with COPY, validated set-based and inserted in bulk;
+    poll the job for progress and download rejected lines when it finishes.
+    """
+    path = await run_in_threadpool(_spool_upload, file)
+    job = await repo.create_job(file.filename)
+    order_import_runner.submit(job.job_id, path)
+    return job
+
+@router.get("/imports/{job_id}", response_model=OrderImportJobResponse)
+async def get_import_job(job_id: int, repo: OrderImportRepository = Depends(get_order_import_repo)):
+    """Get the status and progress counters of an import job"""
+    job = await repo.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@router.get("/imports/{job_id}/rejects")
+async def get_import_rejects(job_id: int, repo: OrderImportRepository = Depends(get_order_import_repo)):
+    """Download the rejected lines of an import job as CSV"""
+    job = await repo.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    content = await repo.export_rejects(job_id)
+    return Response(
+        content=content,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="order-import-{job_id}-rejects.csv"'}
+    )
 
 # ========== Orders ==========
 
@@ -38,14 +115,32 @@ async def create_order(order: OrderCreate, repo: OrderRepository = Depends(get_o
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("", response_model=List[OrderResponse])
-async def list_orders(limit: int = 100, skip: int = 0, repo: OrderRepository = Depends(get_order_repo)):
+async def list_orders(
+    request: Request,
+    limit: int = 100,
+    skip: int = 0,
+    repo: OrderRepository = Depends(get_order_repo)
+):
     """List all orders"""
-    return await repo.get_all_orders(limit=limit, skip=skip)
+    etag = await versions_etag(request, repo.db, ("orders",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_orders(limit=limit, skip=skip)
+    return tag_response(records_response(rows, OrderResponse), etag)
 
 @router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: int, repo: OrderRepository = Depends(get_order_repo)):
+async def get_order(
+    order_id: int,
+    request: Request,
+    response: Response,
+    repo: OrderRepository = Depends(get_order_repo)
+):
     """Get order details by ID"""
+    etag = await versions_etag(request, repo.db, ("orders", "order_items"))
+    if etag_matches(request, etag):
+        return not_modified(etag)
     order = await repo.get_order(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    tag_response(response, etag)
     return order
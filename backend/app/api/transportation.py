@@ -1,19 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import List, Optional
+from datetime import datetime
+import asyncio
+import time
+from app.config import settings
 from app.database import db
 from app.models.transportation import (
     VehicleCreate, VehicleResponse,
     DriverCreate, DriverResponse,
-    RouteCreate, RouteResponse,
-    ShipmentCreate, ShipmentResponse
+    RouteCreate, RouteUpdate, RouteResponse, RoutePathResponse,
+    ShipmentCreate, ShipmentResponse, AvailabilityResponse,
+    ShipmentEventBatch, ShipmentEventAccepted, ShipmentBoardPage,
+    LoadPlanRequest, LoadPlanResponse, VehicleLoad,
+    DispatchPlanRequest, DispatchPlanResponse, DispatchAssignment
 )
 from app.repositories.shipment_repositories import TransportationRepository
+from app.services.load_planner import plan_loads
+from app.services.dispatch_optimizer import build_solver_inputs, run_dispatch_solver
+from app.services.route_graph import RouteGraphCache
+from app.services.availability_index import AvailabilityIndexCache
+from app.services.shipment_event_writer import ShipmentEventWriter
+from app.utils.http_cache import versions_etag, etag_matches, not_modified, tag_response
+from app.utils.serialization import records_response
+from app.utils.exceptions import (
+    SchedulingConflictError, scheduling_conflict_exception,
+    ServiceBusyError, service_busy_exception
+)
 
 router = APIRouter(prefix="/transportation", tags=["Transportation & Shipments"])
 
+# Tables behind the shipment board, for version-based ETags
+BOARD_TABLES = ("shipments", "orders", "customers", "vehicles", "drivers", "routes")
+
 def get_transport_repo():
     return TransportationRepository(db)
 
+route_graph_cache = RouteGraphCache(settings.ROUTE_GRAPH_TTL_SECONDS)
+availability_cache = AvailabilityIndexCache(settings.AVAILABILITY_INDEX_TTL_SECONDS)
+# Started and stopped by the application lifespan
+shipment_event_writer = ShipmentEventWriter(
+    TransportationRepository(db),
+    max_queue=settings.SHIPMENT_EVENT_QUEUE_SIZE,
+    batch_size=settings.SHIPMENT_EVENT_BATCH_SIZE,
+    flush_interval_ms=settings.SHIPMENT_EVENT_FLUSH_INTERVAL_MS,
+    # Arrivals free vehicles and drivers
+    on_flush=availability_cache.invalidate,
+)
+
 # ========== Vehicles ==========
 
 @router.post("/vehicles", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
@@ -25,9 +60,18 @@ async def create_vehicle(vehicle: VehicleCreate, repo: TransportationRepository
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/vehicles", response_model=List[VehicleResponse])
-async def list_vehicles(limit: int = 100, skip: int = 0, repo: TransportationRepository = Depends(get_transport_repo)):
+async def list_vehicles(
+    request: Request,
+    limit: int = 100,
+    skip: int = 0,
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
     """List all vehicles"""
-    return await repo.get_all_vehicles(limit=limit, skip=skip)
+    etag = await versions_etag(request, repo.db, ("vehicles",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_vehicles(limit=limit, skip=skip)
+    return tag_response(records_response(rows, VehicleResponse), etag)
 
 # ========== Drivers ==========
 
@@ -40,9 +84,18 @@ async def create_driver(driver: DriverCreate, repo: TransportationRepository = D
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/drivers", response_model=List[DriverResponse])
-async def list_drivers(limit: int = 100, skip: int = 0, repo: TransportationRepository = Depends(get_transport_repo)):
+async def list_drivers(
+    request: Request,
+    limit: int = 100,
+    skip: int = 0,
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
     """List all drivers"""
-    return await repo.get_all_drivers(limit=limit, skip=skip)
+    etag = await versions_etag(request, repo.db, ("drivers",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_drivers(limit=limit, skip=skip)
+    return tag_response(records_response(rows, DriverResponse), etag)
 
 # ========== Routes ==========
 
@@ -50,26 +103,255 @@ async def list_drivers(limit: int = 100, skip: int = 0, repo: TransportationRepo
 async def create_route(route: RouteCreate, repo: TransportationRepository = Depends(get_transport_repo)):
     """Create a new route"""
     try:
-        return await repo.create_route(route)
+        created = await repo.create_route(route)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    route_graph_cache.invalidate()
+    return created
 
 @router.get("/routes", response_model=List[RouteResponse])
-async def list_routes(limit: int = 100, skip: int = 0, repo: TransportationRepository = Depends(get_transport_repo)):
+async def list_routes(
+    request: Request,
+    limit: int = 100,
+    skip: int = 0,
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
     """List all routes"""
-    return await repo.get_all_routes(limit=limit, skip=skip)
+    etag = await versions_etag(request, repo.db, ("routes",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_routes(limit=limit, skip=skip)
+    return tag_response(records_response(rows, RouteResponse), etag)
+
+@router.get("/routes/path", response_model=RoutePathResponse)
+async def find_route_path(
+    origin_city: str = Query(..., alias="from", min_length=1),
+    destination_city: str = Query(..., alias="to", min_length=1),
+    metric: str = Query("distance", pattern="^(distance|time)$"),
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
+    """Shortest multi-hop path between two cities by distance or by time"""
+    graph = await route_graph_cache.get(repo.get_route_edges)
+    path = graph.shortest_path(origin_city, destination_city, metric)
+    if path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No route from '{origin_city}' to '{destination_city}'"
+        )
+    return path
+
+@router.put("/routes/{route_id}", response_model=RouteResponse)
+async def update_route(route_id: int, route: RouteUpdate, repo: TransportationRepository = Depends(get_transport_repo)):
+    """Update a route"""
+    try:
+        updated = await repo.update_route(route_id, route)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Route not found")
+    route_graph_cache.invalidate()
+    return updated
 
 # ========== Shipments ==========
 
 @router.post("/shipments", response_model=ShipmentResponse, status_code=status.HTTP_201_CREATED)
 async def create_shipment(shipment: ShipmentCreate, repo: TransportationRepository = Depends(get_transport_repo)):
-    """Create a new shipment"""
+    """Create a new shipment. Rejects double-booked vehicles and drivers with 409."""
+    if (shipment.status in ("planned", "in_transit")
+            and shipment.scheduled_departure and shipment.scheduled_arrival):
+        index = await availability_cache.get(repo.get_open_bookings)
+        window = (shipment.scheduled_departure, shipment.scheduled_arrival)
+        conflict = index.vehicle_conflict(shipment.vehicle_id, *window)
+        if conflict is not None:
+            raise scheduling_conflict_exception(SchedulingConflictError("Vehicle", shipment.vehicle_id, conflict).message)
+        conflict = index.driver_conflict(shipment.driver_id, *window)
+        if conflict is not None:
+            raise scheduling_conflict_exception(SchedulingConflictError("Driver", shipment.driver_id, conflict).message)
+
     try:
-        return await repo.create_shipment(shipment)
+        created = await repo.create_shipment(shipment)
+    except SchedulingConflictError as e:
+        # Booked by another worker since our index was loaded
+        availability_cache.invalidate()
+        raise scheduling_conflict_exception(e.message)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    availability_cache.record(created.model_dump())
+    return created
 
 @router.get("/shipments", response_model=List[ShipmentResponse])
-async def list_shipments(limit: int = 100, skip: int = 0, repo: TransportationRepository = Depends(get_transport_repo)):
+async def list_shipments(
+    request: Request,
+    limit: int = 100,
+    skip: int = 0,
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
     """List all shipments"""
-    return await repo.get_all_shipments(limit=limit, skip=skip)
+    etag = await versions_etag(request, repo.db, ("shipments",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_shipments(limit=limit, skip=skip)
+    return tag_response(records_response(rows, ShipmentResponse), etag)
+
+@router.get("/shipments/board", response_model=ShipmentBoardPage)
+async def shipment_board(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    shipment_status: Optional[str] = Query(None, alias="status", pattern="^(planned|in_transit)$"),
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
+    """
+    Active shipments with order, customer, vehicle, driver, route and delay,
+    newest first. Send the ETag back as If-None-Match to get 304 when the
+    page is unchanged.
+    """
+    # Delays are projected from the current minute, so the page changes with it
+    etag = await versions_etag(
+        request, repo.db, BOARD_TABLES, replica=True, extra=str(int(time.time() // 60))
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_shipment_board(limit + 1, cursor, shipment_status)
+    page = ShipmentBoardPage(
+        items=rows[:limit],
+        next_cursor=rows[limit - 1].shipment_id if len(rows) > limit else None,
+    )
+    return tag_response(JSONResponse(content=jsonable_encoder(page)), etag)
+
+@router.post("/shipments/events", response_model=ShipmentEventAccepted, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_shipment_events(batch: ShipmentEventBatch):
+    """
+    Accept status events (departed / arrived / delayed) from drivers' devices.
+    Events are queued and written in batches, updating shipment status and
+    actual departure/arrival times; 503 with Retry-After when the queue is full.
+    """
+    try:
+        accepted = shipment_event_writer.submit([e.model_dump() for e in batch.events])
+    except ServiceBusyError as e:
+        raise service_busy_exception(e.message, e.retry_after)
+    return ShipmentEventAccepted(accepted=accepted, queued=shipment_event_writer.queued)
+
+# ========== Availability ==========
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+    window_start: datetime = Query(..., alias="from"),
+    window_end: datetime = Query(..., alias="to"),
+    repo: TransportationRepository = Depends(get_transport_repo)
+):
+    """Active vehicles and drivers with no open shipment overlapping the window"""
+    if window_start >= window_end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+
+    index = await availability_cache.get(repo.get_open_bookings)
+    vehicles = await repo.get_active_vehicles()
+    drivers = await repo.get_active_drivers()
+    return AvailabilityResponse(
+        window_start=window_start,
+        window_end=window_end,
+        vehicles=[v for v in vehicles if index.vehicle_conflict(v.vehicle_id, window_start, window_end) is None],
+        drivers=[d for d in drivers if index.driver_conflict(d.driver_id, window_start, window_end) is None],
+    )
+
+# ========== Load Planning ==========
+
+@router.post("/load-plan", response_model=LoadPlanResponse)
+async def create_load_plan(request: LoadPlanRequest, repo: TransportationRepository = Depends(get_transport_repo)):
+    """
+    Pack the open orders of a warehouse into the available vehicles by weight
+    and volume, using as few vehicles as possible. The plan is not persisted.
+    """
+    orders = await repo.get_open_order_loads(request.warehouse_id, request.order_statuses)
+    vehicles = await repo.get_available_vehicles(request.vehicle_ids)
+
+    started = time.perf_counter()
+    # Bin packing is CPU-bound; keep it off the event loop
+    plan = await asyncio.to_thread(
+        plan_loads,
+        [o["order_id"] for o in orders],
+        [o["weight_kg"] for o in orders],
+        [o["volume_cubic_meters"] for o in orders],
+        [v["vehicle_id"] for v in vehicles],
+        [v["capacity_kg"] for v in vehicles],
+        [v["capacity_cubic_meters"] for v in vehicles],
+    )
+    solve_ms = (time.perf_counter() - started) * 1000
+
+    by_id = {v["vehicle_id"]: v for v in vehicles}
+    loads = []
+    for vehicle_id, order_ids, weight, volume in plan["loads"]:
+        vehicle = by_id[vehicle_id]
+        loads.append(VehicleLoad(
+            vehicle_id=vehicle_id,
+            vehicle_number=vehicle["vehicle_number"],
+            order_ids=order_ids,
+            total_weight_kg=round(weight, 2),
+            total_volume_cubic_meters=round(volume, 4),
+            weight_utilization=round(weight / vehicle["capacity_kg"] * 100, 2),
+            volume_utilization=round(volume / vehicle["capacity_cubic_meters"] * 100, 2),
+        ))
+
+    return LoadPlanResponse(
+        warehouse_id=request.warehouse_id,
+        total_orders=len(orders),
+        vehicles_used=len(loads),
+        loads=loads,
+        unassigned_order_ids=plan["unassigned"],
+        solve_ms=round(solve_ms, 2),
+    )
+
+# ========== Dispatch Planning ==========
+
+@router.post("/dispatch-plan", response_model=DispatchPlanResponse)
+async def create_dispatch_plan(request: DispatchPlanRequest, repo: TransportationRepository = Depends(get_transport_repo)):
+    """
+    Assign vehicles and drivers to planned shipments in one batch.
+    Vehicles are matched on capacity fit, drivers on booked hours, and
+    neither may overlap an existing booking. With `commit` the whole plan
+    is written in a single UPDATE; otherwise it is only returned.
+    """
+    shipments = await repo.get_planned_shipments(request.shipment_ids)
+    vehicles = [v.model_dump() for v in await repo.get_active_vehicles()]
+    drivers = [d.model_dump() for d in await repo.get_active_drivers()]
+    index = await availability_cache.get(repo.get_open_bookings)
+
+    started = time.perf_counter()
+    # Hungarian solve is CPU-bound; run it in the worker process
+    result = await run_dispatch_solver(*build_solver_inputs(shipments, vehicles, drivers, index))
+    solve_ms = (time.perf_counter() - started) * 1000
+
+    by_id = {s["shipment_id"]: s for s in shipments}
+    assigned = [(sid, vid, did) for sid, vid, did in result if vid is not None and did is not None]
+    unassigned = [sid for sid, vid, did in result if vid is None or did is None]
+
+    committed = False
+    if request.commit and assigned:
+        try:
+            updated = set(await repo.apply_dispatch_assignments(assigned))
+        except SchedulingConflictError as e:
+            # Booked by another worker since our index was loaded
+            availability_cache.invalidate()
+            raise scheduling_conflict_exception(e.message)
+        # Shipments that left 'planned' meanwhile were not touched
+        unassigned += [sid for sid, _, _ in assigned if sid not in updated]
+        assigned = [a for a in assigned if a[0] in updated]
+        availability_cache.invalidate()
+        committed = True
+
+    return DispatchPlanResponse(
+        planned_shipments=len(shipments),
+        assignments=[
+            DispatchAssignment(
+                shipment_id=sid,
+                vehicle_id=vid,
+                driver_id=did,
+                previous_vehicle_id=by_id[sid]["vehicle_id"],
+                previous_driver_id=by_id[sid]["driver_id"],
+            )
+            for sid, vid, did in assigned
+        ],
+        unassigned_shipment_ids=sorted(unassigned),
+        committed=committed,
+        solve_ms=round(solve_ms, 2),
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from typing import List, Optional
 from app.database import get_db, Database
 from app.repositories.warehouses_repositories import WarehouseRepository
@@ -8,9 +8,14 @@ from app.models.warehouse import (
     WarehouseUtilization
 )
 from app.utils.exceptions import resource_not_found_exception
+from app.utils.serialization import records_response
+from app.utils.http_cache import versions_etag, etag_matches, not_modified, tag_response
 
 router = APIRouter(prefix="/warehouses", tags=["Warehouses"])
 
+# Tables behind each read, for version-based ETags
+UTILIZATION_TABLES = ("warehouses", "inventory", "products")
+
 
 def get_warehouse_repo(db: Database = Depends(get_db)) -> WarehouseRepository:
     """Dependency for warehouse repository"""
@@ -30,24 +35,35 @@ async def create_warehouse(
 
 @router.get("/", response_model=List[WarehouseResponse])
 async def get_warehouses(
+    request: Request,
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     repo: WarehouseRepository = Depends(get_warehouse_repo)
 ):
     """Get all warehouses with optional filtering"""
-    return await repo.get_all_warehouses(is_active=is_active, skip=skip, limit=limit)
+    etag = await versions_etag(request, repo.db, ("warehouses",), replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows = await repo.get_all_warehouses(is_active=is_active, skip=skip, limit=limit)
+    return tag_response(records_response(rows, WarehouseResponse), etag)
 
 
 @router.get("/{warehouse_id}", response_model=WarehouseResponse)
 async def get_warehouse(
     warehouse_id: int,
+    request: Request,
+    response: Response,
     repo: WarehouseRepository = Depends(get_warehouse_repo)
 ):
     """Get warehouse by ID"""
+    etag = await versions_etag(request, repo.db, ("warehouses",))
+    if etag_matches(request, etag):
+        return not_modified(etag)
     warehouse = await repo.get_warehouse_by_id(warehouse_id)
     if not warehouse:
         raise resource_not_found_exception("Warehouse", str(warehouse_id))
+    tag_response(response, etag)
     return warehouse
 
 
@@ -78,12 +94,18 @@ async def delete_warehouse(
 @router.get("/{warehouse_id}/utilization", response_model=WarehouseUtilization)
 async def get_warehouse_utilization(
     warehouse_id: int,
+    request: Request,
+    response: Response,
     repo: WarehouseRepository = Depends(get_warehouse_repo)
 ):
     """Get warehouse capacity utilization metrics"""
+    etag = await versions_etag(request, repo.db, UTILIZATION_TABLES, replica=True)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     utilization = await repo.get_warehouse_utilization(warehouse_id)
     if not utilization:
         raise resource_not_found_exception("Warehouse", str(warehouse_id))
+    tag_response(response, etag)
     return utilization
 
 
@@ -108,10 +130,14 @@ async def create_zone(
 @router.get("/{warehouse_id}/zones", response_model=List[ZoneResponse])
 async def get_warehouse_zones(
     warehouse_id: int,
+    request: Request,
     repo: WarehouseRepository = Depends(get_warehouse_repo)
 ):
     """Get all zones for a warehouse"""
-    return await repo.get_zones_by_warehouse(warehouse_id)
+    etag = await versions_etag(request, repo.db, ("zones",))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return tag_response(records_response(await repo.get_zones_by_warehouse(warehouse_id), ZoneResponse), etag)
 
 
 # ========== Bin Endpoints ==========
@@ -130,7 +156,11 @@ async def create_bin(
 @router.get("/zones/{zone_id}/bins", response_model=List[BinResponse])
 async def get_zone_bins(
     zone_id: int,
+    request: Request,
     repo: WarehouseRepository = Depends(get_warehouse_repo)
 ):
     """Get all bins for a zone"""
-    return await repo.get_bins_by_zone(zone_id)
\ No newline at end of file
+    etag = await versions_etag(request, repo.db, ("bins",))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return tag_response(records_response(await repo.get_bins_by_zone(zone_id), BinResponse), etag)
\ No newline at end of file
@@ -16,9 +16,86 @@ class Settings(BaseSettings):
     DB_POOL_MAX_SIZE: int = 20
     DB_POOL_TIMEOUT: int = 30
     DB_COMMAND_TIMEOUT: int = 60
+    # Per-request statement budgets (seconds): GET requests in general, and
+    # analytics / movement history; writes keep DB_COMMAND_TIMEOUT
+    DB_READ_TIMEOUT_SECONDS: float = 10.0
+    DB_REPORT_TIMEOUT_SECONDS: float = 30.0
+    # Prepare the registered hot statements on every new connection; turn off
+    # behind PgBouncer / Neon's pooled endpoint in transaction mode
+    DB_PREPARED_STATEMENTS: bool = True
+    
+    # Optional read replica for heavy read-only queries; used only while its
+    # replication lag is within DB_REPLICA_MAX_LAG_SECONDS, else the primary
+    DATABASE_READ_URL: str = ""
+    DB_READ_POOL_MIN_SIZE: int = 2
+    DB_READ_POOL_MAX_SIZE: int = 20
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 2.0
+    
+    # Per-statement query statistics (/debug/queries) and the slow-query log;
+    # a sample of slow reads is re-run under EXPLAIN (ANALYZE, BUFFERS)
+    QUERY_STATS_ENABLED: bool = True
+    QUERY_STATS_MAX_STATEMENTS: int = 500
+    QUERY_SLOW_MS: float = 500.0
+    QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    QUERY_EXPLAIN_MIN_INTERVAL_SECONDS: float = 300.0
+    
+    # /health serves cached state; the primary is probed only when idle this long
+    DB_HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = True
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    
+    # Admission control: adaptive limit on concurrent API requests, a bounded
+    # priority queue, and 503 + Retry-After once the wait would exceed the
+    # class budget (critical: stock movements, low: analytics and planning)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 20
+    ADMISSION_MIN_LIMIT: int = 4
+    ADMISSION_MAX_LIMIT: int = 64
+    ADMISSION_MAX_QUEUE: int = 200
+    ADMISSION_BUDGET_CRITICAL_SECONDS: float = 5.0
+    ADMISSION_BUDGET_NORMAL_SECONDS: float = 2.0
+    ADMISSION_BUDGET_LOW_SECONDS: float = 0.5
+    ADMISSION_BACKOFF: float = 0.9
+    ADMISSION_LATENCY_TOLERANCE: float = 2.0
+    ADMISSION_LATENCY_FLOOR_MS: float = 50.0
     
     # API
     API_V1_PREFIX: str = "/api/v1"
+    # gzip for response bodies of at least GZIP_MIN_SIZE bytes (not chat streams)
+    GZIP_ENABLED: bool = True
+    GZIP_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 5
+    
+    # Customer search (picker) result cache
+    CUSTOMER_SEARCH_CACHE_SIZE: int = 2048
+    CUSTOMER_SEARCH_CACHE_TTL_SECONDS: float = 30.0
+    
+    # Multi-hop route graph (rebuilt after route writes or when the TTL expires)
+    ROUTE_GRAPH_TTL_SECONDS: float = 300.0
+    
+    # Vehicle/driver booking index (full reload picks up other workers' bookings)
+    AVAILABILITY_INDEX_TTL_SECONDS: float = 60.0
+    
+    # Batch dispatch solver (runs in worker processes)
+    DISPATCH_SOLVER_WORKERS: int = 1
+    
+    # Shipment status events (queued in memory, flushed in batches)
+    SHIPMENT_EVENT_QUEUE_SIZE: int = 10000
+    SHIPMENT_EVENT_BATCH_SIZE: int = 500
+    SHIPMENT_EVENT_FLUSH_INTERVAL_MS: int = 200
+    
+    # Bulk order imports (app-owned background jobs); per-statement budget
+    # covering COPY, set-based validation and INSERT ... SELECT of a nightly file
+    ORDER_IMPORT_STATEMENT_TIMEOUT_SECONDS: float = 3600.0
+    
+    # Performance and movement volume rollups (refreshed incrementally in the background)
+    ANALYTICS_REFRESH_INTERVAL_SECONDS: float = 60.0
+    ANALYTICS_ROLLUP_LAG_SECONDS: float = 30.0
+    ANALYTICS_SHIPMENT_BATCH_SIZE: int = 50000
+    ANALYTICS_MOVEMENT_BATCH_SIZE: int = 200000
     
     # CORS - Allow your Lovable frontend
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
@@ -26,9 +103,30 @@ class Settings(BaseSettings):
     # Security (if implementing authentication later)
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_REVOKED_TOKENS_MAX: int = 100000
+    # Password hashing (bcrypt cost; hashes with another cost are upgraded on login)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    
+    # Diagnostics (/debug/*); keep off in production
+    DEBUG_ENDPOINTS_ENABLED: bool = False
     
     # Gemini AI
     GEMINI_API_KEY: str = ""
+    
+    # Chat assistant ("gemini", or "stub" for a deterministic offline model)
+    CHAT_PROVIDER: str = "gemini"
+    CHAT_MODEL: str = "gemini-2.0-flash"
+    CHAT_TIMEOUT_SECONDS: float = 30.0
+    CHAT_MAX_CONCURRENCY: int = 16
+    CHAT_STUB_LATENCY_MS: int = 0
+    CHAT_TOOL_CACHE_SIZE: int = 256
+    CHAT_TOOL_MAX_ROWS: int = 25
+    CHAT_TOOL_PAYLOAD_MAX_BYTES: int = 8192
+    CHAT_MAX_TOOL_ROUNDS: int = 3
         
     class Config:
         env_file = ".env"
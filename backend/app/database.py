@@ -1,17 +1,124 @@
 import asyncpg
-from typing import Optional
-from contextlib import asynccontextmanager
+import asyncio
+import time
+from functools import partial
+from typing import Dict, Optional, Tuple
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from app.config import settings
+from app.utils.query_stats import query_stats, row_count, EXPLAIN_MARKER
+from app.utils.exceptions import QueryTimeoutError
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Set by Database.statement_timeout(): seconds each statement in this context
+# may run (None: the pool's DB_COMMAND_TIMEOUT)
+_statement_timeout: ContextVar[Optional[float]] = ContextVar("statement_timeout", default=None)
+
+# Seconds the replica is behind; 0 when it is streaming and has replayed
+# everything it received (an idle primary sends nothing, so replay timestamps
+# alone would look stale). With the WAL receiver down, received = replayed
+# says nothing, so the age of the last replayed transaction counts; NULL if
+# nothing was replayed yet (lag unknown).
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+             AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END::float8
+"""
+
+# Failures that mean "replica unreachable" (retry on the primary), as opposed
+# to errors in the query itself
+REPLICA_CONNECTION_ERRORS = (
+    OSError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.InterfaceError,
+)
+
+
+class StatementRegistry:
+    """
+    Canonical SQL of the hot repository queries, by name. Repositories
+    register their statements at import time; every new pool connection
+    prepares them up front (see _prepare_registered).
+    """
+
+    def __init__(self):
+        self.statements: Dict[str, Tuple[str, bool]] = {}
+
+    def register(self, name: str, sql: str, read_only: bool = True) -> str:
+        """Add a statement and return its SQL; read_only ones are prepared on the replica too"""
+        existing = self.statements.get(name)
+        if existing is not None and existing[0] != sql:
+            raise ValueError(f"Statement {name!r} is already registered with different SQL")
+        self.statements[name] = (sql, read_only)
+        return sql
+
+
+statements = StatementRegistry()
+
+
+async def _prepare_registered(conn, include_writes: bool) -> None:
+    """
+    Fill the connection's statement cache with the registered statements, so
+    even their first use on it pays no parse/plan round trip. conn.prepare()
+    would return separate statement objects that fetch()/execute() never use,
+    so this relies on asyncpg's private Connection._get_statement (checked
+    against the version pinned in requirements.txt); if that changes, the
+    warm-up is skipped and statements are prepared on first use as usual.
+    """
+    for name, (sql, read_only) in statements.statements.items():
+        if not (read_only or include_writes):
+            continue
+        try:
+            await conn._get_statement(sql, None)
+        except asyncpg.PostgresError as e:
+            logger.warning(f"Could not prepare statement {name}: {e}")
+        except (AttributeError, TypeError) as e:
+            logger.warning(f"Statement warm-up unavailable with asyncpg {asyncpg.__version__}: {e}")
+            return
+
+
+def _pool_options(pool_name: str) -> dict:
+    """
+    create_pool() options shared by the primary and replica pools. With
+    DB_PREPARED_STATEMENTS off (PgBouncer / Neon pooled endpoints in
+    transaction mode) nothing is prepared and asyncpg's statement cache is
+    disabled, since a prepared statement may not exist on the next backend.
+    """
+    prepared = settings.DB_PREPARED_STATEMENTS
+
+    async def init(conn):
+        if query_stats.enabled:
+            conn.add_query_logger(partial(query_stats.on_query, pool_name))
+        if prepared:
+            await _prepare_registered(conn, include_writes=pool_name == "primary")
+
+    options = {"init": init}
+    if not prepared:
+        options["statement_cache_size"] = 0
+    return options
+
 
 class Database:
     """Database connection pool manager for PostgreSQL"""
     
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        # Cached primary health for /health: last successful statement or probe
+        self.primary_ok_at = 0.0
+        self.primary_error: Optional[str] = None
+        self._health_monitor: Optional[asyncio.Task] = None
+        # Optional read replica (DATABASE_READ_URL) for heavy read-only queries
+        self.read_pool: Optional[asyncpg.Pool] = None
+        self.replica_healthy = False
+        self.replica_lag_seconds: Optional[float] = None
+        self.replica_checked_at = 0.0
+        self._replica_monitor: Optional[asyncio.Task] = None
     
     async def connect(self):
         """Create database connection pool"""
@@ -22,44 +129,241 @@ class Database:
                 max_size=settings.DB_POOL_MAX_SIZE,
                 timeout=settings.DB_POOL_TIMEOUT,
                 command_timeout=settings.DB_COMMAND_TIMEOUT,
+                **_pool_options("primary"),
             )
             logger.info("Database connection pool created successfully")
         except Exception as e:
             logger.error(f"Failed to create database pool: {e}")
             raise
+        query_stats.explainer = self._explain
+        self._mark_primary_ok()
+        self._health_monitor = asyncio.create_task(self._monitor_primary())
+        if settings.DATABASE_READ_URL:
+            # A missing replica never blocks startup; reads use the primary
+            # until the monitor reaches it
+            await self._check_replica()
+            self._replica_monitor = asyncio.create_task(self._monitor_replica())
     
     async def disconnect(self):
         """Close database connection pool"""
+        for task in (self._health_monitor, self._replica_monitor):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._health_monitor = self._replica_monitor = None
+        if self.read_pool:
+            await self.read_pool.close()
+            self.read_pool = None
+            logger.info("Read replica connection pool closed")
         if self.pool:
             await self.pool.close()
             logger.info("Database connection pool closed")
     
-    async def fetch_one(self, query: str, *args):
-        """Execute query and fetch one row"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow(query, *args)
+    # ========== Health ==========
     
-    async def fetch_all(self, query: str, *args):
-        """Execute query and fetch all rows"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetch(query, *args)
+    def _mark_primary_ok(self):
+        self.primary_ok_at = time.monotonic()
+        self.primary_error = None
+    
+    async def _monitor_primary(self):
+        """Probe the primary only when no statement has succeeded on it recently"""
+        interval = settings.DB_HEALTH_CHECK_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            if time.monotonic() - self.primary_ok_at < interval:
+                continue
+            try:
+                await self.pool.fetchval("SELECT 1", timeout=settings.DB_POOL_TIMEOUT)
+            except Exception as e:
+                if self.primary_error is None:
+                    logger.error(f"Database health check failed: {e}")
+                self.primary_error = str(e)
+                continue
+            self._mark_primary_ok()
+    
+    def health(self) -> dict:
+        """Cached primary state (no query per call)"""
+        if self.pool is None or self.pool.is_closing():
+            return {"status": "unhealthy", "database": "disconnected"}
+        age = time.monotonic() - self.primary_ok_at
+        healthy = self.primary_error is None and age <= 3 * settings.DB_HEALTH_CHECK_INTERVAL_SECONDS
+        result = {
+            "status": "healthy" if healthy else "unhealthy",
+            "database": "connected" if healthy else "disconnected",
+            "last_ok_seconds_ago": round(age, 1),
+            "pool": {
+                "size": self.pool.get_size(),
+                "idle": self.pool.get_idle_size(),
+                "max": self.pool.get_max_size(),
+            },
+        }
+        if self.primary_error:
+            result["error"] = self.primary_error
+        if settings.DATABASE_READ_URL:
+            result["replica"] = self.replica_status()
+        return result
+    
+    # ========== Read replica ==========
+    
+    async def _check_replica(self):
+        """Connect if needed, measure replication lag and update replica_healthy"""
+        try:
+            if self.read_pool is None:
+                self.read_pool = await asyncpg.create_pool(
+                    dsn=settings.DATABASE_READ_URL,
+                    min_size=settings.DB_READ_POOL_MIN_SIZE,
+                    max_size=settings.DB_READ_POOL_MAX_SIZE,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    command_timeout=settings.DB_COMMAND_TIMEOUT,
+                    **_pool_options("replica"),
+                )
+                logger.info("Read replica connection pool created")
+            lag = await self.read_pool.fetchval(REPLICA_LAG_QUERY, timeout=settings.DB_POOL_TIMEOUT)
+        except Exception as e:
+            self._set_replica_health(False, None, f"unreachable ({e})")
+            return
+        if lag is None:
+            self._set_replica_health(False, None, "not streaming, lag unknown")
+        elif lag <= settings.DB_REPLICA_MAX_LAG_SECONDS:
+            self._set_replica_health(True, lag, "in sync")
+        else:
+            self._set_replica_health(False, lag, f"{lag:.1f}s behind")
+    
+    def _set_replica_health(self, healthy: bool, lag: Optional[float], reason: str):
+        if healthy != self.replica_healthy:
+            if healthy:
+                logger.info(f"Read replica {reason}; routing read-only queries to it")
+            else:
+                logger.warning(f"Read replica {reason}; read-only queries fall back to the primary")
+        self.replica_healthy = healthy
+        self.replica_lag_seconds = lag
+        self.replica_checked_at = time.time()
+    
+    async def _monitor_replica(self):
+        while True:
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL_SECONDS)
+            await self._check_replica()
+    
+    def replica_status(self) -> dict:
+        return {
+            "configured": bool(settings.DATABASE_READ_URL),
+            "healthy": self.replica_healthy,
+            "lag_seconds": self.replica_lag_seconds,
+            "max_lag_seconds": settings.DB_REPLICA_MAX_LAG_SECONDS,
+            "checked_at": self.replica_checked_at or None,
+        }
+    
+    @contextmanager
+    def statement_timeout(self, seconds: Optional[float]):
+        """
+        Cap every statement in this block (and tasks started in it) at
+        `seconds`; one that runs longer is cancelled on the server and
+        raises QueryTimeoutError
+        """
+        token = _statement_timeout.set(seconds)
+        try:
+            yield
+        finally:
+            _statement_timeout.reset(token)
+    
+    async def _fetch(self, method: str, query: str, args: tuple, replica: bool):
+        """
+        Run on the replica when asked for and currently within the staleness
+        tolerance, otherwise (or if the replica connection fails) on the primary.
+        """
+        if replica and self.replica_healthy:
+            try:
+                return await self._run(self.read_pool, "replica", method, query, args)
+            except REPLICA_CONNECTION_ERRORS as e:
+                self._set_replica_health(False, None, f"connection failed ({e})")
+        return await self._run(self.pool, "primary", method, query, args)
+    
+    # ========== Instrumentation ==========
+    
+    async def _run(self, pool: asyncpg.Pool, pool_name: str, method: str, query: str, args: tuple):
+        """One statement on a pooled connection, recording acquire wait and rows"""
+        timeout = _statement_timeout.get()
+        started = time.perf_counter()
+        async with pool.acquire() as conn:
+            query_stats.record_acquire(pool_name, (time.perf_counter() - started) * 1000, query)
+            try:
+                result = await getattr(conn, method)(query, *args, timeout=timeout)
+            except asyncio.TimeoutError:
+                # asyncpg has already cancelled it server-side; the connection is reusable.
+                # Without a budget it was the pool's command_timeout that fired
+                raise QueryTimeoutError(timeout if timeout is not None else settings.DB_COMMAND_TIMEOUT) from None
+        if pool is self.pool:
+            self._mark_primary_ok()
+        query_stats.record_rows(query, row_count(result))
+        return result
+    
+    async def _explain(self, pool_name: str, query: str, args: tuple, timeout_ms: int) -> str:
+        """EXPLAIN (ANALYZE, BUFFERS) a read in a read-only transaction that is rolled back"""
+        pool = self.read_pool if pool_name == "replica" and self.read_pool else self.pool
+        async with pool.acquire() as conn:
+            tr = conn.transaction(readonly=True)
+            await tr.start()
+            try:
+                await conn.execute(f"{EXPLAIN_MARKER} SET LOCAL statement_timeout = {int(timeout_ms)}")
+                rows = await conn.fetch(f"{EXPLAIN_MARKER} EXPLAIN (ANALYZE, BUFFERS) {query}", *args)
+            finally:
+                await tr.rollback()
+        return "\n".join(row[0] for row in rows)
+    
+    # ========== Queries ==========
+    
+    async def fetch_one(self, query: str, *args, replica: bool = False):
+        """Execute query and fetch one row (replica=True: read-only, may be slightly stale)"""
+        return await self._fetch("fetchrow", query, args, replica)
+    
+    async def fetch_all(self, query: str, *args, replica: bool = False):
+        """Execute query and fetch all rows (replica=True: read-only, may be slightly stale)"""
+        return await self._fetch("fetch", query, args, replica)
     
     async def execute(self, query: str, *args):
         """Execute query without returning results"""
-        async with self.pool.acquire() as conn:
-            return await conn.execute(query, *args)
+        return await self._run(self.pool, "primary", "execute", query, args)
     
     async def execute_many(self, query: str, args_list):
         """Execute query multiple times with different parameters"""
+        return await self._run(self.pool, "primary", "executemany", query, (args_list,))
+
+    async def copy_to_table(self, table_name: str, **kwargs):
+        """Bulk load a file or stream into a table using COPY"""
         async with self.pool.acquire() as conn:
-            return await conn.executemany(query, args_list)
-    
+            return await conn.copy_to_table(table_name, **kwargs)
+
+    async def copy_records_to_table(self, table_name: str, **kwargs):
+        """Bulk load an iterable of tuples into a table using COPY"""
+        async with self.pool.acquire() as conn:
+            return await conn.copy_records_to_table(table_name, **kwargs)
+
+    async def copy_from_query(self, query: str, *args, **kwargs):
+        """Export query results using COPY ... TO STDOUT"""
+        async with self.pool.acquire() as conn:
+            return await conn.copy_from_query(query, *args, **kwargs)
+
     @asynccontextmanager
     async def transaction(self):
         """Context manager for database transactions"""
+        timeout = _statement_timeout.get()
+        started = time.perf_counter()
         async with self.pool.acquire() as conn:
-            async with conn.transaction():
-                yield conn
+            query_stats.record_acquire("primary", (time.perf_counter() - started) * 1000)
+            try:
+                async with conn.transaction():
+                    if timeout is not None:
+                        # Statements on `conn` bypass _run, so the server enforces it
+                        await conn.execute(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+                    yield conn
+            except asyncpg.QueryCanceledError:
+                if timeout is None:
+                    raise
+                raise QueryTimeoutError(timeout) from None
+            self._mark_primary_ok()
 
 
 # Global database instance
@@ -68,4 +372,4 @@ db = Database()
 
 async def get_db():
     """Dependency for FastAPI routes"""
-    return db
\ No newline at end of file
+    return db
@@ -1,11 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 
 from app.config import settings
 from app.database import db
-from app.api import warehouses, inventory, auth, chat, orders, transportation
+from app.api import warehouses, inventory, auth, chat, orders, transportation, analytics, debug
+from app.services.dispatch_optimizer import start_solver_pool, shutdown_solver_pool
+from app.utils.auth import password_hasher
+from app.utils import metrics
+from app.utils.admission import AdmissionMiddleware, admission_controller
+from app.utils.http_cache import SelectiveGZipMiddleware
+from app.utils.deadlines import DeadlineMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -22,11 +28,22 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up WTMS application...")
     await db.connect()
     logger.info("Database connection pool established")
+    start_solver_pool(settings.DISPATCH_SOLVER_WORKERS)
+    await transportation.shipment_event_writer.start()
+    await analytics.rollup_refresher.start(analytics.get_analytics_repo())
+    if settings.METRICS_ENABLED:
+        metrics.loop_lag_monitor.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down WTMS application...")
+    await metrics.loop_lag_monitor.stop()
+    await analytics.rollup_refresher.stop()
+    await transportation.shipment_event_writer.stop()
+    await orders.order_import_runner.stop()
+    shutdown_solver_pool()
+    password_hasher.shutdown()
     await db.disconnect()
     logger.info("Database connection pool closed")
 
@@ -39,6 +56,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Admission control / load shedding (innermost, so 503s still get CORS headers)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Statement budgets per route; reads are cancelled when the client goes away
+app.add_middleware(DeadlineMiddleware)
+
 # CORS middleware - Allow frontend to connect
 app.add_middleware(
     CORSMiddleware,
@@ -46,8 +70,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, PUT, DELETE)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["ETag"],  # Let the frontend send it back as If-None-Match
 )
 
+# Compression; chat replies are server-sent events and must not be buffered
+if settings.GZIP_ENABLED:
+    app.add_middleware(
+        SelectiveGZipMiddleware,
+        minimum_size=settings.GZIP_MIN_SIZE,
+        compresslevel=settings.GZIP_LEVEL,
+        exclude_prefixes=(f"{settings.API_V1_PREFIX}/chat",)
+    )
+
+# Request metrics (outermost, so CORS preflights are counted too)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(warehouses.router, prefix=settings.API_V1_PREFIX)
 app.include_router(inventory.router, prefix=settings.API_V1_PREFIX)
@@ -55,6 +93,9 @@ app.include_router(auth.router, prefix=settings.API_V1_PREFIX)
 app.include_router(chat.router, prefix=settings.API_V1_PREFIX)
 app.include_router(orders.router, prefix=settings.API_V1_PREFIX)
 app.include_router(transportation.router, prefix=settings.API_V1_PREFIX)
+app.include_router(analytics.router, prefix=settings.API_V1_PREFIX)
+if settings.DEBUG_ENDPOINTS_ENABLED:
+    app.include_router(debug.router, prefix=settings.API_V1_PREFIX)
 
 
 @app.get("/")
@@ -70,21 +111,15 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    try:
-        # Simple query to verify database connectivity
-        await db.fetch_one("SELECT 1 as health_check")
-        return {
-            "status": "healthy",
-            "database": "connected"
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return {
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e)
-        }
+    """Health check endpoint (cached pool state; probes run no query)"""
+    return db.health()
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus scrape endpoint"""
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
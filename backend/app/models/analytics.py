@@ -0,0 +1,44 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date, datetime
+
+# ============================================
+# PERFORMANCE ANALYTICS MODELS
+# ============================================
+
+class RoutePerformance(BaseModel):
+    route_id: int
+    origin_city: str
+    destination_city: str
+    distance_km: float
+    estimated_hours: float
+    total_shipments: int
+    delivered_shipments: int
+    avg_actual_hours: Optional[float] = None
+    avg_delay_hours: Optional[float] = None
+
+class DriverPerformance(BaseModel):
+    driver_id: int
+    driver_name: str
+    total_shipments: int
+    completed_shipments: int
+    completion_rate: float
+    avg_trip_hours: Optional[float] = None
+
+class MovementVolume(BaseModel):
+    period: date
+    movement_type: str
+    movement_count: int
+    quantity_in: int
+    quantity_out: int
+
+class RollupRefreshResponse(BaseModel):
+    refreshed: bool
+    watermark: Optional[datetime] = None
+    route_days: int = 0
+    driver_days: int = 0
+    last_id: Optional[int] = None
+    movements: int = 0
+    movement_days: int = 0
+    # False when a batch limit stopped the refresh short of now - lag
+    caught_up: bool = True
@@ -77,3 +77,20 @@ class OrderResponse(OrderBase):
     created_at: datetime
     updated_at: datetime
     items: Optional[List[OrderItemResponse]] = None
+
+# ============================================
+# ORDER IMPORT MODELS
+# ============================================
+
+class OrderImportJobResponse(BaseModel):
+    job_id: int
+    file_name: Optional[str] = None
+    status: str
+    total_lines: int
+    rejected_lines: int
+    imported_orders: int
+    imported_lines: int
+    error_message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
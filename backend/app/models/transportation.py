@@ -81,6 +81,18 @@ class RouteResponse(RouteBase):
     route_id: int
     created_at: datetime
 
+class RouteLeg(RouteBase):
+    route_id: int
+
+class RoutePathResponse(BaseModel):
+    origin_city: str
+    destination_city: str
+    metric: str
+    total_distance_km: float
+    total_hours: float
+    hops: int
+    legs: List[RouteLeg]
+
 # ============================================
 # SHIPMENT MODELS
 # ============================================
@@ -116,3 +128,95 @@ class ShipmentResponse(ShipmentBase):
     shipment_number: str
     created_at: datetime
     updated_at: datetime
+
+class ShipmentEventCreate(BaseModel):
+    shipment_id: int
+    event_type: str = Field(..., pattern="^(departed|arrived|delayed)$")
+    occurred_at: Optional[datetime] = None
+    notes: Optional[str] = None
+
+class ShipmentEventBatch(BaseModel):
+    events: List[ShipmentEventCreate] = Field(..., min_length=1, max_length=1000)
+
+class ShipmentEventAccepted(BaseModel):
+    accepted: int
+    queued: int
+
+class ShipmentBoardRow(BaseModel):
+    shipment_id: int
+    shipment_number: str
+    status: str
+    order_id: int
+    order_number: str
+    customer_name: str
+    vehicle_id: int
+    vehicle_number: str
+    driver_id: int
+    driver_name: str
+    route_id: int
+    origin_city: str
+    destination_city: str
+    scheduled_departure: Optional[datetime] = None
+    scheduled_arrival: Optional[datetime] = None
+    actual_departure: Optional[datetime] = None
+    projected_arrival: Optional[datetime] = None
+    delay_minutes: Optional[int] = None
+
+class ShipmentBoardPage(BaseModel):
+    items: List[ShipmentBoardRow]
+    next_cursor: Optional[int] = None
+
+
+class AvailabilityResponse(BaseModel):
+    window_start: datetime
+    window_end: datetime
+    vehicles: List[VehicleResponse]
+    drivers: List[DriverResponse]
+
+# ============================================
+# LOAD PLANNING MODELS
+# ============================================
+
+class LoadPlanRequest(BaseModel):
+    warehouse_id: int
+    vehicle_ids: Optional[List[int]] = None
+    order_statuses: List[str] = Field(default_factory=lambda: ["pending", "confirmed"])
+
+class VehicleLoad(BaseModel):
+    vehicle_id: int
+    vehicle_number: str
+    order_ids: List[int]
+    total_weight_kg: float
+    total_volume_cubic_meters: float
+    weight_utilization: float
+    volume_utilization: float
+
+class LoadPlanResponse(BaseModel):
+    warehouse_id: int
+    total_orders: int
+    vehicles_used: int
+    loads: List[VehicleLoad]
+    unassigned_order_ids: List[int]
+    solve_ms: float
+
+# ============================================
+# DISPATCH PLANNING MODELS
+# ============================================
+
+class DispatchPlanRequest(BaseModel):
+    shipment_ids: Optional[List[int]] = None
+    commit: bool = True
+
+class DispatchAssignment(BaseModel):
+    shipment_id: int
+    vehicle_id: int
+    driver_id: int
+    previous_vehicle_id: int
+    previous_driver_id: int
+
+class DispatchPlanResponse(BaseModel):
+    planned_shipments: int
+    assignments: List[DispatchAssignment]
+    unassigned_shipment_ids: List[int]
+    committed: bool
+    solve_ms: float
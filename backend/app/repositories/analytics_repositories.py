@@ -0,0 +1,325 @@
+from typing import List, Optional
+from asyncpg import Record
+from datetime import date
+from app.database import Database
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHIPMENT_ROLLUP = "shipment_performance"
+MOVEMENT_ROLLUP = "movement_volume"
+
+GRANULARITIES = ("day", "week", "month")
+
+# A shipment finishes on DATE(COALESCE(actual_arrival, updated_at)); matches
+# the expression indexes in sql/08_shipment_rollups.sql
+FINISHED = "status IN ('delivered', 'cancelled')"
+
+
+class AnalyticsRepository:
+    """Rollup tables for performance analytics and their incremental refresh"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    # ========== Rollup Refresh ==========
+    async def refresh_shipment_rollups(self, lag_seconds: float, batch_size: int) -> Optional[dict]:
+        """
+        Recompute the (route, day) and (driver, day) rows of shipments
+        touched since the watermark, then advance it to now - lag, or only
+        as far as the batch_size-th touched shipment (with its ties) so a
+        first backfill runs as a series of bounded refreshes. Both the
+        keys they fall under now and the keys they were last counted under
+        (shipment_rollup_days) are recomputed, so a shipment whose day moved
+        or that is no longer finished leaves its old row.
+        The lag leaves room for transactions still in flight whose
+        updated_at is already in the past. Returns None if another session
+        holds the refresh lock.
+        """
+        async with self.db.transaction() as conn:
+            locked = await conn.fetchval("SELECT pg_try_advisory_xact_lock(hashtext($1))", SHIPMENT_ROLLUP)
+            if not locked:
+                return None
+
+            low = await conn.fetchval(
+                "SELECT watermark FROM rollup_watermarks WHERE rollup_name = $1 FOR UPDATE",
+                SHIPMENT_ROLLUP
+            )
+            target = await conn.fetchval("SELECT LOCALTIMESTAMP - make_interval(secs => $1)", lag_seconds)
+            batch_end = await conn.fetchval(
+                """
+                SELECT updated_at FROM shipments
+                WHERE updated_at > $1
+                ORDER BY updated_at
+                OFFSET $2 - 1 LIMIT 1
+                """,
+                low, batch_size
+            )
+            high = min(target, batch_end) if batch_end is not None else target
+            if low is not None and high <= low:
+                return {"watermark": low, "route_days": 0, "driver_days": 0, "caught_up": True}
+
+            route_days = await self._recompute_days(conn, "route_daily_stats", "route_id", """
+                COUNT(*),
+                COUNT(*) FILTER (WHERE s.status = 'delivered'),
+                COALESCE(SUM(EXTRACT(EPOCH FROM (s.actual_arrival - s.actual_departure)) / 3600)
+                         FILTER (WHERE s.actual_arrival IS NOT NULL AND s.actual_departure IS NOT NULL), 0)::float8,
+                COUNT(*) FILTER (WHERE s.actual_arrival IS NOT NULL AND s.actual_departure IS NOT NULL),
+                COALESCE(SUM(EXTRACT(EPOCH FROM (s.actual_arrival - s.scheduled_arrival)) / 3600)
+                         FILTER (WHERE s.actual_arrival IS NOT NULL AND s.scheduled_arrival IS NOT NULL), 0)::float8,
+                COUNT(*) FILTER (WHERE s.actual_arrival IS NOT NULL AND s.scheduled_arrival IS NOT NULL)
+            """, (
+                "shipments", "delivered", "trip_hours_sum", "trip_count", "delay_hours_sum", "delay_count"
+            ), low, high)
+            driver_days = await self._recompute_days(conn, "driver_daily_stats", "driver_id", """
+                COUNT(*),
+                COUNT(*) FILTER (WHERE s.status = 'delivered'),
+                COALESCE(SUM(EXTRACT(EPOCH FROM (s.actual_arrival - s.actual_departure)) / 3600)
+                         FILTER (WHERE s.actual_arrival IS NOT NULL AND s.actual_departure IS NOT NULL), 0)::float8,
+                COUNT(*) FILTER (WHERE s.actual_arrival IS NOT NULL AND s.actual_departure IS NOT NULL)
+            """, ("shipments", "delivered", "trip_hours_sum", "trip_count"), low, high)
+
+            # Remember where each touched shipment is counted now
+            await conn.execute(
+                f"""
+                INSERT INTO shipment_rollup_days (shipment_id, route_id, driver_id, day)
+                SELECT shipment_id, route_id, driver_id, COALESCE(actual_arrival, updated_at)::date
+                FROM shipments
+                WHERE {FINISHED} AND updated_at > $1 AND updated_at <= $2
+                ON CONFLICT (shipment_id) DO UPDATE SET
+                    route_id = EXCLUDED.route_id,
+                    driver_id = EXCLUDED.driver_id,
+                    day = EXCLUDED.day
+                """,
+                low, high
+            )
+            await conn.execute(
+                f"""
+                DELETE FROM shipment_rollup_days d
+                USING shipments s
+                WHERE d.shipment_id = s.shipment_id
+                  AND s.updated_at > $1 AND s.updated_at <= $2
+                  AND NOT s.{FINISHED}
+                """,
+                low, high
+            )
+
+            await conn.execute(
+                """
+                UPDATE rollup_watermarks SET watermark = $2, refreshed_at = CURRENT_TIMESTAMP
+                WHERE rollup_name = $1
+                """,
+                SHIPMENT_ROLLUP, high
+            )
+
+        return {
+            "watermark": high, "route_days": route_days, "driver_days": driver_days,
+            "caught_up": high == target
+        }
+
+    async def _recompute_days(self, conn, table: str, key: str, aggregates: str, columns: tuple, low, high) -> int:
+        """
+        Rewrite the `table` rows (by `key`, day) that shipments updated in
+        (low, high] count under now or were last counted under, and delete
+        those left without finished shipments. Returns the rows rewritten.
+        """
+        changed = f"""
+            WITH touched AS (
+                SELECT shipment_id FROM shipments WHERE updated_at > $1 AND updated_at <= $2
+            ),
+            changed AS (
+                SELECT s.{key}, COALESCE(s.actual_arrival, s.updated_at)::date AS day
+                FROM shipments s JOIN touched t USING (shipment_id)
+                WHERE s.{FINISHED}
+                UNION
+                SELECT d.{key}, d.day
+                FROM shipment_rollup_days d JOIN touched t USING (shipment_id)
+            )
+        """
+        same_key = f"""
+            s.{key} = c.{key}
+            AND s.{FINISHED}
+            AND COALESCE(s.actual_arrival, s.updated_at)::date = c.day
+        """
+        result = await conn.execute(
+            f"""
+            {changed}
+            INSERT INTO {table} ({key}, day, {", ".join(columns)}, refreshed_at)
+            SELECT c.{key}, c.day, {aggregates}, CURRENT_TIMESTAMP
+            FROM changed c
+            JOIN shipments s ON {same_key}
+            GROUP BY c.{key}, c.day
+            ON CONFLICT ({key}, day) DO UPDATE SET
+                {", ".join(f"{column} = EXCLUDED.{column}" for column in columns)},
+                refreshed_at = EXCLUDED.refreshed_at
+            """,
+            low, high
+        )
+        await conn.execute(
+            f"""
+            {changed}
+            DELETE FROM {table} st
+            USING changed c
+            WHERE st.{key} = c.{key} AND st.day = c.day
+              AND NOT EXISTS (SELECT 1 FROM shipments s WHERE {same_key})
+            """,
+            low, high
+        )
+        return int(result.split()[-1])
+
+    async def refresh_movement_rollups(self, lag_seconds: float, batch_size: int) -> Optional[dict]:
+        """
+        Add movements after the movement_id watermark to the daily rollups.
+        Only the run of ids up to the first movement newer than now - lag is
+        taken (at most batch_size ids), so a movement committed late with a
+        lower id than one already folded in is not skipped; the lag covers
+        transactions still in flight. Returns None if another session holds
+        the refresh lock.
+        """
+        async with self.db.transaction() as conn:
+            locked = await conn.fetchval("SELECT pg_try_advisory_xact_lock(hashtext($1))", MOVEMENT_ROLLUP)
+            if not locked:
+                return None
+
+            low = await conn.fetchval(
+                "SELECT last_id FROM rollup_watermarks WHERE rollup_name = $1 FOR UPDATE",
+                MOVEMENT_ROLLUP
+            ) or 0
+            high = await conn.fetchval(
+                """
+                SELECT LEAST(
+                    COALESCE(
+                        (SELECT MIN(movement_id) - 1 FROM stock_movements
+                         WHERE movement_id > $1
+                           AND movement_date > LOCALTIMESTAMP - make_interval(secs => $2)),
+                        (SELECT MAX(movement_id) FROM stock_movements),
+                        $1
+                    ),
+                    $1 + $3
+                )
+                """,
+                low, lag_seconds, batch_size
+            )
+            if high <= low:
+                return {"last_id": low, "movements": 0, "movement_days": 0, "caught_up": True}
+
+            # One leg per warehouse a movement touches (one leg with a NULL
+            # warehouse if it touches none); `counted` marks the leg that
+            # counts it in movement_count, see sql/11_movement_rollups.sql
+            query = """
+                INSERT INTO movement_daily_rollups AS r (
+                    day, product_id, warehouse_id, movement_type,
+                    movement_count, warehouse_movements, quantity_in, quantity_out, refreshed_at
+                )
+                SELECT sm.movement_date::date, sm.product_id, leg.warehouse_id, sm.movement_type,
+                       SUM(leg.counted), COUNT(*), SUM(leg.quantity_in), SUM(leg.quantity_out), CURRENT_TIMESTAMP
+                FROM stock_movements sm
+                CROSS JOIN LATERAL (
+                    SELECT sm.to_warehouse_id, sm.quantity, 0, 1
+                    WHERE sm.to_warehouse_id IS NOT NULL OR sm.from_warehouse_id IS NULL
+                    UNION ALL
+                    SELECT sm.from_warehouse_id, 0, sm.quantity, CASE WHEN sm.to_warehouse_id IS NULL THEN 1 ELSE 0 END
+                    WHERE sm.from_warehouse_id IS NOT NULL
+                ) AS leg (warehouse_id, quantity_in, quantity_out, counted)
+                WHERE sm.movement_id > $1 AND sm.movement_id <= $2
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (day, product_id, (COALESCE(warehouse_id, 0)), movement_type) DO UPDATE SET
+                    movement_count = r.movement_count + EXCLUDED.movement_count,
+                    warehouse_movements = r.warehouse_movements + EXCLUDED.warehouse_movements,
+                    quantity_in = r.quantity_in + EXCLUDED.quantity_in,
+                    quantity_out = r.quantity_out + EXCLUDED.quantity_out,
+                    refreshed_at = EXCLUDED.refreshed_at
+            """
+            result = await conn.execute(query, low, high)
+            movements = await conn.fetchval(
+                "SELECT COUNT(*) FROM stock_movements WHERE movement_id > $1 AND movement_id <= $2",
+                low, high
+            )
+
+            await conn.execute(
+                """
+                UPDATE rollup_watermarks
+                SET last_id = $2, watermark = LOCALTIMESTAMP, refreshed_at = CURRENT_TIMESTAMP
+                WHERE rollup_name = $1
+                """,
+                MOVEMENT_ROLLUP, high
+            )
+
+        return {
+            "last_id": high, "movements": movements, "movement_days": int(result.split()[-1]),
+            "caught_up": high < low + batch_size
+        }
+
+    # ========== Performance Reads ==========
+    async def get_route_performance(self, date_from: date, date_to: date, limit: int = 100) -> List[Record]:
+        query = """
+            SELECT r.route_id, r.origin_city, r.destination_city,
+                   r.distance_km::float8 AS distance_km,
+                   r.estimated_hours::float8 AS estimated_hours,
+                   SUM(st.shipments)::int AS total_shipments,
+                   SUM(st.delivered)::int AS delivered_shipments,
+                   SUM(st.trip_hours_sum) / NULLIF(SUM(st.trip_count), 0) AS avg_actual_hours,
+                   SUM(st.delay_hours_sum) / NULLIF(SUM(st.delay_count), 0) AS avg_delay_hours
+            FROM route_daily_stats st
+            JOIN routes r ON r.route_id = st.route_id
+            WHERE st.day BETWEEN $1 AND $2
+            GROUP BY r.route_id
+            ORDER BY avg_delay_hours DESC NULLS LAST, total_shipments DESC
+            LIMIT $3
+        """
+        rows = await self.db.fetch_all(query, date_from, date_to, limit, replica=True)
+        return rows
+
+    async def get_driver_performance(self, date_from: date, date_to: date, limit: int = 100) -> List[Record]:
+        query = """
+            SELECT d.driver_id, d.driver_name,
+                   SUM(st.shipments)::int AS total_shipments,
+                   SUM(st.delivered)::int AS completed_shipments,
+                   ROUND(SUM(st.delivered)::numeric * 100 / SUM(st.shipments), 2)::float8 AS completion_rate,
+                   SUM(st.trip_hours_sum) / NULLIF(SUM(st.trip_count), 0) AS avg_trip_hours
+            FROM driver_daily_stats st
+            JOIN drivers d ON d.driver_id = st.driver_id
+            WHERE st.day BETWEEN $1 AND $2
+            GROUP BY d.driver_id
+            ORDER BY completion_rate DESC, total_shipments DESC
+            LIMIT $3
+        """
+        rows = await self.db.fetch_all(query, date_from, date_to, limit, replica=True)
+        return rows
+
+    # ========== Movement Volume Reads ==========
+    async def get_movement_volume(
+        self,
+        granularity: str,
+        date_from: date,
+        date_to: date,
+        product_id: Optional[int] = None,
+        warehouse_id: Optional[int] = None,
+        movement_type: Optional[str] = None
+    ) -> List[Record]:
+        """
+        Counts and quantities per period and movement type; `date_from` is
+        widened to its period start. With a warehouse filter, movement_count
+        counts the movements touching that warehouse, otherwise each
+        movement once.
+        """
+        query = """
+            SELECT date_trunc($1, day)::date AS period,
+                   movement_type,
+                   SUM(CASE WHEN $5::int IS NULL THEN movement_count ELSE warehouse_movements END)::int
+                       AS movement_count,
+                   SUM(quantity_in)::bigint AS quantity_in,
+                   SUM(quantity_out)::bigint AS quantity_out
+            FROM movement_daily_rollups
+            WHERE day >= date_trunc($1, $2::date)::date AND day <= $3
+              AND ($4::int IS NULL OR product_id = $4)
+              AND ($5::int IS NULL OR warehouse_id = $5)
+              AND ($6::text IS NULL OR movement_type = $6)
+            GROUP BY period, movement_type
+            ORDER BY period, movement_type
+        """
+        rows = await self.db.fetch_all(
+            query, granularity, date_from, date_to, product_id, warehouse_id, movement_type,
+            replica=True
+        )
+        return rows
@@ -0,0 +1,358 @@
+from typing import List, Optional, Tuple
+from app.database import Database
+from app.models.orders import OrderImportJobResponse
+import asyncio
+import csv
+import io
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Column layout expected in partner CSV files (header row required)
+IMPORT_COLUMNS = [
+    "order_ref", "customer_id", "warehouse_id", "product_code",
+    "quantity", "unit_price", "required_date"
+]
+
+REJECT_COLUMNS = ["job_id", "line_no"] + IMPORT_COLUMNS + ["reason"]
+
+JOB_COLUMNS = """
+    job_id, file_name, status, total_lines, rejected_lines, imported_orders,
+    imported_lines, error_message, created_at, started_at, finished_at
+"""
+
+
+class OrderImportRepository:
+    """Repository for bulk order ingestion through UNLOGGED staging tables"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    @staticmethod
+    def _staging_table(job_id: int) -> str:
+        return f"order_import_staging_{int(job_id)}"
+
+    @staticmethod
+    def _lines_table(job_id: int) -> str:
+        return f"order_import_lines_{int(job_id)}"
+
+    @staticmethod
+    def _headers_table(job_id: int) -> str:
+        return f"order_import_headers_{int(job_id)}"
+
+    # ========== Job Tracking ==========
+
+    async def create_job(self, file_name: Optional[str]) -> OrderImportJobResponse:
+        query = f"""
+            INSERT INTO order_import_jobs (file_name)
+            VALUES ($1)
+            RETURNING {JOB_COLUMNS}
+        """
+        row = await self.db.fetch_one(query, file_name)
+        return OrderImportJobResponse(**dict(row))
+
+    async def get_job(self, job_id: int) -> Optional[OrderImportJobResponse]:
+        query = f"SELECT {JOB_COLUMNS} FROM order_import_jobs WHERE job_id = $1"
+        row = await self.db.fetch_one(query, job_id)
+        return OrderImportJobResponse(**dict(row)) if row else None
+
+    async def update_job(self, job_id: int, status: str, **counts) -> None:
+        """Move the job to a new stage, optionally recording progress counters"""
+        query = """
+            UPDATE order_import_jobs
+            SET status = $2::text,
+                total_lines = COALESCE($3, total_lines),
+                rejected_lines = COALESCE($4, rejected_lines),
+                imported_orders = COALESCE($5, imported_orders),
+                imported_lines = COALESCE($6, imported_lines),
+                error_message = COALESCE($7, error_message),
+                started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                finished_at = CASE WHEN $2::text IN ('completed', 'failed')
+                                   THEN CURRENT_TIMESTAMP ELSE finished_at END
+            WHERE job_id = $1
+        """
+        await self.db.execute(
+            query,
+            job_id, status,
+            counts.get("total_lines"),
+            counts.get("rejected_lines"),
+            counts.get("imported_orders"),
+            counts.get("imported_lines"),
+            counts.get("error_message")
+        )
+
+    # ========== Staging ==========
+
+    async def create_staging(self, job_id: int) -> None:
+        await self.db.execute(
+            f"""
+            CREATE UNLOGGED TABLE {self._staging_table(job_id)}
+                (LIKE order_import_staging_template INCLUDING IDENTITY)
+            """
+        )
+
+    @staticmethod
+    def _split_malformed(job_id: int, path: str, staged_path: str) -> List[tuple]:
+        """
+        Copy the well-formed records of `path` to `staged_path`, numbered, and
+        return reject rows for the records with the wrong number of columns.
+        A strict CSV COPY would abort the whole file on the first of those.
+        """
+        malformed = []
+        with open(path, newline="", encoding="utf-8") as src, \
+                open(staged_path, "w", newline="", encoding="utf-8") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            next(reader, None)  # header row
+            line_no = 0
+            for fields in reader:
+                if not fields:
+                    continue
+                line_no += 1
+                if len(fields) == len(IMPORT_COLUMNS):
+                    writer.writerow([line_no, *fields])
+                else:
+                    kept = (fields + [None] * len(IMPORT_COLUMNS))[:len(IMPORT_COLUMNS)]
+                    reason = f"expected {len(IMPORT_COLUMNS)} columns, got {len(fields)}"
+                    malformed.append((job_id, line_no, *kept, reason))
+        return malformed
+
+    async def load_staging(self, job_id: int, path: str, timeout: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Stream the CSV file into the staging table with COPY. Records with the
+        wrong number of columns go straight to the rejects table instead.
+        Returns (total_lines, malformed_lines).
+        """
+        staged_path = f"{path}.staged"
+        try:
+            malformed = await asyncio.to_thread(self._split_malformed, job_id, path, staged_path)
+            result = await self.db.copy_to_table(
+                self._staging_table(job_id),
+                source=staged_path,
+                columns=["line_no"] + IMPORT_COLUMNS,
+                format="csv",
+                timeout=timeout
+            )
+        finally:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+
+        if malformed:
+            await self.db.copy_records_to_table(
+                "order_import_rejects",
+                records=malformed,
+                columns=REJECT_COLUMNS,
+                timeout=timeout
+            )
+        # asyncpg returns the command tag, e.g. "COPY 1000000"
+        return int(result.split()[-1]) + len(malformed), len(malformed)
+
+    async def drop_staging(self, job_id: int) -> None:
+        await self.db.execute(
+            f"""
+            DROP TABLE IF EXISTS {self._staging_table(job_id)},
+                                 {self._lines_table(job_id)},
+                                 {self._headers_table(job_id)}
+            """
+        )
+
+    # ========== Set-based Validation ==========
+
+    async def reject_invalid_lines(self, job_id: int) -> int:
+        """
+        Validate every staged line in one pass: format checks plus anti-joins
+        against customers, warehouses and products. Returns rejected line count.
+        """
+        staging = self._staging_table(job_id)
+        query = f"""
+            INSERT INTO order_import_rejects (
+                job_id, line_no, order_ref, customer_id, warehouse_id, product_code,
+                quantity, unit_price, required_date, reason
+            )
+            SELECT $1, v.line_no, v.order_ref, v.customer_id, v.warehouse_id, v.product_code,
+                   v.quantity, v.unit_price, v.required_date, v.reason
+            FROM (
+                SELECT s.*,
+                    CASE
+                        WHEN COALESCE(btrim(s.order_ref), '') = '' THEN 'missing order_ref'
+                        WHEN COALESCE(s.customer_id, '') !~ '^\\s*\\d{{1,9}}\\s*$' THEN 'invalid customer_id'
+                        WHEN c.customer_id IS NULL THEN 'unknown or inactive customer'
+                        WHEN COALESCE(s.warehouse_id, '') !~ '^\\s*\\d{{1,9}}\\s*$' THEN 'invalid warehouse_id'
+                        WHEN w.warehouse_id IS NULL THEN 'unknown or inactive warehouse'
+                        WHEN p.product_id IS NULL THEN 'unknown or inactive product'
+                        WHEN COALESCE(s.quantity, '') !~ '^\\s*\\d{{1,9}}\\s*$' THEN 'invalid quantity'
+                        WHEN btrim(s.quantity)::int = 0 THEN 'invalid quantity'
+                        WHEN COALESCE(btrim(s.unit_price), '') <> ''
+                             AND s.unit_price !~ '^\\s*\\d{{1,10}}(\\.\\d{{1,2}})?\\s*$' THEN 'invalid unit_price'
+                        WHEN COALESCE(btrim(s.required_date), '') = '' THEN NULL
+                        WHEN btrim(s.required_date) !~ '^\\d{{4}}-(0[1-9]|1[0-2])-(0[1-9]|[12]\\d|3[01])$'
+                            THEN 'invalid required_date'
+                        -- Reject calendar overflow such as 2025-02-30
+                        WHEN date_part('month',
+                                 make_date(substr(btrim(s.required_date), 1, 4)::int,
+                                           substr(btrim(s.required_date), 6, 2)::int, 1)
+                                 + (substr(btrim(s.required_date), 9, 2)::int - 1)
+                             ) <> substr(btrim(s.required_date), 6, 2)::int THEN 'invalid required_date'
+                    END AS reason
+                FROM {staging} s
+                LEFT JOIN customers c
+                    ON c.customer_id = CASE WHEN s.customer_id ~ '^\\s*\\d{{1,9}}\\s*$'
+                                            THEN btrim(s.customer_id)::int END
+                   AND c.is_active = TRUE
+                LEFT JOIN warehouses w
+                    ON w.warehouse_id = CASE WHEN s.warehouse_id ~ '^\\s*\\d{{1,9}}\\s*$'
+                                            THEN btrim(s.warehouse_id)::int END
+                   AND w.is_active = TRUE
+                LEFT JOIN products p
+                    ON p.product_code = btrim(s.product_code)
+                   AND p.is_active = TRUE
+            ) v
+            WHERE v.reason IS NOT NULL
+        """
+        result = await self.db.execute(query, job_id)
+        return int(result.split()[-1])
+
+    async def reject_incomplete_orders(self, job_id: int) -> int:
+        """
+        An order is all-or-nothing: reject the remaining lines of any order that
+        has a rejected line or whose lines disagree on the order header.
+        """
+        staging = self._staging_table(job_id)
+        query = f"""
+            WITH remaining AS (
+                SELECT s.*
+                FROM {staging} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM order_import_rejects r
+                    WHERE r.job_id = $1 AND r.line_no = s.line_no
+                )
+            ),
+            partially_rejected AS (
+                SELECT DISTINCT btrim(r.order_ref) AS order_ref
+                FROM order_import_rejects r
+                WHERE r.job_id = $1
+            ),
+            inconsistent AS (
+                SELECT btrim(order_ref) AS order_ref
+                FROM remaining
+                GROUP BY btrim(order_ref)
+                HAVING COUNT(DISTINCT (
+                    btrim(customer_id)::int,
+                    btrim(warehouse_id)::int,
+                    COALESCE(btrim(required_date), '')
+                )) > 1
+            )
+            INSERT INTO order_import_rejects (
+                job_id, line_no, order_ref, customer_id, warehouse_id, product_code,
+                quantity, unit_price, required_date, reason
+            )
+            SELECT $1, m.line_no, m.order_ref, m.customer_id, m.warehouse_id, m.product_code,
+                   m.quantity, m.unit_price, m.required_date,
+                   CASE
+                       WHEN i.order_ref IS NOT NULL THEN 'lines disagree on customer, warehouse or required_date'
+                       ELSE 'other lines of this order were rejected'
+                   END
+            FROM remaining m
+            LEFT JOIN inconsistent i ON i.order_ref = btrim(m.order_ref)
+            WHERE i.order_ref IS NOT NULL
+               OR btrim(m.order_ref) IN (SELECT order_ref FROM partially_rejected)
+        """
+        result = await self.db.execute(query, job_id)
+        return int(result.split()[-1])
+
+    # ========== Bulk Insert ==========
+
+    async def insert_orders(self, job_id: int, timeout: Optional[float] = None) -> tuple:
+        """
+        Insert all accepted orders and their items with two INSERT ... SELECT
+        statements. Order numbers are drawn in bulk from order_number_seq.
+        `timeout` applies to each statement (the pool's command timeout if None).
+        Returns (imported_orders, imported_lines).
+        """
+        staging = self._staging_table(job_id)
+        lines = self._lines_table(job_id)
+        headers = self._headers_table(job_id)
+
+        async with self.db.transaction() as conn:
+            await conn.execute(
+                f"""
+                CREATE UNLOGGED TABLE {lines} AS
+                SELECT s.line_no,
+                       btrim(s.order_ref) AS order_ref,
+                       btrim(s.customer_id)::int AS customer_id,
+                       btrim(s.warehouse_id)::int AS warehouse_id,
+                       p.product_id,
+                       btrim(s.quantity)::int AS quantity,
+                       COALESCE(NULLIF(btrim(s.unit_price), '')::numeric(12, 2), p.unit_price) AS unit_price,
+                       NULLIF(btrim(s.required_date), '')::date AS required_date
+                FROM {staging} s
+                JOIN products p ON p.product_code = btrim(s.product_code)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM order_import_rejects r
+                    WHERE r.job_id = {int(job_id)} AND r.line_no = s.line_no
+                )
+                """,
+                timeout=timeout
+            )
+
+            await conn.execute(
+                f"""
+                CREATE UNLOGGED TABLE {headers} AS
+                SELECT order_ref,
+                       MIN(customer_id) AS customer_id,
+                       MIN(warehouse_id) AS warehouse_id,
+                       MIN(required_date) AS required_date,
+                       SUM(quantity * unit_price) AS total_amount,
+                       'ORD-' || to_char(CURRENT_DATE, 'YYYYMMDD') || '-'
+                           || lpad(nextval('order_number_seq')::text, 8, '0') AS order_number
+                FROM {lines}
+                GROUP BY order_ref
+                """,
+                timeout=timeout
+            )
+
+            orders_result = await conn.execute(
+                f"""
+                INSERT INTO orders (
+                    customer_id, warehouse_id, order_number, required_date, status, total_amount
+                )
+                SELECT customer_id, warehouse_id, order_number, required_date, 'pending', total_amount
+                FROM {headers}
+                """,
+                timeout=timeout
+            )
+
+            items_result = await conn.execute(
+                f"""
+                INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+                SELECT o.order_id, l.product_id, l.quantity, l.unit_price
+                FROM {lines} l
+                JOIN {headers} h ON h.order_ref = l.order_ref
+                JOIN orders o ON o.order_number = h.order_number
+                ORDER BY l.line_no
+                """,
+                timeout=timeout
+            )
+
+        return int(orders_result.split()[-1]), int(items_result.split()[-1])
+
+    # ========== Rejects File ==========
+
+    async def export_rejects(self, job_id: int) -> bytes:
+        """Render the rejected lines of a job as CSV"""
+        buffer = io.BytesIO()
+        await self.db.copy_from_query(
+            """
+            SELECT line_no, order_ref, customer_id, warehouse_id, product_code,
+                   quantity, unit_price, required_date, reason
+            FROM order_import_rejects
+            WHERE job_id = $1
+            ORDER BY line_no
+            """,
+            job_id,
+            output=buffer,
+            format="csv",
+            header=True
+        )
+        return buffer.getvalue()
@@ -1,5 +1,8 @@
 from typing import List, Optional
+from asyncpg import Record
 from app.database import Database
+from app.config import settings
+from app.utils.cache import TTLCache
 from app.models.orders import (
     CustomerCreate, CustomerUpdate, CustomerResponse,
     OrderCreate, OrderUpdate, OrderResponse,
@@ -9,6 +12,20 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Results of recent customer searches; the picker re-issues the same prefixes
+# while someone types, so a short TTL absorbs most of those round trips.
+customer_search_cache = TTLCache(
+    "customer_search",
+    maxsize=settings.CUSTOMER_SEARCH_CACHE_SIZE,
+    ttl=settings.CUSTOMER_SEARCH_CACHE_TTL_SECONDS
+)
+
+CUSTOMER_COLUMNS = "customer_id, customer_name, email, phone, address, city, state, country, is_active, created_at, updated_at"
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 class OrderRepository:
     """Repository for order-related database operations using raw SQL"""
     
@@ -29,6 +46,7 @@ class OrderRepository:
             customer.customer_name, customer.email, customer.phone, customer.address,
             customer.city, customer.state, customer.country, customer.is_active
         )
+        customer_search_cache.clear()
         return CustomerResponse(**dict(row))
 
     async def get_customer(self, customer_id: int) -> Optional[CustomerResponse]:
@@ -39,13 +57,71 @@ class OrderRepository:
         row = await self.db.fetch_one(query, customer_id)
         return CustomerResponse(**dict(row)) if row else None
 
-    async def get_all_customers(self, limit: int = 100, skip: int = 0) -> List[CustomerResponse]:
+    async def get_all_customers(self, limit: int = 100, skip: int = 0) -> List[Record]:
         query = """
             SELECT customer_id, customer_name, email, phone, address, city, state, country, is_active, created_at, updated_at
             FROM customers ORDER BY customer_id LIMIT $1 OFFSET $2
         """
-        rows = await self.db.fetch_all(query, limit, skip)
-        return [CustomerResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(query, limit, skip, replica=True)
+        return rows
+
+    async def search_customers(self, q: str, limit: int = 20) -> List[Record]:
+        """
+        Ranked customer lookup by name, email or phone.
+        Queries of 3+ characters use the pg_trgm GIN indexes (substring and
+        fuzzy match); shorter ones fall back to a name-prefix index scan.
+        Read from the primary: results are cached until the next
+        create_customer, which a lagging replica could predate.
+        """
+        term = " ".join(q.split()).lower()
+        if not term:
+            return []
+
+        key = (term, limit)
+        cached = customer_search_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if len(term) < 3:
+            query = f"""
+                SELECT {CUSTOMER_COLUMNS}
+                FROM customers
+                WHERE is_active = TRUE
+                  AND lower(customer_name) ~>=~ $1
+                  AND lower(customer_name) ~<~ $2
+                ORDER BY lower(customer_name)
+                LIMIT $3
+            """
+            # Range form of LIKE 'term%' so the text_pattern_ops index is usable
+            # even with a generic (parameterised) plan
+            upper_bound = term[:-1] + chr(ord(term[-1]) + 1)
+            rows = await self.db.fetch_all(query, term, upper_bound, limit)
+        else:
+            query = f"""
+                SELECT {CUSTOMER_COLUMNS}
+                FROM customers
+                WHERE is_active = TRUE
+                  AND (
+                      customer_name ILIKE $2
+                      OR email ILIKE $2
+                      OR phone ILIKE $2
+                      OR customer_name % $1
+                  )
+                ORDER BY
+                    (lower(customer_name) LIKE $3) DESC,
+                    GREATEST(
+                        similarity(customer_name, $1),
+                        similarity(COALESCE(email, ''), $1),
+                        similarity(COALESCE(phone, ''), $1)
+                    ) DESC,
+                    customer_name
+                LIMIT $4
+            """
+            escaped = _like_escape(term)
+            rows = await self.db.fetch_all(query, term, f"%{escaped}%", f"{escaped}%", limit)
+
+        customer_search_cache.set(key, rows)
+        return rows
 
     # ========== Order CRUD ==========
 
@@ -107,10 +183,10 @@ class OrderRepository:
         
         return OrderResponse(**order_dict)
 
-    async def get_all_orders(self, limit: int = 100, skip: int = 0) -> List[OrderResponse]:
+    async def get_all_orders(self, limit: int = 100, skip: int = 0) -> List[Record]:
         query = """
             SELECT order_id, customer_id, warehouse_id, order_number, order_date, required_date, status, total_amount, created_at, updated_at
             FROM orders ORDER BY order_id DESC LIMIT $1 OFFSET $2
         """
-        rows = await self.db.fetch_all(query, limit, skip)
-        return [OrderResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(query, limit, skip, replica=True)
+        return rows
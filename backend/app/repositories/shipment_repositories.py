@@ -1,12 +1,16 @@
 from typing import List, Optional
+from asyncpg import Record
 from app.database import Database
+from app.utils.exceptions import SchedulingConflictError
 from app.models.transportation import (
     VehicleCreate, VehicleUpdate, VehicleResponse,
     DriverCreate, DriverUpdate, DriverResponse,
     RouteCreate, RouteUpdate, RouteResponse,
-    ShipmentCreate, ShipmentUpdate, ShipmentResponse
+    ShipmentCreate, ShipmentUpdate, ShipmentResponse, ShipmentBoardRow
 )
+import asyncpg
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -31,13 +35,13 @@ class TransportationRepository:
         )
         return VehicleResponse(**dict(row))
 
-    async def get_all_vehicles(self, limit: int = 100, skip: int = 0) -> List[VehicleResponse]:
+    async def get_all_vehicles(self, limit: int = 100, skip: int = 0) -> List[Record]:
         query = """
             SELECT vehicle_id, vehicle_number, vehicle_type, capacity_kg, capacity_cubic_meters, last_maintenance_date, is_active, created_at, updated_at
             FROM vehicles ORDER BY vehicle_id LIMIT $1 OFFSET $2
         """
-        rows = await self.db.fetch_all(query, limit, skip)
-        return [VehicleResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(query, limit, skip, replica=True)
+        return rows
 
     # ========== Driver CRUD ==========
     async def create_driver(self, driver: DriverCreate) -> DriverResponse:
@@ -53,13 +57,13 @@ class TransportationRepository:
         )
         return DriverResponse(**dict(row))
 
-    async def get_all_drivers(self, limit: int = 100, skip: int = 0) -> List[DriverResponse]:
+    async def get_all_drivers(self, limit: int = 100, skip: int = 0) -> List[Record]:
         query = """
             SELECT driver_id, driver_name, license_number, phone, email, hired_date, is_active, created_at, updated_at
             FROM drivers ORDER BY driver_id LIMIT $1 OFFSET $2
         """
-        rows = await self.db.fetch_all(query, limit, skip)
-        return [DriverResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(query, limit, skip, replica=True)
+        return rows
 
     # ========== Route CRUD ==========
     async def create_route(self, route: RouteCreate) -> RouteResponse:
@@ -72,13 +76,37 @@ class TransportationRepository:
         row = await self.db.fetch_one(query, route.origin_city, route.destination_city, route.distance_km, route.estimated_hours)
         return RouteResponse(**dict(row))
 
-    async def get_all_routes(self, limit: int = 100, skip: int = 0) -> List[RouteResponse]:
+    async def get_all_routes(self, limit: int = 100, skip: int = 0) -> List[Record]:
         query = """
             SELECT route_id, origin_city, destination_city, distance_km, estimated_hours, created_at
             FROM routes ORDER BY route_id LIMIT $1 OFFSET $2
         """
-        rows = await self.db.fetch_all(query, limit, skip)
-        return [RouteResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(query, limit, skip, replica=True)
+        return rows
+
+    async def update_route(self, route_id: int, route: RouteUpdate) -> Optional[RouteResponse]:
+        query = """
+            UPDATE routes
+            SET origin_city = COALESCE($2, origin_city),
+                destination_city = COALESCE($3, destination_city),
+                distance_km = COALESCE($4, distance_km),
+                estimated_hours = COALESCE($5, estimated_hours)
+            WHERE route_id = $1
+            RETURNING route_id, origin_city, destination_city, distance_km, estimated_hours, created_at
+        """
+        row = await self.db.fetch_one(
+            query, route_id, route.origin_city, route.destination_city, route.distance_km, route.estimated_hours
+        )
+        return RouteResponse(**dict(row)) if row else None
+
+    async def get_route_edges(self) -> List[dict]:
+        """Every route as a graph edge, for the in-memory route graph"""
+        query = """
+            SELECT route_id, origin_city, destination_city, distance_km, estimated_hours
+            FROM routes
+        """
+        rows = await self.db.fetch_all(query)
+        return [dict(row) for row in rows]
 
     # ========== Shipment CRUD ==========
     async def create_shipment(self, shipment: ShipmentCreate) -> ShipmentResponse:
@@ -91,18 +119,231 @@ class TransportationRepository:
             ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
             RETURNING shipment_id, order_id, vehicle_id, driver_id, route_id, shipment_number, status, scheduled_departure, scheduled_arrival, actual_departure, actual_arrival, notes, created_at, updated_at
         """
-        row = await self.db.fetch_one(
-            query,
-            shipment.order_id, shipment.vehicle_id, shipment.driver_id, shipment.route_id,
-            shipment_number, shipment.status, shipment.scheduled_departure, shipment.scheduled_arrival,
-            shipment.actual_departure, shipment.actual_arrival, shipment.notes
-        )
+        try:
+            row = await self.db.fetch_one(
+                query,
+                shipment.order_id, shipment.vehicle_id, shipment.driver_id, shipment.route_id,
+                shipment_number, shipment.status, shipment.scheduled_departure, shipment.scheduled_arrival,
+                shipment.actual_departure, shipment.actual_arrival, shipment.notes
+            )
+        except asyncpg.exceptions.ExclusionViolationError as e:
+            if e.constraint_name == "shipments_driver_no_overlap":
+                raise SchedulingConflictError("Driver", shipment.driver_id)
+            raise SchedulingConflictError("Vehicle", shipment.vehicle_id)
         return ShipmentResponse(**dict(row))
 
-    async def get_all_shipments(self, limit: int = 100, skip: int = 0) -> List[ShipmentResponse]:
+    async def get_shipment_board(
+        self, limit: int = 50, before_id: Optional[int] = None, status: Optional[str] = None
+    ) -> List[ShipmentBoardRow]:
+        """
+        Open shipments, newest first, with everything the tracking board shows.
+        Keyset-paginated: pass the last shipment_id seen as `before_id`.
+        Arrival is projected from the (actual or expected) departure plus the
+        route's estimated hours; delay is how far that lands past schedule.
+        """
+        query = """
+            SELECT s.shipment_id, s.shipment_number, s.status,
+                   o.order_id, o.order_number, c.customer_name,
+                   v.vehicle_id, v.vehicle_number,
+                   d.driver_id, d.driver_name,
+                   r.route_id, r.origin_city, r.destination_city,
+                   s.scheduled_departure, s.scheduled_arrival, s.actual_departure,
+                   p.projected_arrival,
+                   CASE WHEN s.scheduled_arrival IS NOT NULL THEN
+                       GREATEST(0, EXTRACT(EPOCH FROM (p.projected_arrival - s.scheduled_arrival)) / 60)::int
+                   END AS delay_minutes
+            FROM shipments s
+            JOIN orders o ON o.order_id = s.order_id
+            JOIN customers c ON c.customer_id = o.customer_id
+            JOIN vehicles v ON v.vehicle_id = s.vehicle_id
+            JOIN drivers d ON d.driver_id = s.driver_id
+            JOIN routes r ON r.route_id = s.route_id
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(s.actual_departure, GREATEST(date_trunc('minute', LOCALTIMESTAMP), s.scheduled_departure))
+                       + r.estimated_hours * INTERVAL '1 hour' AS projected_arrival
+            ) p
+            WHERE s.status IN ('planned', 'in_transit')
+              AND ($2::int IS NULL OR s.shipment_id < $2)
+              AND ($3::text IS NULL OR s.status = $3)
+            ORDER BY s.shipment_id DESC
+            LIMIT $1
+        """
+        rows = await self.db.fetch_all(query, limit, before_id, status, replica=True)
+        return [ShipmentBoardRow(**dict(row)) for row in rows]
+
+    # ========== Shipment Events ==========
+    async def write_shipment_events(self, events: List[tuple]) -> int:
+        """
+        Persist a batch of (shipment_id, event_type, occurred_at, received_at, notes)
+        with COPY and roll it onto shipments in one UPDATE. Returns the number
+        of shipments whose status or actual times changed.
+        """
+        query = """
+            UPDATE shipments s
+            SET status = CASE
+                    WHEN e.arrived_at IS NOT NULL THEN 'delivered'
+                    WHEN e.departed_at IS NOT NULL AND s.status = 'planned' THEN 'in_transit'
+                    ELSE s.status
+                END,
+                actual_departure = COALESCE(s.actual_departure, e.departed_at),
+                actual_arrival = COALESCE(e.arrived_at, s.actual_arrival),
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT shipment_id,
+                       MIN(occurred_at) FILTER (WHERE event_type = 'departed') AS departed_at,
+                       MAX(occurred_at) FILTER (WHERE event_type = 'arrived') AS arrived_at
+                FROM unnest($1::int[], $2::text[], $3::timestamp[]) AS e(shipment_id, event_type, occurred_at)
+                GROUP BY shipment_id
+            ) e
+            WHERE s.shipment_id = e.shipment_id
+              AND s.status <> 'cancelled'
+              AND (e.departed_at IS NOT NULL OR e.arrived_at IS NOT NULL)
+        """
+        async with self.db.transaction() as conn:
+            await conn.copy_records_to_table(
+                "shipment_events",
+                records=events,
+                columns=["shipment_id", "event_type", "occurred_at", "received_at", "notes"]
+            )
+            result = await conn.execute(
+                query,
+                [e[0] for e in events], [e[1] for e in events], [e[2] for e in events]
+            )
+        return int(result.split()[-1])
+
+    async def get_existing_shipment_ids(self, shipment_ids: List[int]) -> List[int]:
+        query = "SELECT shipment_id FROM shipments WHERE shipment_id = ANY($1::int[])"
+        rows = await self.db.fetch_all(query, shipment_ids)
+        return [row["shipment_id"] for row in rows]
+
+    # ========== Availability ==========
+    async def get_open_bookings(self) -> List[dict]:
+        """Scheduled windows of every open shipment, for the availability index"""
+        query = """
+            SELECT shipment_id, vehicle_id, driver_id, status, scheduled_departure, scheduled_arrival
+            FROM shipments
+            WHERE status IN ('planned', 'in_transit')
+              AND scheduled_departure IS NOT NULL
+              AND scheduled_arrival IS NOT NULL
+        """
+        rows = await self.db.fetch_all(query)
+        return [dict(row) for row in rows]
+
+    async def get_active_vehicles(self) -> List[VehicleResponse]:
+        query = """
+            SELECT vehicle_id, vehicle_number, vehicle_type, capacity_kg, capacity_cubic_meters, last_maintenance_date, is_active, created_at, updated_at
+            FROM vehicles WHERE is_active = TRUE ORDER BY vehicle_id
+        """
+        rows = await self.db.fetch_all(query)
+        return [VehicleResponse(**dict(row)) for row in rows]
+
+    async def get_active_drivers(self) -> List[DriverResponse]:
+        query = """
+            SELECT driver_id, driver_name, license_number, phone, email, hired_date, is_active, created_at, updated_at
+            FROM drivers WHERE is_active = TRUE ORDER BY driver_id
+        """
+        rows = await self.db.fetch_all(query)
+        return [DriverResponse(**dict(row)) for row in rows]
+
+    # ========== Load Planning ==========
+    async def get_open_order_loads(self, warehouse_id: int, statuses: List[str]) -> List[dict]:
+        """Weight and volume of every open, not-yet-shipped order of a warehouse"""
+        query = """
+            SELECT o.order_id,
+                   SUM(oi.quantity * p.weight_kg)::float8 AS weight_kg,
+                   SUM(oi.quantity * p.volume_cubic_meters)::float8 AS volume_cubic_meters
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.order_id
+            JOIN products p ON p.product_id = oi.product_id
+            WHERE o.warehouse_id = $1
+              AND o.status = ANY($2::text[])
+              AND NOT EXISTS (
+                  SELECT 1 FROM shipments s
+                  WHERE s.order_id = o.order_id AND s.status <> 'cancelled'
+              )
+            GROUP BY o.order_id
+        """
+        rows = await self.db.fetch_all(query, warehouse_id, statuses)
+        return [dict(row) for row in rows]
+
+    async def get_available_vehicles(self, vehicle_ids: Optional[List[int]] = None) -> List[dict]:
+        """Active vehicles that are not currently out on a shipment"""
+        query = """
+            SELECT v.vehicle_id, v.vehicle_number,
+                   v.capacity_kg::float8 AS capacity_kg,
+                   v.capacity_cubic_meters::float8 AS capacity_cubic_meters
+            FROM vehicles v
+            WHERE v.is_active = TRUE
+              AND ($1::int[] IS NULL OR v.vehicle_id = ANY($1::int[]))
+              AND NOT EXISTS (
+                  SELECT 1 FROM shipments s
+                  WHERE s.vehicle_id = v.vehicle_id AND s.status = 'in_transit'
+              )
+            ORDER BY v.vehicle_id
+        """
+        rows = await self.db.fetch_all(query, vehicle_ids)
+        return [dict(row) for row in rows]
+
+    # ========== Dispatch Planning ==========
+    async def get_planned_shipments(self, shipment_ids: Optional[List[int]] = None) -> List[dict]:
+        """Planned shipments with their load, trip duration and scheduled window"""
+        query = """
+            SELECT s.shipment_id, s.vehicle_id, s.driver_id,
+                   s.scheduled_departure, s.scheduled_arrival,
+                   r.estimated_hours::float8 AS estimated_hours,
+                   COALESCE(l.weight_kg, 0) AS weight_kg,
+                   COALESCE(l.volume_cubic_meters, 0) AS volume_cubic_meters
+            FROM shipments s
+            JOIN routes r ON r.route_id = s.route_id
+            LEFT JOIN LATERAL (
+                SELECT SUM(oi.quantity * p.weight_kg)::float8 AS weight_kg,
+                       SUM(oi.quantity * p.volume_cubic_meters)::float8 AS volume_cubic_meters
+                FROM order_items oi
+                JOIN products p ON p.product_id = oi.product_id
+                WHERE oi.order_id = s.order_id
+            ) l ON TRUE
+            WHERE s.status = 'planned'
+              AND ($1::int[] IS NULL OR s.shipment_id = ANY($1::int[]))
+            ORDER BY s.shipment_id
+        """
+        rows = await self.db.fetch_all(query, shipment_ids)
+        return [dict(row) for row in rows]
+
+    async def apply_dispatch_assignments(self, assignments: List[tuple]) -> List[int]:
+        """
+        Write (shipment_id, vehicle_id, driver_id) assignments in one UPDATE.
+        Returns the ids actually updated (shipments still planned).
+        """
+        query = """
+            UPDATE shipments s
+            SET vehicle_id = a.vehicle_id,
+                driver_id = a.driver_id,
+                updated_at = CURRENT_TIMESTAMP
+            FROM unnest($1::int[], $2::int[], $3::int[]) AS a(shipment_id, vehicle_id, driver_id)
+            WHERE s.shipment_id = a.shipment_id
+              AND s.status = 'planned'
+            RETURNING s.shipment_id
+        """
+        shipment_ids, vehicle_ids, driver_ids = (list(col) for col in zip(*assignments))
+        try:
+            async with self.db.transaction() as conn:
+                # Reassignments may swap resources between rows; check overlaps at commit
+                await conn.execute("SET CONSTRAINTS shipments_vehicle_no_overlap, shipments_driver_no_overlap DEFERRED")
+                rows = await conn.fetch(query, shipment_ids, vehicle_ids, driver_ids)
+        except asyncpg.exceptions.ExclusionViolationError as e:
+            # detail: Key (vehicle_id, tsrange(...))=(7, [...)) conflicts with existing key ...
+            # It may be missing or redacted; the message then names no id
+            match = re.search(r"\)=\((\d+),", e.detail or "")
+            resource_id = int(match.group(1)) if match else None
+            if e.constraint_name == "shipments_driver_no_overlap":
+                raise SchedulingConflictError("Driver", resource_id)
+            raise SchedulingConflictError("Vehicle", resource_id)
+        return [row["shipment_id"] for row in rows]
+
+    async def get_all_shipments(self, limit: int = 100, skip: int = 0) -> List[Record]:
         query = """
             SELECT shipment_id, order_id, vehicle_id, driver_id, route_id, shipment_number, status, scheduled_departure, scheduled_arrival, actual_departure, actual_arrival, notes, created_at, updated_at
             FROM shipments ORDER BY shipment_id DESC LIMIT $1 OFFSET $2
         """
-        rows = await self.db.fetch_all(query, limit, skip)
-        return [ShipmentResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(query, limit, skip, replica=True)
+        return rows
@@ -1,16 +1,51 @@
 
 from typing import List, Optional
-from app.database import Database
+from asyncpg import Record
+from app.database import Database, statements
 from app.models.warehouse import (
     WarehouseCreate, WarehouseUpdate, WarehouseResponse,
     ZoneCreate, ZoneUpdate, ZoneResponse,
     BinCreate, BinUpdate, BinResponse,
     WarehouseUtilization
 )
+from app.utils.cache import invalidate_tag
 import logging
 
 logger = logging.getLogger(__name__)
 
+# ========== Hot statements (fixed shapes, prepared on every connection) ==========
+
+GET_WAREHOUSE = statements.register("get_warehouse", """
+    SELECT warehouse_id, warehouse_name, location, city, state, country,
+           capacity_cubic_meters, is_active, created_at, updated_at
+    FROM warehouses
+    WHERE warehouse_id = $1
+""")
+
+LIST_WAREHOUSES = statements.register("list_warehouses", """
+    SELECT warehouse_id, warehouse_name, location, city, state, country,
+           capacity_cubic_meters, is_active, created_at, updated_at
+    FROM warehouses
+    WHERE ($1::boolean IS NULL OR is_active = $1)
+    ORDER BY warehouse_id
+    LIMIT $2 OFFSET $3
+""")
+
+# NULL keeps the current value (fields left out of the request are sent as NULL)
+UPDATE_WAREHOUSE = statements.register("update_warehouse", """
+    UPDATE warehouses
+    SET warehouse_name = COALESCE($2, warehouse_name),
+        location = COALESCE($3, location),
+        city = COALESCE($4, city),
+        state = COALESCE($5, state),
+        country = COALESCE($6, country),
+        capacity_cubic_meters = COALESCE($7, capacity_cubic_meters),
+        is_active = COALESCE($8, is_active)
+    WHERE warehouse_id = $1
+    RETURNING warehouse_id, warehouse_name, location, city, state, country,
+              capacity_cubic_meters, is_active, created_at, updated_at
+""", read_only=False)
+
 
 class WarehouseRepository:
     """Repository for warehouse-related database operations using raw SQL"""
@@ -40,18 +75,12 @@ class WarehouseRepository:
             warehouse.capacity_cubic_meters
         )
         
+        invalidate_tag("warehouses")
         return WarehouseResponse(**dict(row))
     
     async def get_warehouse_by_id(self, warehouse_id: int) -> Optional[WarehouseResponse]:
         """Get warehouse by ID"""
-        query = """
-            SELECT warehouse_id, warehouse_name, location, city, state, country,
-                   capacity_cubic_meters, is_active, created_at, updated_at
-            FROM warehouses
-            WHERE warehouse_id = $1
-        """
-        
-        row = await self.db.fetch_one(query, warehouse_id)
+        row = await self.db.fetch_one(GET_WAREHOUSE, warehouse_id)
         return WarehouseResponse(**dict(row)) if row else None
     
     async def get_all_warehouses(
@@ -59,29 +88,10 @@ class WarehouseRepository:
         is_active: Optional[bool] = None,
         skip: int = 0,
         limit: int = 100
-    ) -> List[WarehouseResponse]:
+    ) -> List[Record]:
         """Get all warehouses with optional filtering"""
-        if is_active is not None:
-            query = """
-                SELECT warehouse_id, warehouse_name, location, city, state, country,
-                       capacity_cubic_meters, is_active, created_at, updated_at
-                FROM warehouses
-                WHERE is_active = $1
-                ORDER BY warehouse_id
-                LIMIT $2 OFFSET $3
-            """
-            rows = await self.db.fetch_all(query, is_active, limit, skip)
-        else:
-            query = """
-                SELECT warehouse_id, warehouse_name, location, city, state, country,
-                       capacity_cubic_meters, is_active, created_at, updated_at
-                FROM warehouses
-                ORDER BY warehouse_id
-                LIMIT $1 OFFSET $2
-            """
-            rows = await self.db.fetch_all(query, limit, skip)
-        
-        return [WarehouseResponse(**dict(row)) for row in rows]
+        rows = await self.db.fetch_all(LIST_WAREHOUSES, is_active, limit, skip, replica=True)
+        return rows
     
     async def update_warehouse(
         self, 
@@ -89,30 +99,22 @@ class WarehouseRepository:
         warehouse: WarehouseUpdate
     ) -> Optional[WarehouseResponse]:
         """Update warehouse details"""
-        # Build dynamic update query
-        update_fields = []
-        values = []
-        param_count = 1
-        
-        for field, value in warehouse.model_dump(exclude_unset=True).items():
-            if value is not None:
-                update_fields.append(f"{field} = ${param_count}")
-                values.append(value)
-                param_count += 1
-        
-        if not update_fields:
+        fields = warehouse.model_dump(exclude_unset=True)
+        if all(value is None for value in fields.values()):
             return await self.get_warehouse_by_id(warehouse_id)
         
-        values.append(warehouse_id)
-        query = f"""
-            UPDATE warehouses
-            SET {', '.join(update_fields)}
-            WHERE warehouse_id = ${param_count}
-            RETURNING warehouse_id, warehouse_name, location, city, state, country,
-                      capacity_cubic_meters, is_active, created_at, updated_at
-        """
-        
-        row = await self.db.fetch_one(query, *values)
+        row = await self.db.fetch_one(
+            UPDATE_WAREHOUSE,
+            warehouse_id,
+            fields.get("warehouse_name"),
+            fields.get("location"),
+            fields.get("city"),
+            fields.get("state"),
+            fields.get("country"),
+            fields.get("capacity_cubic_meters"),
+            fields.get("is_active")
+        )
+        invalidate_tag("warehouses")
         return WarehouseResponse(**dict(row)) if row else None
     
     async def delete_warehouse(self, warehouse_id: int) -> bool:
@@ -124,6 +126,7 @@ class WarehouseRepository:
         """
         
         result = await self.db.execute(query, warehouse_id)
+        invalidate_tag("warehouses")
         return result == "UPDATE 1"
     
     # ========== Zone CRUD ==========
@@ -147,7 +150,7 @@ class WarehouseRepository:
         
         return ZoneResponse(**dict(row))
     
-    async def get_zones_by_warehouse(self, warehouse_id: int) -> List[ZoneResponse]:
+    async def get_zones_by_warehouse(self, warehouse_id: int) -> List[Record]:
         """Get all zones for a warehouse"""
         query = """
             SELECT zone_id, warehouse_id, zone_name, zone_type,
@@ -158,7 +161,7 @@ class WarehouseRepository:
         """
         
         rows = await self.db.fetch_all(query, warehouse_id)
-        return [ZoneResponse(**dict(row)) for row in rows]
+        return rows
     
     # ========== Bin CRUD ==========
     
@@ -180,7 +183,7 @@ class WarehouseRepository:
         
         return BinResponse(**dict(row))
     
-    async def get_bins_by_zone(self, zone_id: int) -> List[BinResponse]:
+    async def get_bins_by_zone(self, zone_id: int) -> List[Record]:
         """Get all bins for a zone"""
         query = """
             SELECT bin_id, zone_id, bin_code, capacity_cubic_meters,
@@ -191,7 +194,7 @@ class WarehouseRepository:
         """
         
         rows = await self.db.fetch_all(query, zone_id)
-        return [BinResponse(**dict(row)) for row in rows]
+        return rows
     
     # ========== Analytics ==========
     
@@ -222,5 +225,5 @@ class WarehouseRepository:
             WHERE w.warehouse_id = $1
         """
         
-        row = await self.db.fetch_one(query, warehouse_id)
+        row = await self.db.fetch_one(query, warehouse_id, replica=True)
         return WarehouseUtilization(**dict(row)) if row else None
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Keeps the performance and movement volume rollups fresh enough for reads.
+
+A background task started in the app lifespan refreshes them incrementally
+once per interval, and back to back while a batch limit leaves a backlog;
+reads only ever query the rollups. Across processes the advisory lock lets
+only one refresh run.
+
+Refreshes run outside the per-route statement budget (app.utils.deadlines)
+and outside any request, so neither a slow backlog nor a client going away
+rolls one back.
+"""
+from typing import Optional
+import asyncio
+import logging
+import time
+
+from app.repositories.analytics_repositories import AnalyticsRepository
+
+logger = logging.getLogger(__name__)
+
+
+class RollupRefresher:
+    def __init__(
+        self,
+        interval_seconds: float,
+        lag_seconds: float,
+        shipment_batch_size: int,
+        movement_batch_size: int
+    ):
+        self.interval_seconds = interval_seconds
+        self.lag_seconds = lag_seconds
+        self.shipment_batch_size = shipment_batch_size
+        self.movement_batch_size = movement_batch_size
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self, repo: AnalyticsRepository) -> Optional[dict]:
+        """
+        Run a refresh now (waiting for one already in progress in this
+        process). Returns the merged results, or None if other sessions
+        held both refresh locks.
+        """
+        async with self._lock:
+            with repo.db.statement_timeout(None):
+                started = time.perf_counter()
+                shipments = await repo.refresh_shipment_rollups(self.lag_seconds, self.shipment_batch_size)
+                if shipments is not None:
+                    logger.info(
+                        f"Shipment rollups refreshed to {shipments['watermark']}: "
+                        f"{shipments['route_days']} route days, {shipments['driver_days']} driver days "
+                        f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+                    )
+
+                started = time.perf_counter()
+                movements = await repo.refresh_movement_rollups(self.lag_seconds, self.movement_batch_size)
+                if movements is not None and movements["movements"]:
+                    logger.info(
+                        f"Movement rollups refreshed to movement {movements['last_id']}: "
+                        f"{movements['movements']} movements into {movements['movement_days']} rollup rows "
+                        f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+                    )
+
+                if shipments is None and movements is None:
+                    return None
+                return {
+                    **(shipments or {}),
+                    **(movements or {}),
+                    "caught_up": all(r["caught_up"] for r in (shipments, movements) if r is not None)
+                }
+
+    async def start(self, repo: AnalyticsRepository) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(repo))
+            logger.info("Analytics rollup refresher started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self, repo: AnalyticsRepository) -> None:
+        while True:
+            caught_up = True
+            try:
+                result = await self.refresh(repo)
+                caught_up = result is None or result["caught_up"]
+            except Exception:
+                logger.exception("Analytics rollup refresh failed, serving existing rollups")
+            if caught_up:
+                await asyncio.sleep(self.interval_seconds)
@@ -0,0 +1,131 @@
+"""
+In-memory mirror of vehicle and driver bookings.
+
+Open shipments (planned / in_transit) reserve their vehicle and driver for
+[scheduled_departure, scheduled_arrival). The database enforces this with
+exclusion constraints; this index answers the same question in O(log n)
+per resource so conflicts are reported before the INSERT and free-resource
+queries don't scan the shipments table.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("planned", "in_transit")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """shipments.scheduled_* are TIMESTAMP columns; compare as naive UTC"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class IntervalIndex:
+    """Bookings of one resource, sorted by start. Bookings never overlap."""
+
+    def __init__(self):
+        self._items: List[tuple] = []  # (start, end, shipment_id)
+
+    def add(self, start: datetime, end: datetime, shipment_id: int) -> None:
+        insort(self._items, (start, end, shipment_id))
+
+    def remove(self, shipment_id: int) -> None:
+        self._items = [item for item in self._items if item[2] != shipment_id]
+
+    def intervals(self, ignore: Iterable[int] = ()) -> List[tuple]:
+        """(start, end) of every booking, in order, skipping `ignore`d shipments"""
+        ignore = set(ignore)
+        return [(start, end) for start, end, shipment_id in self._items if shipment_id not in ignore]
+
+    def find_overlap(self, start: datetime, end: datetime, ignore: Iterable[int] = ()) -> Optional[int]:
+        """Shipment whose booking overlaps [start, end), if any"""
+        # Bookings are disjoint, so ends are sorted too: only the bookings
+        # starting before `end` can overlap, and the latest of them decides.
+        i = bisect_left(self._items, (end,))
+        ignore = set(ignore)
+        while i > 0:
+            i -= 1
+            booked_start, booked_end, shipment_id = self._items[i]
+            if booked_end <= start:
+                return None
+            if shipment_id not in ignore:
+                return shipment_id
+        return None
+
+
+class AvailabilityIndex:
+    """Per-vehicle and per-driver interval indexes"""
+
+    def __init__(self, bookings: List[dict]):
+        self.vehicles: Dict[int, IntervalIndex] = {}
+        self.drivers: Dict[int, IntervalIndex] = {}
+        for booking in bookings:
+            self.add(booking)
+
+    def add(self, shipment: dict) -> None:
+        if shipment.get("status") not in OPEN_STATUSES:
+            return
+        start, end = shipment.get("scheduled_departure"), shipment.get("scheduled_arrival")
+        if start is None or end is None:
+            return
+        start, end = _naive_utc(start), _naive_utc(end)
+        self.vehicles.setdefault(shipment["vehicle_id"], IntervalIndex()).add(start, end, shipment["shipment_id"])
+        self.drivers.setdefault(shipment["driver_id"], IntervalIndex()).add(start, end, shipment["shipment_id"])
+
+    def remove(self, shipment: dict) -> None:
+        for index in (self.vehicles.get(shipment["vehicle_id"]), self.drivers.get(shipment["driver_id"])):
+            if index is not None:
+                index.remove(shipment["shipment_id"])
+
+    def vehicle_conflict(self, vehicle_id: int, start: datetime, end: datetime, ignore: Iterable[int] = ()) -> Optional[int]:
+        index = self.vehicles.get(vehicle_id)
+        return index.find_overlap(_naive_utc(start), _naive_utc(end), ignore) if index else None
+
+    def driver_conflict(self, driver_id: int, start: datetime, end: datetime, ignore: Iterable[int] = ()) -> Optional[int]:
+        index = self.drivers.get(driver_id)
+        return index.find_overlap(_naive_utc(start), _naive_utc(end), ignore) if index else None
+
+
+class AvailabilityIndexCache:
+    """
+    Process-wide AvailabilityIndex, loaded lazily from the database.
+
+    Shipments created in this process are added incrementally; a full reload
+    after the TTL picks up bookings made by other workers. The exclusion
+    constraints remain the source of truth.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._index: Optional[AvailabilityIndex] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._index = None
+
+    def _is_fresh(self) -> bool:
+        return self._index is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def get(self, load_bookings) -> AvailabilityIndex:
+        if self._is_fresh():
+            return self._index
+
+        async with self._lock:
+            if not self._is_fresh():
+                bookings = await load_bookings()
+                self._index = AvailabilityIndex(bookings)
+                self._loaded_at = time.monotonic()
+                logger.info(f"Availability index loaded with {len(bookings)} open bookings")
+            return self._index
+
+    def record(self, shipment: dict) -> None:
+        """Mirror a newly created shipment into the loaded index"""
+        if self._index is not None:
+            self._index.add(shipment)
@@ -0,0 +1,307 @@
+"""
+Async chat model providers for the assistant.
+
+A provider is created once per process and shared by every request. All
+calls are awaited (never run on the event loop synchronously), bounded by a
+per-call timeout and by a global concurrency limit so a slow upstream
+cannot pile up unbounded work. CHAT_PROVIDER=stub swaps in a deterministic
+local model for load tests and offline development.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.config import settings
+from app.services.chat_tools import tools
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ChatTimeoutError(Exception):
+    """The model did not answer within CHAT_TIMEOUT_SECONDS"""
+
+
+class ChatProviderNotConfigured(Exception):
+    """The selected provider is missing credentials"""
+
+
+@dataclass
+class ToolCall:
+    name: str
+    args: Dict[str, Any]
+
+
+@dataclass
+class ProviderReply:
+    text: str = ""
+    tool_calls: List[ToolCall] = field(default_factory=list)
+
+
+class ChatSession(ABC):
+    """One conversation with the model"""
+
+    @abstractmethod
+    async def send_message(self, message: str) -> ProviderReply:
+        ...
+
+    @abstractmethod
+    async def send_tool_results(self, results: List[Tuple[str, dict]]) -> ProviderReply:
+        """Return (tool name, result) pairs to the model"""
+        ...
+
+    @abstractmethod
+    def stream_message(self, message: str) -> AsyncIterator[ProviderReply]:
+        """Like send_message, but yields partial replies (text deltas) as they arrive"""
+        ...
+
+    @abstractmethod
+    def stream_tool_results(self, results: List[Tuple[str, dict]]) -> AsyncIterator[ProviderReply]:
+        ...
+
+
+class ChatProvider(ABC):
+    name = "base"
+
+    def __init__(self, timeout_seconds: float, max_concurrency: int):
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(self, fn: Callable[[], Awaitable]) -> Any:
+        """Run one upstream call under the concurrency limit and timeout"""
+        async def guarded():
+            async with self._semaphore:
+                return await fn()
+        try:
+            return await asyncio.wait_for(guarded(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise ChatTimeoutError(f"{self.name} did not respond within {self.timeout_seconds:g}s")
+
+    async def stream(self, open_stream: Callable[[], Awaitable]) -> AsyncIterator:
+        """
+        Hold a concurrency slot for the whole stream; the timeout applies to
+        opening it and to each gap between chunks. Closing this generator
+        (e.g. the client went away) closes the upstream stream as well.
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise ChatTimeoutError(f"{self.name} is busy; no slot within {self.timeout_seconds:g}s")
+        iterator = None
+        try:
+            response = await asyncio.wait_for(open_stream(), self.timeout_seconds)
+            iterator = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout_seconds)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            raise ChatTimeoutError(f"{self.name} stalled for more than {self.timeout_seconds:g}s")
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._semaphore.release()
+
+    @abstractmethod
+    def start_chat(self, system_instruction: str, history: List[dict]) -> ChatSession:
+        """history: [{"role": "user" | "model", "text": ...}]"""
+        ...
+
+
+# ========== Gemini ==========
+
+class GeminiChatSession(ChatSession):
+    def __init__(self, provider: "GeminiChatProvider", chat):
+        self.provider = provider
+        self.chat = chat
+
+    @staticmethod
+    def _reply(response) -> ProviderReply:
+        reply = ProviderReply()
+        texts = []
+        for part in response.parts:
+            if part.function_call and part.function_call.name:
+                reply.tool_calls.append(ToolCall(part.function_call.name, dict(part.function_call.args)))
+            elif part.text:
+                texts.append(part.text)
+        reply.text = "".join(texts)
+        return reply
+
+    async def send_message(self, message: str) -> ProviderReply:
+        response = await self.provider.call(lambda: self.chat.send_message_async(message))
+        return self._reply(response)
+
+    @staticmethod
+    def _tool_parts(results: List[Tuple[str, dict]]) -> list:
+        from google.generativeai.types import content_types
+        return [
+            content_types.Part.from_function_response(name=name, response=result)
+            for name, result in results
+        ]
+
+    async def send_tool_results(self, results: List[Tuple[str, dict]]) -> ProviderReply:
+        parts = self._tool_parts(results)
+        response = await self.provider.call(lambda: self.chat.send_message_async(parts))
+        return self._reply(response)
+
+    async def _stream(self, content) -> AsyncIterator[ProviderReply]:
+        async for chunk in self.provider.stream(lambda: self.chat.send_message_async(content, stream=True)):
+            yield self._reply(chunk)
+
+    def stream_message(self, message: str) -> AsyncIterator[ProviderReply]:
+        return self._stream(message)
+
+    def stream_tool_results(self, results: List[Tuple[str, dict]]) -> AsyncIterator[ProviderReply]:
+        return self._stream(self._tool_parts(results))
+
+
+class GeminiChatProvider(ChatProvider):
+    """
+    google-generativeai, configured once. Models are cheap local objects but
+    carry the system instruction, so they are kept per instruction.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, timeout_seconds: float, max_concurrency: int):
+        super().__init__(timeout_seconds, max_concurrency)
+        if not api_key:
+            raise ChatProviderNotConfigured("Gemini API Key is not configured on the server.")
+        import google.generativeai as genai
+        self.genai = genai
+        self.model_name = model_name
+        genai.configure(api_key=api_key)
+        self._models = TTLCache("chat_models", maxsize=256, ttl=3600)
+
+    def _model(self, system_instruction: str):
+        model = self._models.get(system_instruction)
+        if model is None:
+            model = self.genai.GenerativeModel(
+                model_name=self.model_name,
+                tools=tools,
+                system_instruction=system_instruction,
+                generation_config=self.genai.types.GenerationConfig(
+                    max_output_tokens=250,
+                    temperature=0.2,
+                )
+            )
+            self._models.set(system_instruction, model)
+        return model
+
+    def start_chat(self, system_instruction: str, history: List[dict]) -> ChatSession:
+        chat = self._model(system_instruction).start_chat(history=[
+            {"role": msg["role"], "parts": [{"text": msg["text"]}]} for msg in history
+        ])
+        return GeminiChatSession(self, chat)
+
+
+# ========== Deterministic stub ==========
+
+# Keyword -> tool the stub "decides" to call
+STUB_TOOL_KEYWORDS = [
+    ("low stock", "get_low_stock_items"),
+    ("reorder", "get_low_stock_items"),
+    ("capacity", "get_warehouse_capacities"),
+    ("utilization", "get_warehouse_capacities"),
+    ("movement", "get_recent_movements"),
+    ("inventory", "get_inventory_status"),
+    ("stock", "get_inventory_status"),
+]
+
+
+class StubChatSession(ChatSession):
+    def __init__(self, provider: "StubChatProvider"):
+        self.provider = provider
+
+    async def _respond(self, reply: ProviderReply) -> ProviderReply:
+        async def respond():
+            if self.provider.latency_seconds:
+                await asyncio.sleep(self.provider.latency_seconds)
+            return reply
+        return await self.provider.call(respond)
+
+    @staticmethod
+    def _answer(message: str) -> ProviderReply:
+        lowered = message.lower()
+        tool_names = []
+        for keyword, tool_name in STUB_TOOL_KEYWORDS:
+            if keyword in lowered and tool_name not in tool_names:
+                tool_names.append(tool_name)
+        if tool_names:
+            return ProviderReply(tool_calls=[ToolCall(name, {}) for name in tool_names])
+        return ProviderReply(text="I am a warehouse assistant. Ask me about inventory, stock or warehouses.")
+
+    @staticmethod
+    def _summarise(results: List[Tuple[str, dict]]) -> ProviderReply:
+        summary = []
+        for name, result in results:
+            rows = sum(len(v) for v in result.values() if isinstance(v, list))
+            summary.append(f"{name} returned {rows} rows")
+        return ProviderReply(text="; ".join(summary) + ".")
+
+    async def send_message(self, message: str) -> ProviderReply:
+        return await self._respond(self._answer(message))
+
+    async def send_tool_results(self, results: List[Tuple[str, dict]]) -> ProviderReply:
+        return await self._respond(self._summarise(results))
+
+    async def _stream(self, reply: ProviderReply) -> AsyncIterator[ProviderReply]:
+        """Word by word, with the simulated latency spread over the chunks"""
+        words = reply.text.split(" ") if reply.text else []
+        delay = self.provider.latency_seconds / max(len(words), 1)
+
+        async def chunks():
+            for i, word in enumerate(words):
+                await asyncio.sleep(delay)
+                yield ProviderReply(text=word if i == 0 else " " + word)
+            if reply.tool_calls:
+                await asyncio.sleep(delay)
+                yield ProviderReply(tool_calls=reply.tool_calls)
+
+        async def open_stream():
+            return chunks()
+
+        async for chunk in self.provider.stream(open_stream):
+            yield chunk
+
+    def stream_message(self, message: str) -> AsyncIterator[ProviderReply]:
+        return self._stream(self._answer(message))
+
+    def stream_tool_results(self, results: List[Tuple[str, dict]]) -> AsyncIterator[ProviderReply]:
+        return self._stream(self._summarise(results))
+
+
+class StubChatProvider(ChatProvider):
+    """Answers from keywords with optional simulated latency; no network"""
+    name = "stub"
+
+    def __init__(self, timeout_seconds: float, max_concurrency: int, latency_ms: int = 0):
+        super().__init__(timeout_seconds, max_concurrency)
+        self.latency_seconds = latency_ms / 1000
+
+    def start_chat(self, system_instruction: str, history: List[dict]) -> ChatSession:
+        return StubChatSession(self)
+
+
+_provider: Optional[ChatProvider] = None
+
+
+def get_chat_provider() -> ChatProvider:
+    """Process-wide provider selected by CHAT_PROVIDER"""
+    global _provider
+    if _provider is None:
+        if settings.CHAT_PROVIDER == "stub":
+            _provider = StubChatProvider(
+                settings.CHAT_TIMEOUT_SECONDS, settings.CHAT_MAX_CONCURRENCY, settings.CHAT_STUB_LATENCY_MS
+            )
+        else:
+            _provider = GeminiChatProvider(
+                settings.GEMINI_API_KEY, settings.CHAT_MODEL,
+                settings.CHAT_TIMEOUT_SECONDS, settings.CHAT_MAX_CONCURRENCY
+            )
+        logger.info(f"Chat provider: {_provider.name}")
+    return _provider
@@ -0,0 +1,212 @@
+"""
+Database tools the chat assistant can call.
+
+The stub functions are the tool declarations handed to the model (name,
+signature and docstring become the schema); execute_tool runs the matching
+query. Results are cached per tool and arguments, and dropped whenever
+inventory or warehouses change (see invalidate_tag in app.utils.cache).
+
+Results go into the model prompt, so they are summaries: row caps are
+applied in SQL (with the full match count from a window function), large
+sets come with per-warehouse aggregates, anything cut is flagged with
+"truncated", and the serialized payload must fit CHAT_TOOL_PAYLOAD_MAX_BYTES.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+import json
+import logging
+import time
+from app.config import settings
+from app.database import Database
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+# Define tool schemas for Gemini
+def get_inventory_status(warehouse_name: Optional[str] = None, product_name: Optional[str] = None):
+    """Get the current inventory quantities for products or warehouses. Returns per-warehouse totals and the largest matching stock lines."""
+    pass
+
+def get_low_stock_items():
+    """Get the products that have fallen below their minimum reorder level, most short first."""
+    pass
+
+def get_warehouse_capacities():
+    """Get utilization and capacity information for all warehouses."""
+    pass
+
+def get_recent_movements(limit: int = 5):
+    """Get the most recent stock inbound, outbound, or transfer movements."""
+    pass
+
+
+tools = [get_inventory_status, get_low_stock_items, get_warehouse_capacities, get_recent_movements]
+TOOL_NAMES = {tool.__name__ for tool in tools}
+
+# Seconds a result may be served from cache, and the tables it reads
+TOOL_CACHE_POLICY = {
+    "get_inventory_status": (30.0, ("inventory",)),
+    "get_low_stock_items": (60.0, ("inventory",)),
+    "get_warehouse_capacities": (120.0, ("inventory", "warehouses")),
+    "get_recent_movements": (15.0, ("inventory",)),
+}
+
+tool_caches = {
+    name: TTLCache(f"chat_tool:{name}", maxsize=settings.CHAT_TOOL_CACHE_SIZE, ttl=ttl, tags=tags)
+    for name, (ttl, tags) in TOOL_CACHE_POLICY.items()
+}
+
+
+def _cache_key(args: dict) -> tuple:
+    """Arguments in canonical form; name filters are ILIKE, so case-insensitive"""
+    return tuple(sorted(
+        (k, v.strip().casefold() if isinstance(v, str) else v)
+        for k, v in args.items()
+        if v is not None and v != ""
+    ))
+
+
+async def execute_tool(db: Database, func_name: str, args: dict) -> dict:
+    """Run a tool call from the model, from cache when possible"""
+    cache = tool_caches.get(func_name)
+    if cache is None:
+        return await _run_tool(db, func_name, args)
+    return await cache.get_or_load(_cache_key(args), lambda: _run_tool(db, func_name, args))
+
+
+def _jsonable(value):
+    """Plain JSON types for the model (asyncpg returns Decimal and datetime)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _rows(records, drop=("total_rows",)) -> list:
+    return [{k: _jsonable(v) for k, v in r.items() if k not in drop} for r in records]
+
+
+def _capped(records, key: str) -> dict:
+    """Rows under `key`, plus the full match count and a truncation marker"""
+    total = records[0]["total_rows"] if records else 0
+    result = {key: _rows(records), "total_rows": total}
+    if total > len(records):
+        result["truncated"] = True
+    return result
+
+
+def _fit_budget(result: dict, max_bytes: int) -> dict:
+    """Halve the longest list (keeping its top rows) until the JSON fits max_bytes"""
+    while len(json.dumps(result)) > max_bytes:
+        lists = [(len(v), k) for k, v in result.items() if isinstance(v, list) and v]
+        if not lists:
+            break
+        _, key = max(lists)
+        result[key] = result[key][:len(result[key]) // 2]
+        result["truncated"] = True
+    return result
+
+
+async def _run_tool(db: Database, func_name: str, args: dict) -> dict:
+    started = time.perf_counter()
+    tool_result = await _query_tool(db, func_name, args)
+    tool_result = _fit_budget(tool_result, settings.CHAT_TOOL_PAYLOAD_MAX_BYTES)
+    logger.info(
+        f"Chat tool {func_name}: {len(json.dumps(tool_result))} bytes "
+        f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    return tool_result
+
+
+async def _query_tool(db: Database, func_name: str, args: dict) -> dict:
+    max_rows = settings.CHAT_TOOL_MAX_ROWS
+    tool_result = {}
+    if func_name == "get_inventory_status":
+        where = "WHERE 1=1"
+        params = []
+        idx = 1
+        if 'warehouse_name' in args and args['warehouse_name']:
+            where += f" AND w.warehouse_name ILIKE ${idx}"
+            params.append(f"%{args['warehouse_name']}%")
+            idx += 1
+        if 'product_name' in args and args['product_name']:
+            where += f" AND p.product_name ILIKE ${idx}"
+            params.append(f"%{args['product_name']}%")
+            idx += 1
+
+        totals_q = f"""
+            SELECT w.warehouse_name,
+                   COUNT(*) AS products,
+                   SUM(i.quantity) AS quantity,
+                   SUM(i.reserved_quantity) AS reserved_quantity,
+                   COUNT(*) OVER () AS total_rows
+            FROM inventory i
+            JOIN warehouses w ON i.warehouse_id = w.warehouse_id
+            JOIN products p ON i.product_id = p.product_id
+            {where}
+            GROUP BY w.warehouse_id, w.warehouse_name
+            ORDER BY SUM(i.quantity) DESC
+            LIMIT {max_rows}
+        """
+        rows_q = f"""
+            SELECT w.warehouse_name, p.product_name, i.quantity, i.reserved_quantity,
+                   COUNT(*) OVER () AS total_rows
+            FROM inventory i
+            JOIN warehouses w ON i.warehouse_id = w.warehouse_id
+            JOIN products p ON i.product_id = p.product_id
+            {where}
+            ORDER BY i.quantity DESC
+            LIMIT {max_rows}
+        """
+        totals = await db.fetch_all(totals_q, *params)
+        rows = await db.fetch_all(rows_q, *params)
+        tool_result = _capped(rows, "inventory")
+        tool_result["warehouse_totals"] = _rows(totals)
+        if totals and totals[0]["total_rows"] > len(totals):
+            tool_result["truncated"] = True
+
+    elif func_name == "get_low_stock_items":
+        q = f"""
+            SELECT p.product_name, w.warehouse_name, i.quantity, p.reorder_level,
+                   COUNT(*) OVER () AS total_rows
+            FROM inventory i
+            JOIN products p ON i.product_id = p.product_id
+            JOIN warehouses w ON i.warehouse_id = w.warehouse_id
+            WHERE i.quantity <= p.reorder_level
+            ORDER BY p.reorder_level - i.quantity DESC
+            LIMIT {max_rows}
+        """
+        rows = await db.fetch_all(q)
+        tool_result = _capped(rows, "low_stock_items")
+
+    elif func_name == "get_warehouse_capacities":
+        q = f"""
+            SELECT w.warehouse_name, w.capacity_cubic_meters AS capacity,
+                   COALESCE(SUM(i.quantity * p.volume_cubic_meters), 0) AS used,
+                   COUNT(*) OVER () AS total_rows
+            FROM warehouses w
+            LEFT JOIN inventory i ON w.warehouse_id = i.warehouse_id
+            LEFT JOIN products p ON i.product_id = p.product_id
+            GROUP BY w.warehouse_id
+            ORDER BY COALESCE(SUM(i.quantity * p.volume_cubic_meters), 0) / w.capacity_cubic_meters DESC
+            LIMIT {max_rows}
+        """
+        rows = await db.fetch_all(q)
+        tool_result = _capped(rows, "warehouses")
+
+    elif func_name == "get_recent_movements":
+        limit = min(max(int(args.get('limit', 5)), 1), max_rows)
+        q = """
+            SELECT p.product_name AS product, sm.quantity AS qty, sm.movement_type AS type, sm.created_at AS date
+            FROM stock_movements sm
+            JOIN products p ON sm.product_id = p.product_id
+            ORDER BY sm.created_at DESC
+            LIMIT $1
+        """
+        rows = await db.fetch_all(q, limit)
+        tool_result = {"movements": _rows(rows)}
+
+    return tool_result
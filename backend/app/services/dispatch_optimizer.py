@@ -0,0 +1,184 @@
+"""
+Batch dispatch: assign vehicles and drivers to many planned shipments at once.
+
+Two rectangular assignment problems are solved with the Hungarian method
+(scipy's linear_sum_assignment) on cost matrices built with numpy:
+
+* shipment x vehicle - infeasible when the load exceeds capacity or the
+  vehicle is booked in an overlapping window; otherwise the unused share of
+  capacity, so loads go to the tightest vehicle that holds them.
+* shipment x driver - infeasible on overlapping bookings; otherwise the
+  driver's already-booked hours plus the trip duration, to spread work.
+
+Keeping the current vehicle/driver gets a small bonus so re-planning is stable.
+The solver runs in a worker process so the event loop is never blocked.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+import asyncio
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from app.services.availability_index import AvailabilityIndex, _naive_utc
+
+INFEASIBLE = 1e6
+KEEP_CURRENT_BONUS = 0.05
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _conflicts(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    bookings: Sequence[Sequence[tuple]],
+) -> np.ndarray:
+    """
+    Boolean matrix [shipment, resource]: does the shipment window overlap any
+    existing booking of the resource? Bookings per resource are disjoint and
+    sorted, so one searchsorted per resource decides every shipment at once.
+    Shipments without a schedule (NaN) never conflict.
+    """
+    result = np.zeros((starts.size, len(bookings)), dtype=bool)
+    for r, intervals in enumerate(bookings):
+        if not intervals:
+            continue
+        b = np.asarray(intervals, dtype=np.float64)
+        i = np.searchsorted(b[:, 0], ends, side="left") - 1
+        valid = i >= 0
+        result[valid, r] = b[i[valid], 1] > starts[valid]
+    return result
+
+
+def solve_dispatch(
+    shipments: Dict[str, list],
+    vehicles: Dict[str, list],
+    drivers: Dict[str, list],
+) -> List[tuple]:
+    """
+    Compute the assignment. Inputs are column-oriented plain lists so they
+    pickle cheaply; times are epoch seconds (NaN when unscheduled).
+
+    Returns [(shipment_id, vehicle_id or None, driver_id or None), ...].
+    """
+    ship_ids = np.asarray(shipments["shipment_id"], dtype=np.int64)
+    if ship_ids.size == 0:
+        return []
+
+    starts = np.asarray(shipments["start"], dtype=np.float64)
+    ends = np.asarray(shipments["end"], dtype=np.float64)
+    weight = np.asarray(shipments["weight_kg"], dtype=np.float64)
+    volume = np.asarray(shipments["volume_cubic_meters"], dtype=np.float64)
+    hours = np.asarray(shipments["estimated_hours"], dtype=np.float64)
+
+    # ---------- shipment x vehicle ----------
+    veh_ids = np.asarray(vehicles["vehicle_id"], dtype=np.int64)
+    vehicle_for = [None] * ship_ids.size
+    if veh_ids.size:
+        cap_kg = np.asarray(vehicles["capacity_kg"], dtype=np.float64)
+        cap_m3 = np.asarray(vehicles["capacity_cubic_meters"], dtype=np.float64)
+        fill = np.maximum(weight[:, None] / cap_kg[None, :], volume[:, None] / cap_m3[None, :])
+        cost = 1.0 - fill
+        cost[fill > 1.0] = INFEASIBLE
+        cost[_conflicts(starts, ends, vehicles["bookings"])] = INFEASIBLE
+        current = np.asarray(shipments["vehicle_id"], dtype=np.int64)
+        cost[current[:, None] == veh_ids[None, :]] -= KEEP_CURRENT_BONUS
+
+        rows, cols = linear_sum_assignment(cost)
+        for r, c in zip(rows, cols):
+            if cost[r, c] < INFEASIBLE / 2:
+                vehicle_for[r] = int(veh_ids[c])
+
+    # ---------- shipment x driver ----------
+    drv_ids = np.asarray(drivers["driver_id"], dtype=np.int64)
+    driver_for = [None] * ship_ids.size
+    if drv_ids.size:
+        booked = np.asarray(drivers["booked_hours"], dtype=np.float64)
+        cost = (booked[None, :] + hours[:, None]) / 24.0
+        cost[_conflicts(starts, ends, drivers["bookings"])] = INFEASIBLE
+        current = np.asarray(shipments["driver_id"], dtype=np.int64)
+        cost[current[:, None] == drv_ids[None, :]] -= KEEP_CURRENT_BONUS
+
+        rows, cols = linear_sum_assignment(cost)
+        for r, c in zip(rows, cols):
+            if cost[r, c] < INFEASIBLE / 2:
+                driver_for[r] = int(drv_ids[c])
+
+    return [
+        (int(ship_ids[i]), vehicle_for[i], driver_for[i])
+        for i in range(ship_ids.size)
+    ]
+
+
+def _epoch(value: Optional[datetime]) -> float:
+    if value is None:
+        return float("nan")
+    return _naive_utc(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+def build_solver_inputs(
+    shipments: List[dict],
+    vehicles: List[dict],
+    drivers: List[dict],
+    index: AvailabilityIndex,
+) -> tuple:
+    """
+    Column-oriented solver inputs. Existing bookings come from the
+    availability index minus the shipments being re-planned.
+    """
+    batch = {s["shipment_id"] for s in shipments}
+
+    def bookings(resource_indexes) -> List[List[tuple]]:
+        return [
+            [(_epoch(start), _epoch(end)) for start, end in resource.intervals(batch)] if resource else []
+            for resource in resource_indexes
+        ]
+
+    vehicle_bookings = bookings(index.vehicles.get(v["vehicle_id"]) for v in vehicles)
+    driver_bookings = bookings(index.drivers.get(d["driver_id"]) for d in drivers)
+
+    shipment_cols = {
+        "shipment_id": [s["shipment_id"] for s in shipments],
+        "vehicle_id": [s["vehicle_id"] for s in shipments],
+        "driver_id": [s["driver_id"] for s in shipments],
+        "start": [_epoch(s["scheduled_departure"]) for s in shipments],
+        "end": [_epoch(s["scheduled_arrival"]) for s in shipments],
+        "weight_kg": [s["weight_kg"] for s in shipments],
+        "volume_cubic_meters": [s["volume_cubic_meters"] for s in shipments],
+        "estimated_hours": [s["estimated_hours"] for s in shipments],
+    }
+    vehicle_cols = {
+        "vehicle_id": [v["vehicle_id"] for v in vehicles],
+        "capacity_kg": [float(v["capacity_kg"]) for v in vehicles],
+        "capacity_cubic_meters": [float(v["capacity_cubic_meters"]) for v in vehicles],
+        "bookings": vehicle_bookings,
+    }
+    driver_cols = {
+        "driver_id": [d["driver_id"] for d in drivers],
+        "booked_hours": [sum(end - start for start, end in b) / 3600.0 for b in driver_bookings],
+        "bookings": driver_bookings,
+    }
+    return shipment_cols, vehicle_cols, driver_cols
+
+
+def start_solver_pool(max_workers: int) -> None:
+    """Spawn the worker process(es) and import the solver in them up front"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers)
+        _pool.submit(solve_dispatch, {"shipment_id": []}, {}, {})
+
+
+def shutdown_solver_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_dispatch_solver(shipments: dict, vehicles: dict, drivers: dict) -> List[tuple]:
+    """Run solve_dispatch in the worker pool"""
+    if _pool is None:
+        start_solver_pool(1)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, solve_dispatch, shipments, vehicles, drivers)
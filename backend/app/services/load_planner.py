@@ -0,0 +1,132 @@
+"""
+Vehicle load planning: pack orders into vehicles by weight and volume.
+
+Two-dimensional bin packing solved with first-fit-decreasing followed by a
+local-search pass that tries to empty the least-loaded vehicles and then
+swaps each load onto the smallest idle vehicle that still holds it.
+Pure CPU work on numpy arrays - call it off the event loop.
+"""
+from typing import List, Sequence
+import numpy as np
+
+# Upper bound on bin-elimination attempts in the improvement pass
+MAX_ELIMINATION_ROUNDS = 200
+
+
+def plan_loads(
+    order_ids: Sequence[int],
+    weights: Sequence[float],
+    volumes: Sequence[float],
+    vehicle_ids: Sequence[int],
+    capacity_kg: Sequence[float],
+    capacity_m3: Sequence[float],
+) -> dict:
+    """
+    Assign orders to vehicles minimising the number of vehicles used.
+
+    Returns {"loads": [(vehicle_id, [order_id, ...], weight, volume), ...],
+             "unassigned": [order_id, ...]}
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    w = np.asarray(weights, dtype=np.float64)
+    v = np.asarray(volumes, dtype=np.float64)
+    veh_ids = np.asarray(vehicle_ids, dtype=np.int64)
+    cap_w = np.asarray(capacity_kg, dtype=np.float64)
+    cap_v = np.asarray(capacity_m3, dtype=np.float64)
+
+    if order_ids.size == 0 or veh_ids.size == 0:
+        return {"loads": [], "unassigned": order_ids.tolist()}
+
+    # Normalise both dimensions against the largest vehicle so that
+    # "size" is comparable across weight-bound and volume-bound orders
+    ref_w, ref_v = cap_w.max(), cap_v.max()
+    item_size = np.maximum(w / ref_w, v / ref_v)
+    vehicle_size = cap_w / ref_w + cap_v / ref_v
+
+    # Open the biggest vehicles first; place the biggest orders first
+    vehicle_order = np.argsort(-vehicle_size, kind="stable")
+    cap_w, cap_v, veh_ids = cap_w[vehicle_order], cap_v[vehicle_order], veh_ids[vehicle_order]
+    vehicle_size = vehicle_size[vehicle_order]
+
+    rem_w = cap_w.copy()
+    rem_v = cap_v.copy()
+    is_open = np.zeros(veh_ids.size, dtype=bool)
+    bin_of = np.full(order_ids.size, -1, dtype=np.int64)
+
+    # ---------- First-fit decreasing ----------
+    for i in np.argsort(-item_size, kind="stable"):
+        fits = np.flatnonzero(is_open & (rem_w >= w[i]) & (rem_v >= v[i]))
+        if fits.size == 0:
+            # Open the largest idle vehicle that can carry the order
+            fits = np.flatnonzero(~is_open & (cap_w >= w[i]) & (cap_v >= v[i]))
+            if fits.size == 0:
+                continue
+            is_open[fits[0]] = True
+        b = fits[0]
+        bin_of[i] = b
+        rem_w[b] -= w[i]
+        rem_v[b] -= v[i]
+
+    # ---------- Local search: try to empty the least-loaded vehicles ----------
+    failed = set()
+    for _ in range(MAX_ELIMINATION_ROUNDS):
+        candidates = [
+            b for b in np.flatnonzero(is_open) if b not in failed
+        ]
+        if len(candidates) < 2:
+            break
+        fill = np.maximum(1 - rem_w[candidates] / cap_w[candidates],
+                          1 - rem_v[candidates] / cap_v[candidates])
+        target = candidates[int(np.argmin(fill))]
+
+        members = np.flatnonzero(bin_of == target)
+        trial_w, trial_v = rem_w.copy(), rem_v.copy()
+        moves = []
+        others = is_open.copy()
+        others[target] = False
+        for i in members[np.argsort(-item_size[members], kind="stable")]:
+            fits = np.flatnonzero(others & (trial_w >= w[i]) & (trial_v >= v[i]))
+            if fits.size == 0:
+                moves = None
+                break
+            # Best fit: the vehicle left tightest after the move
+            slack = np.maximum((trial_w[fits] - w[i]) / cap_w[fits],
+                               (trial_v[fits] - v[i]) / cap_v[fits])
+            b = fits[int(np.argmin(slack))]
+            trial_w[b] -= w[i]
+            trial_v[b] -= v[i]
+            moves.append((i, b))
+
+        if moves is None:
+            failed.add(target)
+            continue
+
+        for i, b in moves:
+            bin_of[i] = b
+        rem_w, rem_v = trial_w, trial_v
+        rem_w[target], rem_v[target] = cap_w[target], cap_v[target]
+        is_open[target] = False
+        failed.clear()
+
+    # ---------- Downsize: move each load to the smallest idle vehicle that holds it ----------
+    load_w = cap_w - rem_w
+    load_v = cap_v - rem_v
+    for b in np.flatnonzero(is_open)[::-1]:
+        idle = np.flatnonzero(~is_open & (cap_w >= load_w[b]) & (cap_v >= load_v[b]))
+        if idle.size == 0:
+            continue
+        smaller = idle[vehicle_size[idle] < vehicle_size[b]]
+        if smaller.size == 0:
+            continue
+        s = smaller[-1]  # vehicles are sorted largest first, so the last is smallest
+        bin_of[bin_of == b] = s
+        is_open[b], is_open[s] = False, True
+        load_w[s], load_v[s] = load_w[b], load_v[b]
+        load_w[b] = load_v[b] = 0.0
+
+    loads: List[tuple] = []
+    for b in np.flatnonzero(is_open):
+        members = order_ids[bin_of == b]
+        loads.append((int(veh_ids[b]), members.tolist(), float(load_w[b]), float(load_v[b])))
+
+    return {"loads": loads, "unassigned": order_ids[bin_of < 0].tolist()}
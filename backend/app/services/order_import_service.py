@@ -0,0 +1,93 @@
+from typing import Set
+import asyncio
+import logging
+import os
+from app.database import Database
+from app.repositories.order_import_repositories import OrderImportRepository
+
+logger = logging.getLogger(__name__)
+
+
+class OrderImportService:
+    """Runs a bulk order import job: COPY -> set-based validation -> INSERT ... SELECT"""
+
+    def __init__(self, db: Database, statement_timeout: float):
+        self.repo = OrderImportRepository(db)
+        self.statement_timeout = statement_timeout
+
+    async def run_job(self, job_id: int, path: str) -> None:
+        """
+        Process an uploaded partner file. Progress is tracked on the job row.
+        Every statement gets `statement_timeout` seconds, well past the pool's
+        DB_COMMAND_TIMEOUT, since a nightly file runs to a million lines.
+        """
+        with self.repo.db.statement_timeout(self.statement_timeout):
+            await self._run_job(job_id, path)
+
+    async def _run_job(self, job_id: int, path: str) -> None:
+        timeout = self.statement_timeout
+        rejected = 0
+        try:
+            await self.repo.update_job(job_id, "loading")
+            await self.repo.create_staging(job_id)
+            total, rejected = await self.repo.load_staging(job_id, path, timeout)
+
+            await self.repo.update_job(job_id, "validating", total_lines=total)
+            rejected += await self.repo.reject_invalid_lines(job_id)
+            rejected += await self.repo.reject_incomplete_orders(job_id)
+
+            await self.repo.update_job(job_id, "inserting", rejected_lines=rejected)
+            imported_orders, imported_lines = await self.repo.insert_orders(job_id, timeout)
+
+            await self.repo.update_job(
+                job_id, "completed",
+                imported_orders=imported_orders,
+                imported_lines=imported_lines
+            )
+            logger.info(
+                f"Order import {job_id} completed: {total} lines, "
+                f"{imported_orders} orders, {rejected} rejected"
+            )
+        except asyncio.CancelledError:
+            logger.warning(f"Order import {job_id} interrupted by shutdown")
+            await self.repo.update_job(job_id, "failed", error_message="Interrupted by server shutdown")
+            raise
+        except Exception as e:
+            logger.error(f"Order import {job_id} failed: {e}")
+            await self.repo.update_job(job_id, "failed", error_message=str(e))
+        finally:
+            try:
+                await self.repo.drop_staging(job_id)
+            except Exception as e:
+                logger.error(f"Failed to drop staging tables for import {job_id}: {e}")
+            os.remove(path)
+
+
+class OrderImportRunner:
+    """
+    Runs import jobs as tasks owned by the application rather than by the
+    uploading request, so a job neither holds the request (and its
+    admission slot) open nor depends on it; shutdown cancels what is left.
+    """
+
+    def __init__(self, db: Database, statement_timeout: float):
+        self.db = db
+        self.statement_timeout = statement_timeout
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, job_id: int, path: str) -> None:
+        service = OrderImportService(self.db, self.statement_timeout)
+        task = asyncio.create_task(service.run_job(job_id, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # run_job records failures on the job; this is one it could not record
+            logger.error(f"Order import task failed: {task.exception()!r}")
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
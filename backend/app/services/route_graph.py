@@ -0,0 +1,157 @@
+"""
+In-memory graph of the `routes` table for multi-hop path queries.
+
+Every route is a directed edge weighted by distance_km or estimated_hours.
+Shortest paths are precomputed from every city with Dijkstra for both
+metrics, so a lookup is a dictionary hit plus a short path walk; assembled
+answers are memoised so repeated lookups for a pair are plain dict reads.
+Only pairs of known cities are memoised, so the memo is bounded by the
+graph (cities² × metrics) however many unknown names are looked up.
+"""
+from typing import Dict, List, Optional
+import asyncio
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS = {"distance": "distance_km", "time": "estimated_hours"}
+
+
+def _city_key(city: str) -> str:
+    return " ".join(city.split()).casefold()
+
+
+class RouteGraph:
+    """Directed route graph with precomputed single-source shortest paths"""
+
+    def __init__(self, routes: List[dict]):
+        self.names: Dict[str, str] = {}
+        self.edges: Dict[str, List[dict]] = {}
+        for route in routes:
+            origin = _city_key(route["origin_city"])
+            destination = _city_key(route["destination_city"])
+            self.names.setdefault(origin, route["origin_city"])
+            self.names.setdefault(destination, route["destination_city"])
+            self.edges.setdefault(origin, []).append({
+                "route_id": route["route_id"],
+                "origin": origin,
+                "destination": destination,
+                "distance_km": float(route["distance_km"]),
+                "estimated_hours": float(route["estimated_hours"]),
+            })
+
+        # metric -> source -> destination -> incoming edge on the shortest path
+        self._tree: Dict[str, Dict[str, Dict[str, dict]]] = {m: {} for m in METRICS}
+        self._paths: Dict[tuple, Optional[dict]] = {}
+
+    def precompute(self) -> "RouteGraph":
+        """All-pairs shortest paths: one Dijkstra run per city and metric"""
+        for metric, weight in METRICS.items():
+            for source in self.names:
+                self._tree[metric][source] = self._dijkstra(source, weight)
+        return self
+
+    def _dijkstra(self, source: str, weight: str) -> Dict[str, dict]:
+        dist = {source: 0.0}
+        via: Dict[str, dict] = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, city = heapq.heappop(heap)
+            if d > dist[city]:
+                continue
+            for edge in self.edges.get(city, ()):
+                candidate = d + edge[weight]
+                if candidate < dist.get(edge["destination"], float("inf")):
+                    dist[edge["destination"]] = candidate
+                    via[edge["destination"]] = edge
+                    heapq.heappush(heap, (candidate, edge["destination"]))
+        return via
+
+    def shortest_path(self, origin_city: str, destination_city: str, metric: str) -> Optional[dict]:
+        """Cheapest multi-hop path between two cities, or None if unreachable"""
+        key = (_city_key(origin_city), _city_key(destination_city), metric)
+        if key in self._paths:
+            return self._paths[key]
+
+        origin, destination, _ = key
+        if origin not in self.names or destination not in self.names:
+            return None
+        tree = self._tree[metric].get(origin)
+        path = None
+        if tree is not None and origin != destination and destination in tree:
+            legs = []
+            city = destination
+            while city != origin:
+                edge = tree[city]
+                legs.append(edge)
+                city = edge["origin"]
+            legs.reverse()
+            path = {
+                "origin_city": self.names[origin],
+                "destination_city": self.names[destination],
+                "metric": metric,
+                "total_distance_km": round(sum(e["distance_km"] for e in legs), 2),
+                "total_hours": round(sum(e["estimated_hours"] for e in legs), 2),
+                "hops": len(legs),
+                "legs": [
+                    {
+                        "route_id": e["route_id"],
+                        "origin_city": self.names[e["origin"]],
+                        "destination_city": self.names[e["destination"]],
+                        "distance_km": e["distance_km"],
+                        "estimated_hours": e["estimated_hours"],
+                    }
+                    for e in legs
+                ],
+            }
+
+        self._paths[key] = path
+        return path
+
+
+class RouteGraphCache:
+    """
+    Process-wide holder of the current RouteGraph.
+
+    Rebuilt lazily after invalidate() (called by route writes in this process)
+    or once the TTL expires, which bounds staleness across workers.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._graph: Optional[RouteGraph] = None
+        self._built_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._graph = None
+
+    def _is_fresh(self) -> bool:
+        return self._graph is not None and time.monotonic() - self._built_at < self.ttl_seconds
+
+    async def get(self, load_routes) -> RouteGraph:
+        """Return the cached graph, rebuilding it with `load_routes()` when stale"""
+        if self._is_fresh():
+            return self._graph
+
+        async with self._lock:
+            if self._is_fresh():
+                return self._graph
+
+            generation = self._generation
+            routes = await load_routes()
+            started = time.perf_counter()
+            graph = await asyncio.to_thread(lambda: RouteGraph(routes).precompute())
+            logger.info(
+                f"Route graph built: {len(graph.names)} cities, {len(routes)} routes "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            # A route changed while we were loading; serve this build but don't keep it
+            if generation == self._generation:
+                self._graph = graph
+                self._built_at = time.monotonic()
+            return graph
@@ -0,0 +1,163 @@
+"""
+Batching writer for shipment status events.
+
+Requests only enqueue events (bounded, so overload turns into fast 503s
+instead of unbounded memory); a background task drains the queue and writes
+every FLUSH_INTERVAL or BATCH_SIZE events with one COPY plus one UPDATE.
+"""
+from datetime import datetime
+from typing import Callable, List, Optional
+import asyncio
+import logging
+import time
+
+import asyncpg
+
+from app.repositories.shipment_repositories import TransportationRepository
+from app.services.availability_index import _naive_utc
+from app.utils.exceptions import ServiceBusyError
+
+logger = logging.getLogger(__name__)
+
+# Attempts per batch when the database errors before it is dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class ShipmentEventWriter:
+    """In-memory event queue with a single background flusher"""
+
+    def __init__(
+        self,
+        repo: TransportationRepository,
+        max_queue: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        on_flush: Optional[Callable[[], None]] = None,
+    ):
+        self.repo = repo
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.on_flush = on_flush
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[tuple] = []
+        self._in_flight: Optional[asyncio.Future] = None
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, events: List[dict]) -> int:
+        """
+        Enqueue a request's events, all or nothing.
+        Raises ServiceBusyError when the queue cannot take them.
+        """
+        if self._task is None:
+            raise ServiceBusyError("Shipment event writer is not running", retry_after=5)
+        if self._queue.maxsize - self._queue.qsize() < len(events):
+            raise ServiceBusyError("Shipment event queue is full, retry shortly")
+
+        received_at = datetime.utcnow()
+        for event in events:
+            occurred_at = event.get("occurred_at")
+            self._queue.put_nowait((
+                event["shipment_id"],
+                event["event_type"],
+                _naive_utc(occurred_at) if occurred_at else received_at,
+                received_at,
+                event.get("notes"),
+            ))
+        return len(events)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Shipment event writer started")
+
+    async def stop(self) -> None:
+        """Stop accepting events and write whatever is still queued"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if self._in_flight is not None:
+            await self._in_flight
+
+        batch, self._batch = self._batch, []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+        logger.info(f"Shipment event writer stopped ({self.written} written, {self.dropped} dropped)")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # Block for the first event, then collect until the batch is full
+                # or the flush interval has passed. The batch lives on self so
+                # stop() can still write it if we are cancelled mid-collection.
+                self._batch.append(await self._queue.get())
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                batch, self._batch = self._batch, []
+                # Shielded so shutdown never aborts a write half way
+                self._in_flight = asyncio.ensure_future(self._flush(batch))
+                await asyncio.shield(self._in_flight)
+                self._in_flight = None
+            except Exception:
+                # Keep the writer alive; submit() would otherwise queue forever
+                self._in_flight = None
+                logger.exception("Shipment event writer loop failed")
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        drop_unknown = False
+        for attempt in range(1, MAX_FLUSH_ATTEMPTS + 1):
+            try:
+                if drop_unknown:
+                    # Unknown shipment ids poison the whole COPY; drop just those events
+                    known = set(await self.repo.get_existing_shipment_ids(list({e[0] for e in batch})))
+                    kept = [e for e in batch if e[0] in known]
+                    self.dropped += len(batch) - len(kept)
+                    logger.warning(f"Dropped {len(batch) - len(kept)} events for unknown shipments")
+                    batch = kept
+                    drop_unknown = False
+                    if not batch:
+                        return
+                updated = await self.repo.write_shipment_events(batch)
+                break
+            except asyncpg.exceptions.ForeignKeyViolationError:
+                drop_unknown = True
+            except Exception as e:
+                logger.error(f"Shipment event flush failed (attempt {attempt}): {e}")
+                if attempt == MAX_FLUSH_ATTEMPTS:
+                    self.dropped += len(batch)
+                    return
+                await asyncio.sleep(attempt)
+        else:
+            self.dropped += len(batch)
+            return
+
+        self.written += len(batch)
+        self.flushes += 1
+        if updated and self.on_flush is not None:
+            try:
+                self.on_flush()
+            except Exception:
+                logger.exception("Shipment event on_flush callback failed")
@@ -0,0 +1,275 @@
+"""
+Admission control in front of the database-bound API.
+
+Instead of letting every request queue in pool.acquire() for as long as
+it takes, at most `limit` requests run at once. The limit adapts to
+observed latency (AIMD): it grows by about one per round of requests while
+requests finish near their route's usual latency, and shrinks by
+ADMISSION_BACKOFF when they come back much slower, at most once per
+average request time.
+
+Requests over the limit wait in a bounded priority queue (stock movements
+and shipment events ahead of normal traffic, analytics and batch planning
+last); when it is full, a newcomer displaces the newest lower-priority
+waiter. A request whose expected wait already exceeds its class budget, or
+whose wait runs over it, gets 503 with Retry-After straight away.
+"""
+from heapq import heappop, heappush
+from itertools import count
+from math import ceil
+from typing import Dict, List, Optional
+import asyncio
+import time
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.utils import metrics
+from app.utils.exceptions import ServiceBusyError
+
+CRITICAL, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {CRITICAL: "critical", NORMAL: "normal", LOW: "low"}
+
+# (method or None for any, path prefix below API_V1_PREFIX, priority); first match wins
+ROUTE_PRIORITIES = (
+    ("POST", "/inventory/movements", CRITICAL),
+    ("PUT", "/inventory/", CRITICAL),
+    ("POST", "/transportation/shipments/events", CRITICAL),
+    (None, "/analytics", LOW),
+    (None, "/orders/imports", LOW),
+    ("POST", "/transportation/dispatch-plan", LOW),
+    ("POST", "/transportation/load-plan", LOW),
+)
+
+# A latency sample counts toward avg_latency as at most this many averages
+OUTLIER_FACTOR = 4
+
+# Not admission-controlled: the chat model has its own concurrency limit
+# and streams, diagnostics must stay reachable under load
+EXEMPT_PREFIXES = ("/chat", "/debug")
+
+
+def route_priority(method: str, path: str) -> Optional[int]:
+    """Priority class of a request, or None when it bypasses admission control"""
+    if not path.startswith(settings.API_V1_PREFIX):
+        return None
+    path = path[len(settings.API_V1_PREFIX):]
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    for rule_method, prefix, priority in ROUTE_PRIORITIES:
+        if (rule_method is None or rule_method == method) and path.startswith(prefix):
+            return priority
+    return NORMAL
+
+
+class AdmissionController:
+    """Event-loop only, like the caches; no locking"""
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, max_queue: int,
+                 budgets: Dict[int, float], backoff: float, tolerance: float, latency_floor_ms: float):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.budgets = budgets
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.latency_floor = latency_floor_ms / 1000
+        self.in_flight = 0
+        # Heap of (priority, arrival, future); entries whose future is done gave up
+        self._waiters: List[tuple] = []
+        self._arrivals = count()
+        self.queued: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.admitted: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.rejected: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        # Usual (near-minimum) latency per route, and recent average over all routes
+        self.baselines: Dict[str, float] = {}
+        self.avg_latency = 0.05
+        self._last_decrease = 0.0
+
+    def _expected_wait(self, priority: int) -> float:
+        ahead = sum(n for p, n in self.queued.items() if p <= priority)
+        return (ahead + 1) * self.avg_latency / max(int(self.limit), 1)
+
+    def _reject(self, priority: int, seconds: float) -> ServiceBusyError:
+        self.rejected[priority] += 1
+        return ServiceBusyError("Server is busy, please retry shortly", retry_after=max(1, ceil(seconds)))
+
+    async def acquire(self, priority: int) -> bool:
+        """
+        Take a slot, waiting in the priority queue if needed; ServiceBusyError
+        when over budget. Returns whether the server was quiet (under half
+        the limit busy), i.e. whether this request's latency is a baseline sample.
+        """
+        if self.in_flight < int(self.limit) and not any(self.queued.values()):
+            quiet = self.in_flight < self.limit / 2
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            return quiet
+
+        budget = self.budgets[priority]
+        expected = self._expected_wait(priority)
+        if expected > budget:
+            raise self._reject(priority, expected)
+        if sum(self.queued.values()) >= self.max_queue and not self._evict_below(priority):
+            raise self._reject(priority, expected)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heappush(self._waiters, (priority, next(self._arrivals), waiter))
+        self.queued[priority] += 1
+        try:
+            await asyncio.wait_for(waiter, budget)
+        except asyncio.TimeoutError:
+            raise self._reject(priority, self._expected_wait(priority))
+        except BaseException:
+            # Cancelled (client gone) right after a slot was handed over
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                self.queued[priority] -= 1
+        self.admitted[priority] += 1
+        return False
+
+    def release(self, route: str, latency: float, quiet: bool = False) -> None:
+        self._adapt(route, latency, quiet)
+        self.in_flight -= 1
+        self._wake()
+
+    def _evict_below(self, priority: int) -> bool:
+        """Full queue: shed the newest waiter of the lowest priority below `priority`"""
+        victims = [w for w in self._waiters if w[0] > priority and not w[2].done()]
+        if not victims:
+            return False
+        victim_priority, _, waiter = max(victims)
+        self.queued[victim_priority] -= 1
+        waiter.set_exception(self._reject(victim_priority, self._expected_wait(victim_priority)))
+        return True
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            priority, _, waiter = heappop(self._waiters)
+            if waiter.done():
+                continue
+            self.queued[priority] -= 1
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _adapt(self, route: str, latency: float, quiet: bool) -> None:
+        """AIMD on the limit, judging each latency against its route's baseline"""
+        # One very slow request (a long stream, a huge report) must not make
+        # every queued request look hopeless, nor stall decreases for as long
+        # as it took: clamp what it adds to the average
+        sample = min(latency, OUTLIER_FACTOR * self.avg_latency + self.latency_floor)
+        self.avg_latency += 0.1 * (sample - self.avg_latency)
+        baseline = self.baselines.get(route)
+        if quiet:
+            # Learned only from requests that ran without contention, so a
+            # long overload is never mistaken for the route's normal speed;
+            # drifts up slowly so a route that genuinely got slower is re-learned
+            if baseline is None or latency < baseline:
+                baseline = latency
+            else:
+                baseline += 0.05 * (latency - baseline)
+            self.baselines[route] = baseline
+        if baseline is None:
+            return
+
+        now = time.monotonic()
+        if latency > baseline * self.tolerance and latency > self.latency_floor:
+            if now - self._last_decrease >= self.avg_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.in_flight >= int(self.limit):
+            # Only grow while the limit is what holds requests back
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "avg_latency_ms": round(self.avg_latency * 1000, 2),
+            "queued": {PRIORITY_NAMES[p]: n for p, n in self.queued.items()},
+            "admitted": {PRIORITY_NAMES[p]: n for p, n in self.admitted.items()},
+            "rejected": {PRIORITY_NAMES[p]: n for p, n in self.rejected.items()},
+            "budgets_seconds": {PRIORITY_NAMES[p]: s for p, s in self.budgets.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI; must sit inside CORSMiddleware so 503s carry CORS headers"""
+
+    def __init__(self, app, controller: "AdmissionController"):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        priority = route_priority(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            quiet = await self.controller.acquire(priority)
+        except ServiceBusyError as e:
+            response = JSONResponse(
+                {"detail": e.message}, status_code=503,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                route = getattr(scope.get("route"), "path", scope["path"])
+                self.controller.release(route, time.perf_counter() - started, quiet)
+
+        async def send_releasing(message):
+            await send(message)
+            # The slot ends with the response; background tasks that run
+            # after it (e.g. BackgroundTasks) neither hold it nor count as latency
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                release()
+
+        try:
+            await self.app(scope, receive, send_releasing)
+        finally:
+            release()
+
+
+admission_controller = AdmissionController(
+    initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+    min_limit=settings.ADMISSION_MIN_LIMIT,
+    max_limit=settings.ADMISSION_MAX_LIMIT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    budgets={
+        CRITICAL: settings.ADMISSION_BUDGET_CRITICAL_SECONDS,
+        NORMAL: settings.ADMISSION_BUDGET_NORMAL_SECONDS,
+        LOW: settings.ADMISSION_BUDGET_LOW_SECONDS,
+    },
+    backoff=settings.ADMISSION_BACKOFF,
+    tolerance=settings.ADMISSION_LATENCY_TOLERANCE,
+    latency_floor_ms=settings.ADMISSION_LATENCY_FLOOR_MS,
+)
+
+
+def _admission_metrics():
+    c = admission_controller
+    limit = metrics.Gauge("admission_limit", "Current adaptive concurrency limit", register=False)
+    limit.set((), int(c.limit))
+    in_flight = metrics.Gauge("admission_in_flight", "Admitted requests running", register=False)
+    in_flight.set((), c.in_flight)
+    queued = metrics.Gauge("admission_queued", "Requests waiting for a slot", ("priority",), register=False)
+    rejected = metrics.Counter("admission_rejected_total", "Requests shed with 503", ("priority",), register=False)
+    for p, name in PRIORITY_NAMES.items():
+        queued.set((name,), c.queued[p])
+        rejected.inc((name,), c.rejected[p])
+    return [limit, in_flight, queued, rejected]
+
+
+metrics.collectors.append(_admission_metrics)
@@ -1,10 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from app.config import settings
+from app.utils.exceptions import ServiceBusyError
+import asyncio
+import threading
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min == max == default: a hash made with any other cost "needs update" and is
+# re-hashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,6 +25,99 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool (bcrypt releases the GIL),
+    so hashing never blocks the event loop. At most `max_pending` calls may
+    be queued or running; beyond that callers get ServiceBusyError rather
+    than an ever-growing queue.
+
+    `running` and the timing totals are updated from the worker threads,
+    so they are guarded by `_stats_lock`; the other counters only change
+    on the event loop.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.run_ms_total = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceBusyError("Too many concurrent sign-ins, retry shortly")
+
+        self.pending += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            with self._stats_lock:
+                self.running += 1
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                wait_ms = (started - submitted) * 1000
+                with self._stats_lock:
+                    self.running -= 1
+                    self.wait_ms_total += wait_ms
+                    self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+                    self.run_ms_total += (finished - started) * 1000
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), timed)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored cost is outdated"""
+        return await self._run(pwd_context.verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            running = self.running
+            wait_ms_total, wait_ms_max, run_ms_total = self.wait_ms_total, self.wait_ms_max, self.run_ms_total
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "running": running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(wait_ms_total / self.completed, 2) if self.completed else 0.0,
+            "max_wait_ms": round(wait_ms_max, 2),
+            "avg_run_ms": round(run_ms_total / self.completed, 2) if self.completed else 0.0,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
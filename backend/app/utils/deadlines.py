@@ -0,0 +1,112 @@
+"""
+Per-route statement time budgets, and cancellation of abandoned reads.
+
+Each request gets a statement timeout from STATEMENT_TIMEOUTS (via
+Database.statement_timeout), so a slow list query gives up after seconds
+instead of holding its pool connection for the full DB_COMMAND_TIMEOUT;
+it is answered with 504.
+
+GET and HEAD requests also run in their own task while the client
+connection is watched: when the client goes away before the response is
+complete, the task is cancelled, which makes asyncpg cancel the running
+statement on the server and return the connection to the pool at once.
+Writes are never cancelled, so a closed tab cannot leave a stock movement
+half-known; they just get their budget.
+"""
+from typing import Optional
+import asyncio
+import logging
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.database import db
+from app.utils.exceptions import QueryTimeoutError
+
+logger = logging.getLogger(__name__)
+
+CANCELLABLE_METHODS = ("GET", "HEAD")
+
+# (method or None for any, path prefix below API_V1_PREFIX, seconds or None
+# for DB_COMMAND_TIMEOUT); first match wins
+STATEMENT_TIMEOUTS = (
+    (None, "/chat", None),
+    (None, "/debug", None),
+    ("GET", "/inventory/movements", settings.DB_REPORT_TIMEOUT_SECONDS),
+    (None, "/analytics", settings.DB_REPORT_TIMEOUT_SECONDS),
+    ("GET", "", settings.DB_READ_TIMEOUT_SECONDS),
+)
+
+
+def route_statement_timeout(method: str, path: str) -> Optional[float]:
+    """Statement budget of a request, or None for the pool default"""
+    if not path.startswith(settings.API_V1_PREFIX):
+        return None
+    path = path[len(settings.API_V1_PREFIX):]
+    for rule_method, prefix, seconds in STATEMENT_TIMEOUTS:
+        if (rule_method is None or rule_method == method) and path.startswith(prefix):
+            return seconds
+    return None
+
+
+class DeadlineMiddleware:
+    """Pure ASGI; must sit outside AdmissionMiddleware so queued reads are cancelled too"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = complete = False
+
+        async def send_tracking(message):
+            nonlocal started, complete
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                complete = True
+            await send(message)
+
+        with db.statement_timeout(route_statement_timeout(method, scope["path"])):
+            try:
+                if method in CANCELLABLE_METHODS:
+                    await self._run_cancellable(scope, receive, send_tracking, lambda: complete)
+                else:
+                    await self.app(scope, receive, send_tracking)
+            except QueryTimeoutError as e:
+                if started:
+                    raise
+                logger.warning(f"{method} {scope['path']}: {e.message}")
+                response = JSONResponse({"detail": e.message}, status_code=504)
+                await response(scope, receive, send)
+
+    async def _run_cancellable(self, scope, receive, send, is_complete):
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = False
+        # The handler task copies the current context, statement budget included
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send))
+
+        async def watch():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    # After a complete response this is just the connection
+                    # closing; background tasks may still be running
+                    if not is_complete():
+                        disconnected = True
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            logger.info(f"Client disconnected, cancelled {scope['method']} {scope['path']}")
+        finally:
+            watcher.cancel()
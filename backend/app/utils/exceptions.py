@@ -1,4 +1,5 @@
 from fastapi import HTTPException, status
+from typing import Optional
 
 
 class WTMSException(Exception):
@@ -30,6 +31,37 @@ class InvalidOperationError(WTMSException):
         super().__init__(self.message)
 
 
+class SchedulingConflictError(WTMSException):
+    """Vehicle or driver already booked for an overlapping window"""
+    def __init__(self, resource: str, resource_id: Optional[int], shipment_id: Optional[int] = None):
+        if resource_id is None:
+            self.message = f"An assigned {resource.lower()} is already booked for an overlapping window"
+        else:
+            self.message = f"{resource} {resource_id} is already booked for an overlapping window"
+        if shipment_id is not None:
+            self.message += f" (shipment {shipment_id})"
+        super().__init__(self.message)
+
+
+class ServiceBusyError(WTMSException):
+    """Server is at capacity; the client should retry later"""
+    def __init__(self, message: str, retry_after: int = 1):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class QueryTimeoutError(WTMSException):
+    """A statement ran past the time budget of the current request (or the pool's command timeout)"""
+    def __init__(self, seconds: Optional[float]):
+        if seconds is None:
+            self.message = "Query took longer than its time budget"
+        else:
+            self.message = f"Query took longer than its {seconds:g}s time budget"
+        self.seconds = seconds
+        super().__init__(self.message)
+
+
 class DatabaseError(WTMSException):
     """Database operation failed"""
     def __init__(self, operation: str, details: str):
@@ -64,9 +96,26 @@ def invalid_operation_exception(message: str):
     )
 
 
+def scheduling_conflict_exception(message: str):
+    """HTTP exception for double-booked vehicles or drivers"""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=message
+    )
+
+
+def service_busy_exception(message: str, retry_after: int = 1):
+    """HTTP exception for load shedding, with a Retry-After hint"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=message,
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
 def database_exception(operation: str, details: str):
     """HTTP exception for database errors"""
     return HTTPException(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         detail=f"Database {operation} failed: {details}"
-    )
\ No newline at end of file
+    )
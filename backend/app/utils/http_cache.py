@@ -0,0 +1,107 @@
+"""
+Conditional GET and response compression.
+
+Responses carry an ETag; a request whose If-None-Match already names it
+gets an empty 304, so polling clients only download pages that changed.
+
+ETags of list and detail endpoints come from the change versions of the
+tables they read (sql/10_table_versions.sql) plus the request path and
+query, so a repeat poll costs one primary-key lookup instead of the query.
+"""
+from typing import Optional, Sequence
+import hashlib
+import logging
+
+import asyncpg
+from fastapi import Request, Response, status
+from starlette.middleware.gzip import GZipMiddleware
+
+from app.database import Database
+
+logger = logging.getLogger(__name__)
+
+TABLE_VERSIONS_QUERY = """
+    SELECT table_name, version FROM table_versions WHERE table_name = ANY($1::text[])
+"""
+
+_versions_missing_logged = False
+
+
+def make_etag(content: bytes) -> str:
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """True if the request's If-None-Match covers `etag` (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+
+def tag_response(response: Response, etag: Optional[str]) -> Response:
+    """Attach the ETag (if any) and make clients revalidate on every use"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+async def versions_etag(
+    request: Request,
+    db: Database,
+    tables: Sequence[str],
+    replica: bool = False,
+    extra: str = ""
+) -> Optional[str]:
+    """
+    Weak ETag for a response built from `tables`, or None if the versions
+    are unavailable (migration not applied). Call it before reading the
+    data, with the same `replica` choice: a write that lands in between then
+    only costs the client one more full response, never a stale 304.
+    `extra` covers anything else the body depends on (e.g. the clock).
+    """
+    global _versions_missing_logged
+    try:
+        rows = await db.fetch_all(TABLE_VERSIONS_QUERY, list(tables), replica=replica)
+    except asyncpg.UndefinedTableError:
+        if not _versions_missing_logged:
+            logger.warning("table_versions is missing (apply sql/10_table_versions.sql); ETags disabled")
+            _versions_missing_logged = True
+        return None
+
+    versions = {row["table_name"]: row["version"] for row in rows}
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    key = "|".join([
+        request.url.path, query, extra,
+        ",".join(f"{t}:{versions.get(t, 0)}" for t in sorted(tables)),
+    ])
+    return "W/" + make_etag(key.encode())
+
+
+class SelectiveGZipMiddleware:
+    """
+    Starlette's GZipMiddleware except under `exclude_prefixes`: it holds
+    streamed chunks in its buffer, which would stall server-sent events.
+    """
+
+    def __init__(self, app, minimum_size: int, compresslevel: int, exclude_prefixes: Sequence[str] = ()):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
@@ -0,0 +1,253 @@
+"""
+Prometheus metrics in the text exposition format (served at /metrics).
+
+Metrics are plain dicts updated from the event loop only, so recording is
+a dict lookup and an add with no locking. Request metrics come from
+MetricsMiddleware and are labelled by route template (not raw path) to
+keep cardinality bounded. Pool, replica, acquire-wait and event-loop lag
+values are read at scrape time by collectors.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence
+import asyncio
+import time
+from app.config import settings
+from app.database import db
+from app.utils.query_stats import query_stats, BUCKETS_MS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        if register:
+            registry[name] = self
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def expose(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def expose(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels: tuple, value: float) -> None:
+        self.values[labels] = value
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def expose(self) -> List[str]:
+        lines = self.header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+registry: Dict[str, Metric] = {}
+# Called at scrape time; each returns metrics built from current state
+collectors: List[Callable[[], Iterable[Metric]]] = []
+
+
+def render() -> str:
+    lines = []
+    for metric in registry.values():
+        lines.extend(metric.expose())
+    for collect in collectors:
+        for metric in collect():
+            lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+# ========== HTTP ==========
+
+http_requests = Counter(
+    "http_requests_total", "Requests by method, route template and status code",
+    ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time until the response is fully sent",
+    ("method", "route")
+)
+http_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method",)
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware), so streaming responses pass through untouched"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = None
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc((method,))
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = status or 500
+            raise
+        finally:
+            http_in_flight.dec((method,))
+            # Set by the router once a route matched
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            # No response and no error: the client went away first (nginx's 499)
+            http_requests.inc((method, route, str(status or 499)))
+            http_request_duration.observe((method, route), time.perf_counter() - started)
+
+
+# ========== Event loop ==========
+
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "How late a periodic timer fires; high values mean blocking code on the loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+class EventLoopLagMonitor:
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.last_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            self.last_lag = max(loop.time() - started - self.interval_seconds, 0.0)
+            event_loop_lag.observe((), self.last_lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+loop_lag_monitor = EventLoopLagMonitor(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)
+
+
+# ========== Database ==========
+
+def _database_metrics() -> Iterable[Metric]:
+    connections = Gauge("db_pool_connections", "Pool connections by state", ("pool", "state"), register=False)
+    max_size = Gauge("db_pool_max_connections", "Configured pool maximum", ("pool",), register=False)
+    for name, pool in (("primary", db.pool), ("replica", db.read_pool)):
+        if pool is None or pool.is_closing():
+            continue
+        size, idle = pool.get_size(), pool.get_idle_size()
+        connections.set((name, "idle"), idle)
+        connections.set((name, "busy"), size - idle)
+        max_size.set((name,), pool.get_max_size())
+    yield connections
+    yield max_size
+
+    # Kept in ms by query_stats; exported in seconds
+    acquire = Histogram(
+        "db_pool_acquire_wait_seconds", "Time spent waiting for a pool connection", ("pool",),
+        buckets=[b / 1000 for b in BUCKETS_MS], register=False
+    )
+    for name, hist in query_stats.pools.items():
+        acquire.series[(name,)] = [list(hist.counts), hist.total_ms / 1000]
+    yield acquire
+
+    if db.read_pool is not None:
+        replica = Gauge("db_replica_healthy", "1 while the read replica is used for reads", register=False)
+        replica.set((), int(db.replica_healthy))
+        yield replica
+        if db.replica_lag_seconds is not None:
+            lag = Gauge("db_replica_lag_seconds", "Last measured replication lag", register=False)
+            lag.set((), db.replica_lag_seconds)
+            yield lag
+
+
+collectors.append(_database_metrics)
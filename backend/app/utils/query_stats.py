@@ -0,0 +1,260 @@
+"""
+Per-statement database instrumentation.
+
+Every statement run on a pool connection is reported by asyncpg's query
+logger (installed by Database.connect) and aggregated under a fingerprint:
+the SQL with literals replaced by ? and whitespace collapsed, so one
+repository query with different inlined values shares an entry. Database's
+fetch/execute helpers add the pool acquire wait and row counts.
+
+Statements slower than QUERY_SLOW_MS are logged. A sample of slow reads is
+re-run under EXPLAIN (ANALYZE, BUFFERS) in a read-only transaction that is
+rolled back, and the plan is logged and kept with the entry.
+"""
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import random
+import re
+import time
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+# Upper bounds (ms) of the histogram buckets; one more bucket holds the rest
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Prefix of the statements issued by the EXPLAIN sampler, which are not counted
+EXPLAIN_MARKER = "/* query_stats:explain */"
+
+# New fingerprints beyond QUERY_STATS_MAX_STATEMENTS are pooled here
+OTHER = "<other statements>"
+
+PLAN_MAX_CHARS = 20000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_EXPLAINABLE = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    fp = _STRING.sub("?", query)
+    fp = _NUMBER.sub("?", fp)
+    fp = _SPACE.sub(" ", fp).strip()
+    return _VALUE_LIST.sub("(?)", fp)
+
+
+def row_count(result) -> int:
+    """Rows returned (fetch/fetchrow) or affected (execute status tag, e.g. 'UPDATE 3')"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, str):
+        tail = result.rsplit(" ", 1)[-1]
+        return int(tail) if tail.isdigit() else 0
+    return 0 if result is None else 1
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; quantiles are bucket upper bounds"""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS_MS[i], self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class QueryStat:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.errors = 0
+        self.rows = 0
+        self.slow = 0
+        self.execution = LatencyHistogram()
+        self.acquire = LatencyHistogram()
+        self.last_plan: Optional[str] = None
+        self.last_explained = 0.0
+
+    def as_dict(self) -> dict:
+        calls = self.execution.count
+        return {
+            "fingerprint": self.fingerprint,
+            "calls": calls,
+            "errors": self.errors,
+            "slow": self.slow,
+            "rows": self.rows,
+            "rows_per_call": round(self.rows / calls, 2) if calls else 0.0,
+            "execution": self.execution.summary(),
+            "acquire_wait": self.acquire.summary(),
+            "last_plan": self.last_plan,
+        }
+
+
+# Sort keys for top()
+ORDERINGS = {
+    "total": lambda s: s.execution.total_ms,
+    "mean": lambda s: s.execution.total_ms / s.execution.count if s.execution.count else 0.0,
+    "p95": lambda s: s.execution.quantile(0.95),
+    "max": lambda s: s.execution.max_ms,
+    "calls": lambda s: s.execution.count,
+    "rows": lambda s: s.rows,
+    "acquire": lambda s: s.acquire.total_ms,
+}
+
+
+class QueryStats:
+    """
+    In-process statement statistics. Like the caches, it is only touched
+    from the event loop, so no locking is done.
+    """
+
+    def __init__(self, enabled: bool, max_statements: int, slow_ms: float,
+                 explain_sample_rate: float, explain_interval_seconds: float):
+        self.enabled = enabled
+        self.max_statements = max_statements
+        self.slow_ms = slow_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_interval_seconds = explain_interval_seconds
+        self.statements: Dict[str, QueryStat] = {}
+        # Acquire waits per pool, including transaction() checkouts
+        self.pools: Dict[str, LatencyHistogram] = {}
+        # Set by Database: (pool name, query, args, timeout ms) -> plan text
+        self.explainer: Optional[Callable[[str, str, tuple, int], Awaitable[str]]] = None
+        self.started_at = time.time()
+        self._explains: set = set()
+
+    def _stat(self, query: str) -> QueryStat:
+        fp = fingerprint(query)
+        stat = self.statements.get(fp)
+        if stat is None:
+            if len(self.statements) >= self.max_statements:
+                fp = OTHER
+                stat = self.statements.get(fp)
+            if stat is None:
+                stat = self.statements[fp] = QueryStat(fp)
+        return stat
+
+    def on_query(self, pool_name: str, record) -> None:
+        """asyncpg query logger callback (record: asyncpg LoggedQuery)"""
+        if not self.enabled or record.query.startswith(EXPLAIN_MARKER):
+            return
+        ms = record.elapsed * 1000
+        stat = self._stat(record.query)
+        stat.execution.observe(ms)
+        if record.exception is not None:
+            stat.errors += 1
+        elif ms >= self.slow_ms:
+            self._slow(pool_name, stat, record, ms)
+
+    def record_acquire(self, pool_name: str, ms: float, query: Optional[str] = None) -> None:
+        if not self.enabled:
+            return
+        hist = self.pools.get(pool_name)
+        if hist is None:
+            hist = self.pools[pool_name] = LatencyHistogram()
+        hist.observe(ms)
+        if query is not None:
+            self._stat(query).acquire.observe(ms)
+
+    def record_rows(self, query: str, rows: int) -> None:
+        if self.enabled:
+            self._stat(query).rows += rows
+
+    # ========== Slow queries ==========
+
+    def _slow(self, pool_name: str, stat: QueryStat, record, ms: float) -> None:
+        stat.slow += 1
+        slow_query_logger.warning(f"Slow query ({ms:.0f} ms on {pool_name}): {stat.fingerprint[:1000]}")
+
+        now = time.monotonic()
+        if (
+            self.explainer is None
+            or not _EXPLAINABLE.match(record.query)
+            or "advisory" in record.query
+            or now - stat.last_explained < self.explain_interval_seconds
+            or random.random() >= self.explain_sample_rate
+        ):
+            return
+        stat.last_explained = now
+        # Re-running it costs about as much again; let it take twice as long at most
+        timeout_ms = int(min(ms * 2 + 1000, settings.DB_COMMAND_TIMEOUT * 1000))
+        task = asyncio.get_running_loop().create_task(
+            self._explain(pool_name, stat, record.query, record.args, timeout_ms)
+        )
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    async def _explain(self, pool_name: str, stat: QueryStat, query: str, args: tuple, timeout_ms: int) -> None:
+        try:
+            plan = await self.explainer(pool_name, query, args, timeout_ms)
+        except Exception as e:
+            logger.warning(f"EXPLAIN of slow query failed: {e}")
+            return
+        stat.last_plan = plan[:PLAN_MAX_CHARS]
+        slow_query_logger.warning(f"Plan for slow query {stat.fingerprint[:200]}:\n{stat.last_plan}")
+
+    # ========== Reporting ==========
+
+    def top(self, limit: int = 20, order_by: str = "total") -> List[dict]:
+        ranked = sorted(self.statements.values(), key=ORDERINGS[order_by], reverse=True)
+        return [stat.as_dict() for stat in ranked[:limit]]
+
+    def summary(self) -> dict:
+        return {
+            "since": self.started_at,
+            "statements": len(self.statements),
+            "calls": sum(s.execution.count for s in self.statements.values()),
+            "slow_threshold_ms": self.slow_ms,
+            "acquire_wait": {name: hist.summary() for name, hist in self.pools.items()},
+        }
+
+    def reset(self) -> None:
+        self.statements.clear()
+        self.pools.clear()
+        self.started_at = time.time()
+
+
+query_stats = QueryStats(
+    enabled=settings.QUERY_STATS_ENABLED,
+    max_statements=settings.QUERY_STATS_MAX_STATEMENTS,
+    slow_ms=settings.QUERY_SLOW_MS,
+    explain_sample_rate=settings.QUERY_EXPLAIN_SAMPLE_RATE,
+    explain_interval_seconds=settings.QUERY_EXPLAIN_MIN_INTERVAL_SECONDS,
+)
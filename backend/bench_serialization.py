@@ -0,0 +1,122 @@
+"""
+Microbenchmark of the list endpoint response path.
+
+For each list endpoint, times the old path (a model per row, then FastAPI's
+response_model validation and JSON encoding) against records_response(),
+on synthetic rows shaped like the endpoint's query result, and checks both
+produce the same JSON.
+
+Usage: python bench_serialization.py [rows]
+"""
+import asyncio
+import json
+import sys
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import List, Union, get_args, get_origin
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.encoders import jsonable_encoder
+from fastapi.utils import create_response_field
+
+from app.models.analytics import RoutePerformance, DriverPerformance
+from app.models.inventory import InventoryWithDetails, StockMovementWithDetails, LowStockAlert
+from app.models.orders import CustomerResponse, OrderResponse
+from app.models.transportation import VehicleResponse, DriverResponse, RouteResponse, ShipmentResponse
+from app.models.warehouse import WarehouseResponse, ZoneResponse, BinResponse
+from app.utils.serialization import records_response
+
+ENDPOINTS = [
+    ("GET /inventory/", InventoryWithDetails),
+    ("GET /inventory/movements", StockMovementWithDetails),
+    ("GET /inventory/alerts/low-stock", LowStockAlert),
+    ("GET /warehouses/", WarehouseResponse),
+    ("GET /warehouses/{id}/zones", ZoneResponse),
+    ("GET /warehouses/zones/{id}/bins", BinResponse),
+    ("GET /orders/customers", CustomerResponse),
+    ("GET /orders/customers/search", CustomerResponse),
+    ("GET /orders", OrderResponse),
+    ("GET /transportation/vehicles", VehicleResponse),
+    ("GET /transportation/drivers", DriverResponse),
+    ("GET /transportation/routes", RouteResponse),
+    ("GET /transportation/shipments", ShipmentResponse),
+    ("GET /analytics/routes", RoutePerformance),
+    ("GET /analytics/drivers", DriverPerformance),
+]
+
+# Columns whose model field only accepts certain strings
+SAMPLES = {"zone_type": "general"}
+
+
+def _value(name: str, annotation, i: int):
+    """A value of the type asyncpg returns for the column behind this field"""
+    if get_origin(annotation) is Union:
+        if i % 7 == 0:
+            return None
+        annotation = next(a for a in get_args(annotation) if a is not type(None))
+    if get_origin(annotation) in (list, List):
+        return None
+    if annotation is int:
+        return i + 1
+    if annotation is bool:
+        return i % 2 == 0
+    if annotation in (float, Decimal):
+        return Decimal(f"{i % 900 + 1}.{i % 100:02d}")
+    if annotation is datetime:
+        return datetime(2024, 1, 1, 8, 30, 15, 123456, tzinfo=timezone.utc) if name.startswith("created") else datetime(2024, 3, 4, 12, 0, 1, 5)
+    if annotation is date:
+        return date(2024, 1, 1 + i % 28)
+    if name in SAMPLES:
+        return SAMPLES[name]
+    if name == "email":
+        return f"customer{i}@example.com"
+    return f"{name} {i} é"
+
+
+def make_rows(model, n: int) -> List[dict]:
+    return [
+        {name: _value(name, field.annotation, i) for name, field in model.model_fields.items()}
+        for i in range(n)
+    ]
+
+
+async def old_path(model, field, rows) -> bytes:
+    items = [model(**dict(row)) for row in rows]
+    content = await serialize_response(field=field, response_content=items, is_coroutine=True)
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def new_path(model, rows) -> bytes:
+    return records_response(rows, model).body
+
+
+def _best(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(n: int) -> None:
+    loop = asyncio.new_event_loop()
+    print(f"{n} rows per response, best of 5\n")
+    print(f"{'endpoint':34} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+    for endpoint, model in ENDPOINTS:
+        rows = make_rows(model, n)
+        field = create_response_field(name="response", type_=List[model])
+        old = loop.run_until_complete(old_path(model, field, rows))
+        new = new_path(model, rows)
+        if json.loads(old) != json.loads(new):
+            raise SystemExit(f"{endpoint}: fast path output differs from response_model output")
+        old_ms = _best(lambda: loop.run_until_complete(old_path(model, field, rows)))
+        new_ms = _best(lambda: new_path(model, rows))
+        print(f"{endpoint:34} {old_ms:9.2f} {new_ms:9.2f} {old_ms / new_ms:7.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -1,21 +1,24 @@
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 import asyncpg
 
-async def run_migration():
+async def run_migration(paths):
     load_dotenv()
     db_url = os.getenv("DATABASE_URL")
     print(f"Connecting to {db_url.split('@')[1]}...")
-    
+
     conn = await asyncpg.connect(db_url)
     try:
-        with open("sql/02_auth.sql", "r") as f:
-            sql = f.read()
-            await conn.execute(sql)
-            print("Migration 02_auth.sql applied successfully!")
+        for path in paths:
+            with open(path, "r") as f:
+                sql = f.read()
+                await conn.execute(sql)
+                print(f"Migration {os.path.basename(path)} applied successfully!")
     finally:
         await conn.close()
 
 if __name__ == "__main__":
-    asyncio.run(run_migration())
+    # Usage: python run_migration.py [sql/03_order_imports.sql ...]
+    asyncio.run(run_migration(sys.argv[1:] or ["sql/02_auth.sql"]))
@@ -0,0 +1,53 @@
+-- ============================================
+-- 15. ORDER IMPORT JOBS (Bulk EDI/CSV ingestion)
+-- ============================================
+CREATE TABLE IF NOT EXISTS order_import_jobs (
+    job_id SERIAL PRIMARY KEY,
+    file_name VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    total_lines INTEGER NOT NULL DEFAULT 0,
+    rejected_lines INTEGER NOT NULL DEFAULT 0,
+    imported_orders INTEGER NOT NULL DEFAULT 0,
+    imported_lines INTEGER NOT NULL DEFAULT 0,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    CONSTRAINT order_import_status_check CHECK (
+        status IN ('queued', 'loading', 'validating', 'inserting', 'completed', 'failed')
+    )
+);
+
+-- Rejected lines are kept (logged) so the rejects file survives the job
+CREATE TABLE IF NOT EXISTS order_import_rejects (
+    job_id INTEGER NOT NULL REFERENCES order_import_jobs(job_id) ON DELETE CASCADE,
+    line_no INTEGER NOT NULL,
+    order_ref TEXT,
+    customer_id TEXT,
+    warehouse_id TEXT,
+    product_code TEXT,
+    quantity TEXT,
+    unit_price TEXT,
+    required_date TEXT,
+    reason TEXT NOT NULL,
+    PRIMARY KEY (job_id, line_no)
+);
+
+-- Template for the per-job UNLOGGED staging tables. Every column is TEXT so
+-- that COPY never aborts on a bad value; validation happens set-based in SQL.
+-- Jobs clone it with LIKE ... INCLUDING IDENTITY so line numbers restart at 1.
+CREATE UNLOGGED TABLE IF NOT EXISTS order_import_staging_template (
+    line_no BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    order_ref TEXT,
+    customer_id TEXT,
+    warehouse_id TEXT,
+    product_code TEXT,
+    quantity TEXT,
+    unit_price TEXT,
+    required_date TEXT
+);
+
+-- Bulk order numbers: ORD-YYYYMMDD-00000001
+CREATE SEQUENCE IF NOT EXISTS order_number_seq;
+
+CREATE INDEX IF NOT EXISTS idx_order_import_jobs_status ON order_import_jobs(status);
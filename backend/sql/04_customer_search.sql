@@ -0,0 +1,12 @@
+-- ============================================
+-- CUSTOMER SEARCH INDEXES (pg_trgm)
+-- ============================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Substring / fuzzy matching (ILIKE '%q%', similarity) on the picker fields
+CREATE INDEX IF NOT EXISTS idx_customers_name_trgm ON customers USING GIN (customer_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_email_trgm ON customers USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_trgm ON customers USING GIN (phone gin_trgm_ops);
+
+-- Prefix matching for short (1-2 character) queries that trigrams cannot serve
+CREATE INDEX IF NOT EXISTS idx_customers_name_prefix ON customers (lower(customer_name) text_pattern_ops);
@@ -0,0 +1,32 @@
+-- ============================================
+-- VEHICLE / DRIVER DOUBLE-BOOKING PROTECTION
+-- ============================================
+-- A vehicle or driver can only be on one open shipment at a time.
+-- scheduled_departure/arrival are TIMESTAMP (without time zone), so the
+-- windows are tsrange rather than tstzrange.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'shipments_vehicle_no_overlap') THEN
+        ALTER TABLE shipments ADD CONSTRAINT shipments_vehicle_no_overlap
+            EXCLUDE USING gist (
+                vehicle_id WITH =,
+                tsrange(scheduled_departure, scheduled_arrival) WITH &&
+            )
+            WHERE (status IN ('planned', 'in_transit')
+                   AND scheduled_departure IS NOT NULL
+                   AND scheduled_arrival IS NOT NULL);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'shipments_driver_no_overlap') THEN
+        ALTER TABLE shipments ADD CONSTRAINT shipments_driver_no_overlap
+            EXCLUDE USING gist (
+                driver_id WITH =,
+                tsrange(scheduled_departure, scheduled_arrival) WITH &&
+            )
+            WHERE (status IN ('planned', 'in_transit')
+                   AND scheduled_departure IS NOT NULL
+                   AND scheduled_arrival IS NOT NULL);
+    END IF;
+END $$;
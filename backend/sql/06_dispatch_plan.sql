@@ -0,0 +1,33 @@
+-- ============================================
+-- BATCH DISPATCH
+-- ============================================
+-- The dispatch planner reassigns many shipments in one UPDATE. Swapping two
+-- vehicles between overlapping shipments passes through a state where both
+-- rows hold the same vehicle, so the overlap constraints must be checkable
+-- at commit. Recreate them DEFERRABLE (still INITIALLY IMMEDIATE, so single
+-- writes keep failing fast) and let the planner defer them.
+ALTER TABLE shipments DROP CONSTRAINT IF EXISTS shipments_vehicle_no_overlap;
+ALTER TABLE shipments ADD CONSTRAINT shipments_vehicle_no_overlap
+    EXCLUDE USING gist (
+        vehicle_id WITH =,
+        tsrange(scheduled_departure, scheduled_arrival) WITH &&
+    )
+    WHERE (status IN ('planned', 'in_transit')
+           AND scheduled_departure IS NOT NULL
+           AND scheduled_arrival IS NOT NULL)
+    DEFERRABLE INITIALLY IMMEDIATE;
+
+ALTER TABLE shipments DROP CONSTRAINT IF EXISTS shipments_driver_no_overlap;
+ALTER TABLE shipments ADD CONSTRAINT shipments_driver_no_overlap
+    EXCLUDE USING gist (
+        driver_id WITH =,
+        tsrange(scheduled_departure, scheduled_arrival) WITH &&
+    )
+    WHERE (status IN ('planned', 'in_transit')
+           AND scheduled_departure IS NOT NULL
+           AND scheduled_arrival IS NOT NULL)
+    DEFERRABLE INITIALLY IMMEDIATE;
+
+-- Planned shipments are what the dispatcher reads
+CREATE INDEX IF NOT EXISTS idx_shipments_planned
+    ON shipments (shipment_id) WHERE status = 'planned';
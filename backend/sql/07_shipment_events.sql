@@ -0,0 +1,17 @@
+-- ============================================
+-- SHIPMENT STATUS EVENTS
+-- ============================================
+-- Status reports from drivers' handheld apps. Written in batches with COPY by
+-- the shipment event writer, which also rolls each batch onto shipments.
+CREATE TABLE IF NOT EXISTS shipment_events (
+    event_id BIGSERIAL PRIMARY KEY,
+    shipment_id INTEGER NOT NULL REFERENCES shipments(shipment_id),
+    event_type VARCHAR(20) NOT NULL,
+    occurred_at TIMESTAMP NOT NULL,
+    received_at TIMESTAMP NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT shipment_event_type_check CHECK (event_type IN ('departed', 'arrived', 'delayed'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_shipment_events_shipment ON shipment_events(shipment_id, occurred_at);
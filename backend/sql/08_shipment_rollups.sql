@@ -0,0 +1,75 @@
+-- ============================================
+-- ROUTE / DRIVER PERFORMANCE ROLLUPS
+-- ============================================
+-- Per-day aggregates of finished (delivered or cancelled) shipments, kept
+-- incrementally by AnalyticsRepository.refresh_shipment_rollups(). A
+-- shipment's day is DATE(COALESCE(actual_arrival, updated_at)).
+-- Sums and counts are stored instead of averages so days can be combined.
+CREATE TABLE IF NOT EXISTS route_daily_stats (
+    route_id INTEGER NOT NULL REFERENCES routes(route_id),
+    day DATE NOT NULL,
+    shipments INTEGER NOT NULL,
+    delivered INTEGER NOT NULL,
+    trip_hours_sum DOUBLE PRECISION NOT NULL,
+    trip_count INTEGER NOT NULL,
+    delay_hours_sum DOUBLE PRECISION NOT NULL,
+    delay_count INTEGER NOT NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (route_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS driver_daily_stats (
+    driver_id INTEGER NOT NULL REFERENCES drivers(driver_id),
+    day DATE NOT NULL,
+    shipments INTEGER NOT NULL,
+    delivered INTEGER NOT NULL,
+    trip_hours_sum DOUBLE PRECISION NOT NULL,
+    trip_count INTEGER NOT NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (driver_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_route_daily_stats_day ON route_daily_stats(day);
+CREATE INDEX IF NOT EXISTS idx_driver_daily_stats_day ON driver_daily_stats(day);
+
+-- How far each rollup has consumed its source table
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    rollup_name VARCHAR(50) PRIMARY KEY,
+    watermark TIMESTAMP NOT NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO rollup_watermarks (rollup_name, watermark)
+VALUES ('shipment_performance', '-infinity')
+ON CONFLICT (rollup_name) DO NOTHING;
+
+-- Recomputing one (route, day) / (driver, day) key
+CREATE INDEX IF NOT EXISTS idx_shipments_finished_route_day
+    ON shipments (route_id, (COALESCE(actual_arrival, updated_at)::date))
+    WHERE status IN ('delivered', 'cancelled');
+CREATE INDEX IF NOT EXISTS idx_shipments_finished_driver_day
+    ON shipments (driver_id, (COALESCE(actual_arrival, updated_at)::date))
+    WHERE status IN ('delivered', 'cancelled');
+
+-- The (route, driver, day) each finished shipment is counted under. A
+-- shipment touched again can move to another day (a later "arrived" event,
+-- an edit bumping updated_at) or stop being finished; the refresh then also
+-- recomputes the keys recorded here, so the old day stops counting it.
+CREATE TABLE IF NOT EXISTS shipment_rollup_days (
+    shipment_id INTEGER PRIMARY KEY REFERENCES shipments(shipment_id) ON DELETE CASCADE,
+    route_id INTEGER,
+    driver_id INTEGER,
+    day DATE NOT NULL
+);
+
+-- Shipments already rolled up before this table existed
+INSERT INTO shipment_rollup_days (shipment_id, route_id, driver_id, day)
+SELECT s.shipment_id, s.route_id, s.driver_id, COALESCE(s.actual_arrival, s.updated_at)::date
+FROM shipments s
+JOIN rollup_watermarks w ON w.rollup_name = 'shipment_performance'
+WHERE s.status IN ('delivered', 'cancelled') AND s.updated_at <= w.watermark
+ON CONFLICT (shipment_id) DO NOTHING;
+
+-- Every shipment touched since the watermark, finished or not
+CREATE INDEX IF NOT EXISTS idx_shipments_updated_at ON shipments (updated_at);
+DROP INDEX IF EXISTS idx_shipments_finished_updated;
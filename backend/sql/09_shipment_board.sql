@@ -0,0 +1,8 @@
+-- ============================================
+-- ACTIVE SHIPMENT BOARD
+-- ============================================
+-- The board pages through open shipments newest first (keyset on
+-- shipment_id); finished shipments never enter this index.
+CREATE INDEX IF NOT EXISTS idx_shipments_open_board
+    ON shipments (shipment_id DESC)
+    WHERE status IN ('planned', 'in_transit');
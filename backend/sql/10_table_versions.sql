@@ -0,0 +1,97 @@
+-- ============================================
+-- TABLE CHANGE VERSIONS
+-- ============================================
+-- One counter per table, bumped once by every transaction that writes the
+-- table. List and detail endpoints build their ETags from the versions of
+-- the tables they read (see app/utils/http_cache.py), so a conditional GET
+-- is answered with 304 after a primary-key lookup here, without running
+-- the list query.
+--
+-- Writes are noted by a statement-level trigger, so a bulk INSERT ... SELECT
+-- or batch UPDATE costs one call rather than one per row. Its first firing
+-- in a transaction queues a row in table_version_bumps (a transaction-local
+-- setting makes the rest no-ops); a deferred constraint trigger on that row
+-- applies the bump at commit, so the version row is locked only for the
+-- commit itself rather than for the rest of the writing transaction, and
+-- the new version becomes visible together with the data. A statement that
+-- changes no rows still bumps the version, which only costs its readers
+-- one full response.
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS table_version_bumps (
+    bump_id BIGSERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL
+);
+
+-- Immediate bump (TRUNCATE, which holds an exclusive lock until commit anyway)
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (table_name) DO UPDATE
+        SET version = table_versions.version + 1,
+            changed_at = now();
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION queue_table_version_bump() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    flag TEXT := 'wtms_table_versions.' || TG_TABLE_NAME;
+BEGIN
+    IF current_setting(flag, true) = txid_current()::text THEN
+        RETURN NULL;
+    END IF;
+    PERFORM set_config(flag, txid_current()::text, true);
+    INSERT INTO table_version_bumps (table_name) VALUES (TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_table_version_bump() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version, changed_at)
+    VALUES (NEW.table_name, 1, now())
+    ON CONFLICT (table_name) DO UPDATE
+        SET version = table_versions.version + 1,
+            changed_at = now();
+    DELETE FROM table_version_bumps WHERE bump_id = NEW.bump_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS table_version_bumps_apply ON table_version_bumps;
+CREATE CONSTRAINT TRIGGER table_version_bumps_apply AFTER INSERT ON table_version_bumps
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION apply_table_version_bump();
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'warehouses', 'zones', 'bins', 'products', 'inventory', 'stock_movements',
+        'customers', 'orders', 'order_items', 'vehicles', 'drivers', 'routes', 'shipments'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_version', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION queue_table_version_bump()',
+            t || '_version', t
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_version_truncate', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()',
+            t || '_version_truncate', t
+        );
+        INSERT INTO table_versions (table_name) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,43 @@
+-- ============================================
+-- STOCK MOVEMENT DAILY ROLLUPS
+-- ============================================
+-- Movement counts and quantities per (day, product, warehouse, type), kept
+-- incrementally by AnalyticsRepository.refresh_movement_rollups(), so trend
+-- charts read rollup rows instead of grouping the movement ledger.
+--
+-- movement_count counts each movement once, at to_warehouse_id, or at
+-- from_warehouse_id when it has none. warehouse_movements counts it at every
+-- warehouse it touches (a transfer at both ends), for per-warehouse
+-- figures. quantity_in is booked at to_warehouse_id and quantity_out at
+-- from_warehouse_id. An adjustment with neither warehouse is kept under
+-- warehouse_id NULL with its quantity as quantity_in (movement quantities
+-- are unsigned). A movement's day is DATE(movement_date).
+--
+-- Movements are append-only, so new ones are added to the rollup rows
+-- (ON CONFLICT ... + EXCLUDED) and the watermark is the last movement_id
+-- folded in, kept in rollup_watermarks.last_id (sql/08_shipment_rollups.sql).
+CREATE TABLE IF NOT EXISTS movement_daily_rollups (
+    day DATE NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(product_id),
+    warehouse_id INTEGER REFERENCES warehouses(warehouse_id),
+    movement_type VARCHAR(20) NOT NULL,
+    movement_count INTEGER NOT NULL,
+    warehouse_movements INTEGER NOT NULL,
+    quantity_in BIGINT NOT NULL,
+    quantity_out BIGINT NOT NULL,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The upsert key; NULL warehouses share one row per (day, product, type)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_movement_daily_rollups_key
+    ON movement_daily_rollups (day, product_id, (COALESCE(warehouse_id, 0)), movement_type);
+CREATE INDEX IF NOT EXISTS idx_movement_daily_rollups_product_day
+    ON movement_daily_rollups (product_id, day);
+CREATE INDEX IF NOT EXISTS idx_movement_daily_rollups_warehouse_day
+    ON movement_daily_rollups (warehouse_id, day);
+
+ALTER TABLE rollup_watermarks ADD COLUMN IF NOT EXISTS last_id BIGINT;
+
+INSERT INTO rollup_watermarks (rollup_name, watermark, last_id)
+VALUES ('movement_volume', '-infinity', 0)
+ON CONFLICT (rollup_name) DO NOTHING;